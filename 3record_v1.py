@@ -4,14 +4,12 @@ from datetime import datetime, timedelta
 import xml.etree.ElementTree as ET
 import pandas as pd
 import hashlib
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+from reference_loader import load_csv_records
 
 # Helper function to load data from CSV
 def load_data_from_csv(file_name):
     try:
-        data = pd.read_csv(file_name)
-        return data.to_dict(orient="records")
+        return load_csv_records(file_name)
     except (FileNotFoundError, pd.errors.EmptyDataError) as e:
         st.error(f"Error loading CSV file: {e}")
         return []
@@ -215,6 +213,10 @@ def parse_denial_xml(denial_xml_data):
 if "concurrent_xml" in st.session_state and "denial_xml" in st.session_state:
     st.header("Graphical Representation of Records")
 
+    # Import Matplotlib for the graph
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+
     # Parse the Concurrent XML
     concurrent_dates, concurrent_values = parse_concurrent_xml(st.session_state["concurrent_xml"])
 
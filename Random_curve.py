@@ -1,61 +1,90 @@
 import numpy as np
-import matplotlib.pyplot as plt
-import streamlit as st
-from matplotlib.backends.backend_agg import RendererAgg
 import threading
 
 # Lock to prevent Matplotlib's threading issues
 _lock = threading.Lock()
 
+# Cells of the float temporaries computed at once; larger batches of waves are generated in blocks
+WAVE_BLOCK_CELLS = 4_000_000
+
+
 # Function to generate the randomized sine wave
-def generate_randomized_wave(length=100, cycles=3, peak=300, randomness_level=5, min_fraction=0.25):
+def generate_randomized_wave(length=100, cycles=3, peak=300, randomness_level=5, min_fraction=0.25,
+                             waves=None, rng=None):
     """
     Generates a randomized wave with a minimum Y value (controlled by `min_fraction`).
 
+    The samples are spread over the cycles as evenly as possible, so when `length` is not a
+    multiple of `cycles` some cycles are one sample longer and every sample belongs to a cycle.
+    Each cycle rises for its first half and falls for the rest with random steps, is scaled
+    between the minimum and the peak, touches the peak once and gets uniform noise. All
+    cycles, and with `waves` a whole batch of independent waves, are computed together as
+    array operations; batches are processed in blocks of about WAVE_BLOCK_CELLS samples.
+
     Args:
     - length (int): Total number of records.
-    - cycles (int): Number of cycles in the wave.
+    - cycles (int): Number of cycles in the wave, at most `length`.
     - peak (int): Peak value to be touched in each cycle.
     - randomness_level (int): Controls the randomness (1 = minimal, 10 = maximal).
     - min_fraction (float): The minimum fraction of the peak that the wave can go down to.
+    - waves (int): Number of independent waves, e.g. one per product; None for a single wave.
+    - rng (numpy.random.Generator): Source of the randomness; NumPy's global RNG by default.
 
     Returns:
     - x (numpy array): The x-axis values (e.g., days).
-    - y (numpy array): The randomized wave values.
+    - y (numpy array): The randomized wave values, shaped (waves, length) when waves is given.
     """
-    records_per_cycle = length // cycles
+    rng = np.random if rng is None else rng
+    cycles = max(1, min(cycles, length))
     x = np.arange(length)  # Generate x values (e.g., days)
-    y = np.zeros(length)  # Initialize wave values
+    y = np.zeros((1 if waves is None else waves, length))  # Initialize wave values
     min_value = peak * min_fraction  # Set the minimum y-value
-
-    for i in range(cycles):
-        start = i * records_per_cycle
-        end = start + records_per_cycle
-        cycle_length = end - start
-
-        # Ensure increments and decrements sum to cycle_length
-        half_cycle = cycle_length // 2
-        increments = np.abs(np.random.normal(loc=peak / cycle_length, scale=randomness_level, size=half_cycle))
-        decrements = -np.abs(np.random.normal(loc=peak / cycle_length, scale=randomness_level, size=cycle_length - half_cycle))
-
-        # Combine increments and decrements
-        cycle = np.cumsum(np.concatenate([increments, decrements]))
-        cycle = cycle - cycle.min()  # Normalize to start from 0
-        cycle = cycle * ((peak - min_value) / cycle.max()) + min_value  # Scale between min_value and peak
-        cycle[np.argmax(cycle)] = peak  # Ensure peak is touched
-
-        # Add some noise (ensure size matches `cycle_length`)
-        noise = np.random.uniform(-randomness_level, randomness_level, size=cycle_length)
-        cycle += noise
-        cycle = np.clip(cycle, min_value, peak)  # Ensure values are within bounds
-
-        y[start:end] = cycle  # Insert the cycle into the main wave
-
-    return x, y
+    if length == 0:
+        return x, y[0] if waves is None else y
+
+    # Cycle layout: bounds and lengths, and per sample its direction and mean step size
+    bounds = np.arange(cycles + 1) * length // cycles
+    starts, cycle_lengths = bounds[:-1], np.diff(bounds)
+    position = x - np.repeat(starts, cycle_lengths)
+    direction = np.where(position < np.repeat(cycle_lengths // 2, cycle_lengths), 1.0, -1.0)
+    step_size = np.repeat(peak / cycle_lengths, cycle_lengths)
+
+    block_waves = max(1, WAVE_BLOCK_CELLS // length)
+    for first in range(0, len(y), block_waves):
+        block = y[first:first + block_waves]
+
+        # Increments on the rise and decrements on the fall, accumulated within each cycle
+        steps = rng.standard_normal(block.shape)
+        steps *= randomness_level
+        steps += step_size
+        np.abs(steps, out=steps)
+        steps *= direction
+        cycle = np.cumsum(steps, axis=1, out=steps)
+        offsets = np.concatenate((np.zeros((len(block), 1)), cycle[:, starts[1:] - 1]), axis=1)
+        cycle -= np.repeat(offsets, cycle_lengths, axis=1)
+
+        # Normalize each cycle to start from 0, scale it between min_value and peak and make it touch the peak
+        lowest = np.minimum.reduceat(cycle, starts, axis=1)
+        cycle -= np.repeat(lowest, cycle_lengths, axis=1)
+        highest = np.repeat(np.maximum.reduceat(cycle, starts, axis=1), cycle_lengths, axis=1)
+        touches_peak = cycle == highest
+        cycle *= (peak - min_value) / np.where(highest > 0, highest, 1)
+        cycle += min_value
+        cycle[touches_peak] = peak
+
+        # Add some noise and keep the values within bounds
+        cycle += rng.uniform(-randomness_level, randomness_level, size=block.shape)
+        np.clip(cycle, min_value, peak, out=block)
+
+    return x, y[0] if waves is None else y
 
 
 # Streamlit app
 def main():
+    # The UI and plotting stack load here, so generate_randomized_wave imports with NumPy only
+    import matplotlib.pyplot as plt
+    import streamlit as st
+
     st.title("Randomized Wave Generator")
 
     # User inputs
@@ -64,23 +93,28 @@ def main():
     cycles = st.sidebar.number_input("Number of Cycles", min_value=1, max_value=10, value=3, step=1)
     peak = st.sidebar.number_input("Peak Value", min_value=100, max_value=1000, value=300, step=10)
     randomness_level = st.sidebar.slider("Randomness Level", min_value=1, max_value=10, value=5)
+    waves = st.sidebar.number_input("Number of Waves", min_value=1, max_value=10, value=1, step=1)
 
     # Add a slider for minimum fraction in the Streamlit sidebar
     min_fraction = st.sidebar.slider(
         "Minimum Fraction of Peak (Lowest Y Value)", min_value=0.1, max_value=0.5, value=0.25, step=0.05
     )
 
-    # Generate the wave
+    # Generate the waves, one row each
     x, y = generate_randomized_wave(
-        length=length, cycles=cycles, peak=peak, randomness_level=randomness_level, min_fraction=min_fraction
+        length=length, cycles=cycles, peak=peak, randomness_level=randomness_level, min_fraction=min_fraction,
+        waves=waves
     )
 
-    # Plot the wave
+    # Plot the waves
     with _lock:
         fig, ax = plt.subplots(figsize=(12, 6))
-        ax.plot(x, y, label="Randomized Wave", color="blue", marker="o")
+        for i, wave in enumerate(y):
+            label = "Randomized Wave" if waves == 1 else f"Wave {i + 1}"
+            ax.plot(x, wave, label=label, color="blue" if waves == 1 else None, marker="o")
+            ax.fill_between(x, wave, where=(wave == peak), color="red", alpha=0.5,
+                            label="Touched Peak" if i == 0 else None)
         ax.axhline(peak, color="orange", linestyle="--", label=f"Peak ({peak})")
-        ax.fill_between(x, y, where=(y == peak), color="red", alpha=0.5, label="Touched Peak")
         ax.set_title("Randomized Wave with Peaks")
         ax.set_xlabel("X (Days)")
         ax.set_ylabel("Y (Value)")
@@ -3,32 +3,56 @@ import streamlit as st
 # Set the page layout to wide
 st.set_page_config(layout="wide")
 
-import random
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
 import pandas as pd
-import hashlib
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
-from lxml import etree as ET
+from datetime import datetime
+from cd_generator import CONCURRENT_PRODUCTS, SPLIT_METHODS, generate_to_directory
+from chart_downsampling import downsample
+from generation_progress import GenerationCancelled, GenerationJob
+from instrumentation import StageTimer, profile_call
+from random_streams import new_seed
+from reference_loader import load_reference_data
+from result_cache import default_cache as RESULT_CACHE, generation_key
+from servicenow_upload import UNLOAD_TABLES, ServiceNowUploader, UploadError, upload_unloads
+from unload_reader import parse_concurrent_xml, parse_denial_xml
+from usage_engine import DAILY
+from usage_shapes import USAGE_SHAPES
+
+# Download formats offered in the sidebar, with the output format and compression each one uses
+EXPORT_FORMATS = {
+    "XML": ("xml", "none"), "XML (gzip)": ("xml", "gzip"), "XML (zstd)": ("xml", "zstd"), "ZIP Bundle": ("xml", "zip"),
+    "CSV": ("csv", "none"), "CSV (gzip)": ("csv", "gzip"), "JSON Lines": ("jsonl", "none"),
+    "JSON Lines (gzip)": ("jsonl", "gzip"), "Parquet": ("parquet", "zstd"),
+}
+
+# MIME type of each output file suffix
+EXPORT_MIME_TYPES = {".xml": "application/xml", ".gz": "application/gzip", ".zst": "application/zstd",
+                     ".zip": "application/zip", ".csv": "text/csv", ".jsonl": "application/jsonl",
+                     ".parquet": "application/vnd.apache.parquet"}
+
+# Sampling intervals offered in the sidebar; None asks for a number of hours
+SAMPLING_INTERVALS = {"1 day": DAILY, "1 hour": np.timedelta64(1, "h"), "15 min": np.timedelta64(15, "m"),
+                      "Every N hours": None}
+
+# Chart rendering modes; Auto switches to the downsampled WebGL chart above CHART_MAX_POINTS
+CHART_RENDERING = ("Auto", "Full Detail", "Downsampled (WebGL)")
+CHART_MAX_POINTS = 2000
+
+# Seconds between refreshes of a running generation's progress and preview chart
+PROGRESS_REFRESH_SECONDS = 1.0
 
 
-# Helper function to load data from CSV
-def load_data_from_csv(file_name):
-    try:
-        data = pd.read_csv(file_name)
-        return data.to_dict(orient="records")
-    except (FileNotFoundError, pd.errors.EmptyDataError) as e:
-        st.error(f"Error loading CSV file: {e}")
-        return []
-
 # Load data from predefined CSV files
-DISCOVERY_MODELS = pd.read_csv("discovery.csv", dtype=str).to_dict(orient="records")
-USER_NAMES = pd.read_csv("user.csv", dtype=str).to_dict(orient="records")
-GROUP_NAMES = pd.read_csv("group.csv", dtype=str).to_dict(orient="records")
-LICENSE_SERVER_VALUES = pd.read_csv("license_server.csv", dtype=str).to_dict(orient="records")
-LICENSE_TYPE_VALUES = pd.read_csv("license_type.csv", dtype=str).to_dict(orient="records")
-
-# Global Variable for Script date/time creation
-CURRENT_TIME = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+REFERENCE_DATA = load_reference_data()
+DISCOVERY_MODELS = REFERENCE_DATA["DISCOVERY_MODELS"]
+USER_NAMES = REFERENCE_DATA["USER_NAMES"]
+GROUP_NAMES = REFERENCE_DATA["GROUP_NAMES"]
+LICENSE_SERVER_VALUES = REFERENCE_DATA["LICENSE_SERVER_VALUES"]
+LICENSE_TYPE_VALUES = REFERENCE_DATA["LICENSE_TYPE_VALUES"]
 
 # Ensure data is loaded
 if not DISCOVERY_MODELS:
@@ -42,123 +66,6 @@ if not LICENSE_SERVER_VALUES:
 if not LICENSE_TYPE_VALUES:
     st.error("No license type found. Ensure the 'license_type.csv' file exists and contains valid data.")
 
-# Helper to generate unique hash
-def generate_unique_hash():
-    return hashlib.md5(str(random.random()).encode()).hexdigest()
-
-# Function to generate three distinct numbers with constraints
-def generate_distinct_numbers_with_constraints(total_sum, max_gap=5):
-    if total_sum < 3:
-        raise ValueError("The total sum must be at least 3 to generate three distinct numbers.")
-    
-     # Start with the smallest possible base values
-    base = total_sum // 3
-    remainder = total_sum % 3
-    
-    # Distribute the remainder to make the numbers distinct
-    numbers = [base, base + 1, base + 2] if remainder == 2 else [base, base, base + 1]
-    
-    # Adjust numbers to satisfy the max_gap constraint
-    while numbers[2] - numbers[0] > max_gap:
-        numbers[2] -= 1
-        numbers[0] += 1
-    
-    return tuple(numbers)
-        
-# Function to generate a license XML record
-def generate_license_record(discovery, quantity):
-    license_server = random.choice(LICENSE_SERVER_VALUES)
-    license_type = random.choice(LICENSE_TYPE_VALUES)
-    
-    incremented_date = datetime.now().replace(year=datetime.now().year + 10)
-    version_raw = discovery.get("version", "Unknown")
-    try:
-        # Convert to float and then int if it's a whole number
-        version = str(int(float(version_raw))) if float(version_raw).is_integer() else str(version_raw)
-    except ValueError:
-        # If conversion fails, use the raw value as a fallback
-        version = str(version_raw)
-
-    license = ET.Element("samp_eng_app_license", action="INSERT_OR_UPDATE")
-    ET.SubElement(license, "active").text = "true"
-    ET.SubElement(license, "end_date").text = incremented_date.strftime("%Y-%m-%d %H:%M:%S")
-    ET.SubElement(license, "eng_software_install", display_value=discovery["software_install"]).text = discovery["software_install_sys_id"]
-    ET.SubElement(license, "is_product_normalized").text = "true"
-    ET.SubElement(license, "license_id").text = generate_unique_hash()
-    ET.SubElement(license, "license_server", display_value=license_server["license_server"]).text = license_server["license_server_sys_id"]
-    ET.SubElement(license, "license_type", display_value=license_type["license_type"]).text = license_type["license_type_sys_id"]
-    ET.SubElement(license, "norm_product", display_value=discovery["norm_product"]).text = discovery["norm_product_sys_id"]
-    ET.SubElement(license, "norm_publisher", display_value=discovery["norm_publisher"]).text = discovery["norm_publisher_sys_id"]
-    ET.SubElement(license, "parent_id").text = ""
-    ET.SubElement(license, "product").text = discovery["product"]
-    ET.SubElement(license, "publisher").text = discovery["publisher"]
-    ET.SubElement(license, "quantity").text = str(int(quantity))   #change
-    ET.SubElement(license, "source").text = "OpeniT"
-    ET.SubElement(license, "start_date").text = CURRENT_TIME
-    ET.SubElement(license, "sys_created_by").text = "admin"
-    ET.SubElement(license, "sys_created_on").text = CURRENT_TIME
-    ET.SubElement(license, "sys_domain").text = generate_unique_hash()
-    ET.SubElement(license, "sys_domain_path").text = "/"
-    ET.SubElement(license, "sys_id").text = generate_unique_hash()
-    ET.SubElement(license, "sys_mod_count").text = str(random.randint(1, 100))
-    ET.SubElement(license, "sys_updated_by").text = "admin"
-    ET.SubElement(license, "sys_updated_on").text = CURRENT_TIME
-    ET.SubElement(license, "version").text = version
-    return license
-
-# Function to generate a concurrent record with extended parameters
-def generate_concurrent_record(record_data, discovery):
-    concurrent_usage = ET.Element("samp_eng_app_concurrent_usage", action="INSERT_OR_UPDATE")
-    ET.SubElement(concurrent_usage, "conc_usage_id").text = f"Con Usage {record_data['record_num']}"
-    ET.SubElement(concurrent_usage, "concurrent_usage").text = str(record_data["value"])
-    ET.SubElement(concurrent_usage, "license", display_value=discovery["norm_product"]).text = discovery["license_sys_id2"]
-    ET.SubElement(concurrent_usage, "source").text = "OpeniT"
-    ET.SubElement(concurrent_usage, "sys_created_by").text = "admin"
-    ET.SubElement(concurrent_usage, "sys_created_on").text = CURRENT_TIME
-    ET.SubElement(concurrent_usage, "sys_domain").text = generate_unique_hash()
-    ET.SubElement(concurrent_usage, "sys_domain_path").text = "/"
-    ET.SubElement(concurrent_usage, "sys_id").text = generate_unique_hash()
-    ET.SubElement(concurrent_usage, "sys_mod_count").text = str(random.randint(1, 100))
-    ET.SubElement(concurrent_usage, "sys_updated_by").text = "admin"
-    ET.SubElement(concurrent_usage, "sys_updated_on").text = CURRENT_TIME
-    ET.SubElement(concurrent_usage, "usage_date").text = record_data["date"]
-    return concurrent_usage
-
-# Extended function to generate denial records
-def generate_denial_record(record_data, discovery, user, group, license_server, license_type):
-    denial = ET.Element("samp_eng_app_denial", action="INSERT_OR_UPDATE")
-    ET.SubElement(denial, "additional_key")
-    ET.SubElement(denial, "computer", display_value=user["computer_name"]).text = user["computer_sys_id"]
-    ET.SubElement(denial, "denial_date").text = record_data["date"]  # Use "date" as "denial_date"
-    ET.SubElement(denial, "denial_id").text = f"Denial {record_data['record_num']}"  # Unique denial ID
-    ET.SubElement(denial, "discovery_model", display_value=discovery["discovery_model"]).text = discovery["discovery_sys_id"]
-    ET.SubElement(denial, "group", display_value=group["group"]).text = group["group_sys_id"]
-    ET.SubElement(denial, "is_product_normalized").text = "true"
-    ET.SubElement(denial, "last_denial_time").text = datetime.now().strftime("%Y-%m-%d %H:%M")
-    ET.SubElement(denial, "license_server", display_value=license_server["license_server"]).text = license_server["license_server_sys_id"]
-    ET.SubElement(denial, "license_type", display_value=license_type["license_type"]).text = license_type["license_type_sys_id"]
-    ET.SubElement(denial, "norm_product", display_value=discovery["norm_product"]).text = discovery["norm_product_sys_id"]
-    ET.SubElement(denial, "norm_publisher", display_value=discovery["norm_publisher"]).text = discovery["norm_publisher_sys_id"]
-    ET.SubElement(denial, "product").text = discovery["product"]
-    ET.SubElement(denial, "publisher").text = discovery["publisher"]
-    ET.SubElement(denial, "source").text = "OpeniT"
-    ET.SubElement(denial, "sys_created_by").text = "admin"
-    ET.SubElement(denial, "sys_created_on").text = CURRENT_TIME
-    ET.SubElement(denial, "sys_domain").text = generate_unique_hash()
-    ET.SubElement(denial, "sys_domain_path").text = "/"
-    ET.SubElement(denial, "sys_id").text = generate_unique_hash()
-    ET.SubElement(denial, "sys_mod_count").text = str(random.randint(1, 100))
-    ET.SubElement(denial, "sys_updated_by").text = "admin"
-    ET.SubElement(denial, "sys_updated_on").text = CURRENT_TIME
-    ET.SubElement(denial, "total_denial_count").text = str(record_data["value"])  # Use "value" as "total_denial_count"
-    ET.SubElement(denial, "user", display_value=user["user"]).text = user["user_sys_id"]
-    ET.SubElement(denial, "version").text = "2020"
-    ET.SubElement(denial, "workstation", display_value=user["workstation"]).text = user["workstation_sys_id"]
-    return denial
-
-def serialize_xml(root):
-    return ET.tostring(root, pretty_print=True, encoding="utf-8").decode("utf-8")
-
 # Streamlit app
 st.title("CD Generator")
 
@@ -168,277 +75,416 @@ with st.sidebar:
     date_range = st.date_input("Select Date Range", [datetime.today(), datetime.today()])
     quantity = st.number_input("Enter Quantity (Threshold/Peak Value)", min_value=1, step=1)
     num_records = st.number_input("Enter Total Number of Records (To Reach Peak)", min_value=1, step=1)
+    sampling = st.selectbox("Sampling Interval", list(SAMPLING_INTERVALS))
+    interval = SAMPLING_INTERVALS[sampling]
+    if interval is None:
+        interval = np.timedelta64(st.number_input("Hours Between Samples", min_value=1, max_value=24, value=6), "h")
     range_start = st.number_input("Denial Range Start", min_value=1, step=1)
     range_end = st.number_input("Denial Range End", min_value=range_start, step=1)
-    generate_button = st.button("Generate Records")
+    usage_shape = st.selectbox("Usage Shape", list(USAGE_SHAPES))
+    shape_defaults = USAGE_SHAPES[usage_shape][1]
+    shape_options = {}
+    if shape_defaults:
+        with st.expander("Shape Options"):
+            for name, default in shape_defaults.items():
+                shape_options[name] = st.number_input(
+                    name.replace("_", " ").title(), value=float(default), key=f"shape_{usage_shape}_{name}"
+                )
+
+    # Products the usage is split across, with a weight each
+    all_products = REFERENCE_DATA.norm_products()
+    if st.checkbox("Split Usage Across All Discovery Models", value=False):
+        products = all_products
+    else:
+        products = st.multiselect("Concurrent Products", all_products,
+                                  default=[product for product in CONCURRENT_PRODUCTS if product in all_products])
+    with st.expander("Product Weights"):
+        split_method = st.selectbox("Split Method", SPLIT_METHODS)
+        product_weights = st.data_editor(
+            pd.DataFrame({"Product": products, "Weight": [1.0] * len(products)}),
+            disabled=["Product"], hide_index=True
+        )
+    weights = product_weights["Weight"].tolist()
+    export_format = st.selectbox("Download Format", list(EXPORT_FORMATS))
+    output_format, compression = EXPORT_FORMATS[export_format]
+    compression_level = None
+    if compression != "none":
+        compression_level = st.slider("Compression Level", min_value=1, max_value=9, value=6)
+
+    # Import sets choke on very large files, so each unload can be split into numbered parts
+    part_records = part_megabytes = 0
+    if output_format == "xml":
+        with st.expander("Split Output"):
+            part_records = st.number_input("Max Records per Part (0 = no limit)", min_value=0, value=0, step=1000)
+            part_megabytes = st.number_input("Max MB per Part (0 = no limit)", min_value=0, value=0, step=10)
+            st.caption("Split unloads are delivered as one ZIP archive with a manifest of counts and checksums.")
+    part_records = part_records or None
+    part_bytes = part_megabytes * 1024 * 1024 or None
+    # The same seed reproduces a run. A blank seed uses one random seed per session, so the same
+    # inputs hit the result cache until a new seed is drawn
+    if "session_seed" not in st.session_state:
+        st.session_state["session_seed"] = new_seed()
+    seed_text = st.text_input("Seed (blank = session seed)", value="").strip()
+    if st.button("Draw New Session Seed"):
+        st.session_state["session_seed"] = new_seed()
+    st.caption(f"Blank seeds use the session seed {st.session_state['session_seed']}: generating the same "
+               "inputs again reuses the cached run. Draw a new session seed for different random records.")
+    profile_run = st.checkbox("Profile Next Run (cProfile + tracemalloc)", value=False)
+    # A run in the background keeps the page usable; a second one waits until it ends
+    generate_button = st.button("Generate Records", disabled="generation_job" in st.session_state)
+
+    # Externally produced unload files can still be charted by parsing their XML
+    with st.expander("Chart Existing Unload Files"):
+        uploaded_concurrent_xml = st.file_uploader("Concurrent XML", type="xml")
+        uploaded_denial_xml = st.file_uploader("Denial XML", type="xml")
 
 # Generate Records
 if generate_button:
-    start_date = date_range[0]
-    end_date = date_range[1]
-    total_days = (end_date - start_date).days + 1
-
-    # Precompute date strings for the entire range
-    date_strings = [
-        (start_date + timedelta(days=i)).strftime("%Y-%m-%d")
-        for i in range(total_days)
-    ]
-
-    # Concurrent Records
-    concurrent_root = ET.Element("unload")
-    concurrent_root.set("unload_date", CURRENT_TIME)
-
-    # Denial Records
-    denial_root = ET.Element("unload")
-    denial_root.set("unload_date", CURRENT_TIME)
-
-    # License Records
-    license_root = ET.Element("unload")
-    license_root.set("unload_date", CURRENT_TIME)
-
-    increment_value = quantity // num_records
-    value = increment_value
-    record_list = []
-    phase = "increment"
-    denial_generated = 0
-
-    # Logic for Increment/Decrement
-    for i, current_date in enumerate(date_strings):
-
-        if phase == "increment":
-            record_list.append({"record_num": i + 1, "value": value, "date": current_date})
-            value += increment_value
-            if value >= quantity:
-                value = quantity
-                phase = "denial"
-                denial_generated = 0
-
-        elif phase == "denial":
-            if denial_generated == 0:
-                denial_count = random.randint(range_start, range_end)
-
-            if denial_generated < denial_count:
-                discovery = random.choice(DISCOVERY_MODELS)
-                user = random.choice(USER_NAMES)
-                group = random.choice(GROUP_NAMES)
-                license_server = random.choice(LICENSE_SERVER_VALUES)
-                license_type = random.choice(LICENSE_TYPE_VALUES)
-
-                denial_root.append(generate_denial_record(
-                    {"date": date_strings[i], "value": increment_value, "record_num": len(record_list) + 1},
-                    discovery, user, group, license_server, license_type
-                ))
-
-                record_list.append({"record_num": i + 1, "value": value, "date": current_date})
-                denial_generated += 1
-
-                if denial_generated >= denial_count:
-                    phase = "decrement"
-                    value -= increment_value
-                else:
-                    # Increment the date only if still in the denial phase
-                    current_date = (datetime.strptime(current_date, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
-
-        elif phase == "decrement":
-            record_list.append({"record_num": i + 1, "value": value, "date": current_date})
-            if value <= quantity / 2:
-                phase = "increment"
-                value += increment_value
-            else:
-                value -= increment_value
-                current_date = (datetime.strptime(current_date, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
-
-    # Generate Concurrent XML Records
-    for record in record_list:
-        total_usage = record["value"]
-        base_usage = total_usage // 3
-        remainder = total_usage % 3
-
-        # Distribute the remainder randomly among the three products
-        distributed_usage = [base_usage] * 3
-        for _ in range(remainder):
-            distributed_usage[random.randint(0, 2)] += 1
-
-        # Generate records for each product
-        for i, product in enumerate(["AutoCAD Architecture", "ArcGIS 3D Analyst", "Advanced Meshing"]):
-            # Find the correct discovery model for the product from the CSV
-            discovery = next((model for model in DISCOVERY_MODELS if model["norm_product"] == product), None)
-
-            if discovery:
-                # Update record value for each product
-                product_record = record.copy()
-                product_record["value"] = distributed_usage[i]
-                concurrent_root.append(generate_concurrent_record(product_record, discovery))
-            else:
-                st.error(f"Discovery model not found for product: {product}")
-    
-    # Generate License XML Records
-    try:
-        license_quantities = generate_distinct_numbers_with_constraints(quantity, max_gap=5)
-    except ValueError as e:
-        st.error(f"Error generating license quantities: {str(e)}")
+    if not products:
+        st.error("Select at least one concurrent product.")
         st.stop()
+    if seed_text and not seed_text.isdigit():
+        st.error("The seed must be a non-negative whole number.")
+        st.stop()
+    # Unseeded runs use the session seed, so their results are cached under the seed they report
+    seed = int(seed_text) if seed_text else st.session_state["session_seed"]
+
+    key = generation_key(
+        REFERENCE_DATA, date_range[0], date_range[1], quantity, num_records, range_start, range_end, seed=seed,
+        compression=compression, level=compression_level, interval=interval, output_format=output_format,
+        products=products, weights=weights, split_method=split_method,
+        part_records=part_records, part_bytes=part_bytes, shape=usage_shape, shape_options=shape_options
+    )
 
-    for i, qty in enumerate(license_quantities):
-        if i < len(DISCOVERY_MODELS):
-            discovery = DISCOVERY_MODELS[i]
-            license_record = generate_license_record(discovery, qty)
-            license_root.append(license_record)
-
-    # Convert XML trees to strings
-    license_xml_data = serialize_xml(license_root)
-    concurrent_xml_data = serialize_xml(concurrent_root)
-    denial_xml_data = serialize_xml(denial_root)
-
-    st.session_state["concurrent_xml"] = concurrent_xml_data
-    st.session_state["denial_xml"] = denial_xml_data
-    st.session_state["license_xml"] = license_xml_data
-
-    st.success("Records Generated Successfully!")
-
-
-def parse_concurrent_xml(concurrent_xml_data):
-    tree = ET.ElementTree(ET.fromstring(concurrent_xml_data))
-    root = tree.getroot()
-    daily_usage = {}
-
-    for record in root.findall("samp_eng_app_concurrent_usage"):
-        date_str = record.find("usage_date").text
-        value = int(record.find("concurrent_usage").text)
-
-        # Aggregate usage for the same date
-        if date_str in daily_usage:
-            daily_usage[date_str] += value
+    # Same inputs and reference data as a recent run: reuse its unloads, unless the run is profiled
+    result = None if profile_run else RESULT_CACHE.get(key)
+    if result is None:
+        # Stream each unload straight to disk instead of building the trees in memory
+        output_dir = tempfile.mkdtemp(prefix="cdgen_")
+        generate_args = (
+            output_dir, REFERENCE_DATA,
+            date_range[0], date_range[1], quantity, num_records, range_start, range_end
+        )
+        plan_options = dict(seed=seed, interval=interval, products=products, weights=weights, split_method=split_method,
+                            part_records=part_records, part_bytes=part_bytes, output_format=output_format,
+                            shape=usage_shape, shape_options=shape_options)
+        if profile_run:
+            # cProfile only sees the thread it runs in, so a profiled run blocks this rerun
+            try:
+                result, report = profile_call(
+                    generate_to_directory, *generate_args, compression=compression, level=compression_level,
+                    **plan_options
+                )
+            except (ValueError, ImportError) as e:
+                shutil.rmtree(output_dir, ignore_errors=True)
+                st.error(f"Error generating records: {str(e)}" if isinstance(e, ValueError) else str(e))
+                st.stop()
+            st.session_state["profile_report"] = (report.pstats_bytes(), report.summary())
+            result = RESULT_CACHE.put(key, result, output_dir)
         else:
-            daily_usage[date_str] = value
-
-    # Sort dates and convert to lists
-    dates = [datetime.strptime(date, "%Y-%m-%d") for date in sorted(daily_usage.keys())]
-    values = [daily_usage[date.strftime("%Y-%m-%d")] for date in dates]
-    return dates, values
-
-# Helper function to parse Denial XML
-def parse_denial_xml(denial_xml_data):
-    tree = ET.ElementTree(ET.fromstring(denial_xml_data))
-    root = tree.getroot()
-    dates = []
-    values = []
-    for record in root.findall("samp_eng_app_denial"):
-        date_str = record.find("denial_date").text
-        value = int(record.find("total_denial_count").text)
-        dates.append(datetime.strptime(date_str, "%Y-%m-%d"))  # Convert to datetime object
-        values.append(value)
-    return dates, values
+            # Generate in a background thread; the progress fragment below publishes the result
+            st.session_state.pop("generation_key", None)
+            st.session_state["generation_job"] = (key, output_dir, GenerationJob(
+                generate_to_directory, *generate_args, compression=compression, level=compression_level,
+                **plan_options
+            ).start())
+            st.rerun()
+
+    # Keep only the cache key in the session; the shared cache owns the result and its files
+    st.session_state["generation_key"] = key
+    st.session_state["generation_notices"] = [
+        ("error", f"Discovery model not found for product: {product}") for product in result.missing_products
+    ] + [("success", f"Records Generated Successfully! Seed: {result.seed}")]
+
+
+# Preview of the records written so far: the downsampled concurrent line and the denial bars
+def progress_figure(chart_columns):
+    import plotly.graph_objects as go
+
+    concurrent_dates, concurrent_values, denial_dates, denial_values = chart_columns
+    fig = go.Figure()
+    if len(concurrent_dates):
+        x, y = downsample(concurrent_dates.astype("datetime64[ns]"), concurrent_values, CHART_MAX_POINTS)
+        fig.add_trace(go.Scattergl(x=x, y=y, mode="lines", name="Concurrent Records", line=dict(color="blue")))
+    if len(denial_dates):
+        x, y = downsample(denial_dates.astype("datetime64[ns]"), denial_values, CHART_MAX_POINTS)
+        fig.add_trace(go.Bar(x=x, y=y, name="Denial Records", marker_color="red", opacity=0.6))
+    fig.update_layout(xaxis=dict(title="Date"), yaxis=dict(title="Value"), plot_bgcolor="white",
+                      paper_bgcolor="white", height=400)
+    return fig
+
+# Progress, cancellation and live preview of the background run; reruns on its own so the rest
+# of the page stays responsive, and reruns the whole app once the run has ended. Only rendered
+# while a run is going, so an idle page does not poll
+@st.fragment(run_every=PROGRESS_REFRESH_SECONDS)
+def show_generation_job():
+    if "generation_job" not in st.session_state:
+        return
+    key, output_dir, job = st.session_state["generation_job"]
+    progress = job.progress
+
+    if job.done:
+        del st.session_state["generation_job"]
+        try:
+            result = job.result()
+        except GenerationCancelled:
+            shutil.rmtree(output_dir, ignore_errors=True)
+            st.session_state["generation_notices"] = [("warning", "Generation cancelled.")]
+        except Exception as e:
+            # Any failure leaves partial files behind that no result owns
+            shutil.rmtree(output_dir, ignore_errors=True)
+            message = str(e) if isinstance(e, ImportError) else f"Error generating records: {str(e)}"
+            st.session_state["generation_notices"] = [("error", message)]
+        else:
+            result = RESULT_CACHE.put(key, result, output_dir)
+            st.session_state["generation_key"] = key
+            st.session_state["generation_notices"] = [
+                ("error", f"Discovery model not found for product: {product}") for product in result.missing_products
+            ] + [("success", f"Records Generated Successfully! Seed: {result.seed}")]
+        st.rerun()
+
+    st.header("Generating Records")
+    if progress.plan is None:
+        st.progress(0.0, text="Planning usage...")
+    else:
+        eta = progress.eta_seconds
+        kind = f"{progress.stage} " if progress.stage in progress.totals else ""
+        st.progress(progress.fraction, text=f"Writing {kind}records: {progress.records_done:,} of "
+                                            f"{progress.total_records:,}")
+        st.caption(f"{progress.records_per_sec:,.0f} records/s · ETA "
+                   f"{'--' if eta is None else f'{eta:,.0f}s'}")
+    if progress.cancelled:
+        st.button("Cancelling...", disabled=True)
+    elif st.button("Cancel Generation"):
+        job.cancel()
+
+    chart_columns = progress.chart_columns()
+    if chart_columns is not None and (len(chart_columns[0]) or len(chart_columns[2])):
+        st.plotly_chart(progress_figure(chart_columns), use_container_width=True)
+
+if "generation_job" in st.session_state:
+    show_generation_job()
+
+# Outcome of the last run, shown once
+for level, message in st.session_state.pop("generation_notices", []):
+    getattr(st, level)(message)
+
+# The session's result, unless the cache has evicted it since
+generation_result = None
+if "generation_key" in st.session_state:
+    generation_result = RESULT_CACHE.get(st.session_state["generation_key"])
+    if generation_result is None:
+        del st.session_state["generation_key"]
+        st.info("The generated records were evicted from the cache. Generate them again to chart or download them.")
+
+
+# Timings of this rerun's parsing and charting, next to the generation timings of the result
+render_timer = StageTimer()
+
+# Pick the chart data: uploaded files are parsed, generated runs use their columns
+chart_data = None
+if uploaded_concurrent_xml is not None and uploaded_denial_xml is not None:
+    with render_timer.stage("parse uploads") as stage:
+        chart_data = parse_concurrent_xml(uploaded_concurrent_xml) + parse_denial_xml(uploaded_denial_xml)
+        stage["records"] = len(chart_data[0]) + len(chart_data[2])
+        stage["bytes"] = uploaded_concurrent_xml.size + uploaded_denial_xml.size
+elif generation_result is not None:
+    chart_data = (generation_result.dates, generation_result.concurrent_totals,
+                  generation_result.denial_dates, generation_result.denial_counts)
 
 # Generate the graph
-if "concurrent_xml" in st.session_state and "denial_xml" in st.session_state:
+if chart_data is not None:
     st.header("Graphical Representation of Records")
+    concurrent_dates, concurrent_values, denial_dates, denial_values = chart_data
 
-    # Parse the Concurrent XML
-    concurrent_dates, concurrent_values = parse_concurrent_xml(st.session_state["concurrent_xml"])
+    # Plotly is only needed once there is something to plot
+    import plotly.graph_objects as go
 
-    # Parse the Denial XML
-    denial_dates, denial_values = parse_denial_xml(st.session_state["denial_xml"])
+    with render_timer.stage("chart figure") as stage:
+        # Convert dates to pandas datetime for better handling
+        concurrent_dates = pd.to_datetime(concurrent_dates)
+        denial_dates = pd.to_datetime(denial_dates)
+        # Assuming the threshold is the peak value; there is none without concurrent records
+        threshold_value = max(concurrent_values) if len(concurrent_values) else None
 
-    # Convert dates to pandas datetime for better handling
-    concurrent_dates = pd.to_datetime(concurrent_dates)
-    denial_dates = pd.to_datetime(denial_dates)
-
-    # Create the figure
-    fig = go.Figure()
+        rendering = st.radio("Chart Rendering", CHART_RENDERING, horizontal=True)
+        downsampled = rendering == CHART_RENDERING[2] or (
+            rendering == CHART_RENDERING[0] and max(len(concurrent_dates), len(denial_dates)) > CHART_MAX_POINTS
+        )
 
-    # Add Concurrent Records Line
-    fig.add_trace(go.Scatter(
-        x=concurrent_dates,
-        y=concurrent_values,
-        mode='lines+markers',
-        name='Concurrent Records',
-        line=dict(color='blue')
-    ))
-
-    # Add Denial Records Bars
-    fig.add_trace(go.Bar(
-        x=denial_dates,
-        y=denial_values,
-        name='Denial Records',
-        marker_color='red',
-        opacity=0.6
-    ))
-
-    # Add Peak Line
-    threshold_value = max(concurrent_values)  # Assuming the threshold is the peak value
-    fig.add_trace(go.Scatter(
-        x=concurrent_dates,
-        y=[threshold_value] * len(concurrent_dates),
-        mode='lines',
-        name=f'Peak ({threshold_value})',
-        line=dict(color='orange', dash='dash')
-    ))
-
-    # Update layout for better interaction
-    fig.update_layout(
-        xaxis=dict(
-            title="Date",
-            title_font=dict(color="black", size=14),  # Change x-axis title color
-            tickfont=dict(color="black", size=12),  # Change x-axis tick font color
-            rangeslider=dict(visible=True),
-            gridcolor="lightgray"  # Light gray gridlines
-        ),
-        yaxis=dict(
-            title="Value",
-            title_font=dict(color="black", size=14),  # Change y-axis title color
-            tickfont=dict(color="black", size=12),  # Change y-axis tick font color
-            gridcolor="lightgray"  # Light gray gridlines
-        ),
-        hovermode="x unified",
-        dragmode="pan",  # Enables panning
-        plot_bgcolor="white",  # White plot area background
-        paper_bgcolor="white",  # White outer area background
-        font=dict(color="black", size=14),  # Black text with increased font size
-        legend=dict(
-            x=-0.05,  # Position the legend to the right of the graph
-            y=1.4,  # Align the legend vertically at the top
-            xanchor="left",  # Anchor the legend box from the left
-            yanchor="top",  # Anchor the legend box from the top
-            bgcolor="rgba(255, 255, 255, 0.8)",  # Semi-transparent white background for better visibility
-            bordercolor="black",  # Optional: Add a border for better separation
-            borderwidth=1,  # Optional: Set the border width
-            font=dict(color="black", size=12)  # Change legend font color and size
-        ),
-        autosize=True
-    )
+        # Create the figure
+        fig = go.Figure()
+
+        if downsampled:
+            # Streamlit does not report Plotly zoom events back to the script, so the visible window
+            # is a widget; every change re-downsamples that window on the server. Runs whose products
+            # all lack a discovery model have denials but no concurrent points to span
+            x_range = None
+            span_dates = concurrent_dates if len(concurrent_dates) else denial_dates
+            if len(span_dates):
+                first, last = span_dates[0].to_pydatetime(), span_dates[-1].to_pydatetime()
+                window = (first, last)
+                if first < last:
+                    window = st.slider("Visible Range", min_value=first, max_value=last, value=(first, last),
+                                       format="YYYY-MM-DD HH:mm")
+                x_range = (np.datetime64(window[0], "ns"), np.datetime64(window[1], "ns"))
+
+            # Concurrent usage as a WebGL line over the min/max of each pixel-wide bucket
+            x, y = downsample(concurrent_dates.to_numpy(), np.asarray(concurrent_values), CHART_MAX_POINTS,
+                              x_range=x_range)
+            fig.add_trace(go.Scattergl(
+                x=x,
+                y=y,
+                mode='lines',
+                name='Concurrent Records',
+                line=dict(color='blue')
+            ))
+
+            # Only the denials inside the window are sent, reduced to the min/max of each bucket too
+            denial_dates, denial_values = denial_dates.to_numpy(), np.asarray(denial_values)
+            if x_range is not None:
+                in_window = (denial_dates >= x_range[0]) & (denial_dates <= x_range[1])
+                denial_dates, denial_values = denial_dates[in_window], denial_values[in_window]
+            denial_dates, denial_values = downsample(denial_dates, denial_values, CHART_MAX_POINTS)
+        else:
+            # Add Concurrent Records Line
+            fig.add_trace(go.Scatter(
+                x=concurrent_dates,
+                y=concurrent_values,
+                mode='lines+markers',
+                name='Concurrent Records',
+                line=dict(color='blue')
+            ))
+
+        # Add Denial Records Bars
+        fig.add_trace(go.Bar(
+            x=denial_dates,
+            y=denial_values,
+            name='Denial Records',
+            marker_color='red',
+            opacity=0.6
+        ))
+
+        # Add Peak Line as a horizontal shape instead of a full-length trace
+        if threshold_value is not None:
+            fig.add_hline(
+                y=threshold_value,
+                line=dict(color='orange', dash='dash'),
+                annotation_text=f'Peak ({threshold_value})',
+                annotation_position='top left'
+            )
+
+        # Update layout for better interaction
+        fig.update_layout(
+            xaxis=dict(
+                title="Date",
+                title_font=dict(color="black", size=14),  # Change x-axis title color
+                tickfont=dict(color="black", size=12),  # Change x-axis tick font color
+                rangeslider=dict(visible=not downsampled),  # The Visible Range slider replaces it when downsampled
+                gridcolor="lightgray"  # Light gray gridlines
+            ),
+            yaxis=dict(
+                title="Value",
+                title_font=dict(color="black", size=14),  # Change y-axis title color
+                tickfont=dict(color="black", size=12),  # Change y-axis tick font color
+                gridcolor="lightgray"  # Light gray gridlines
+            ),
+            hovermode="x unified",
+            dragmode="pan",  # Enables panning
+            plot_bgcolor="white",  # White plot area background
+            paper_bgcolor="white",  # White outer area background
+            font=dict(color="black", size=14),  # Black text with increased font size
+            legend=dict(
+                x=-0.05,  # Position the legend to the right of the graph
+                y=1.4,  # Align the legend vertically at the top
+                xanchor="left",  # Anchor the legend box from the left
+                yanchor="top",  # Anchor the legend box from the top
+                bgcolor="rgba(255, 255, 255, 0.8)",  # Semi-transparent white background for better visibility
+                bordercolor="black",  # Optional: Add a border for better separation
+                borderwidth=1,  # Optional: Set the border width
+                font=dict(color="black", size=12)  # Change legend font color and size
+            ),
+            autosize=True
+        )
+        stage["records"] = len(concurrent_dates) + len(denial_dates)
 
-    # Display the interactive plot in Streamlit
-    st.plotly_chart(fig, use_container_width=True, height=1000)
+    # Display the interactive plot in Streamlit; this is where the figure is serialized for the browser
+    with render_timer.stage("chart render"):
+        st.plotly_chart(fig, use_container_width=True, height=1000)
 
 
-# Display Concurrent XML
+# Download the generated unloads
 with st.sidebar:
-    if "concurrent_xml" in st.session_state:
-        st.subheader("Concurrent XML")
-        st.download_button(
-            label="Download Concurrent XML",
-            data=st.session_state["concurrent_xml"],
-            file_name="concurrent_records.xml",
-            mime="application/xml"
-        )
-
-    # Display Denial XML
-    if "denial_xml" in st.session_state:
-        st.subheader("Denial XML")
-        st.download_button(
-            label="Download Denial XML",
-            data=st.session_state["denial_xml"],
-            file_name="denial_records.xml",
-            mime="application/xml"
-        )
+    if generation_result is not None:
+        paths = generation_result.paths
+        downloads = [("All Unloads", generation_result.bundle_path)] if generation_result.bundle_path else [
+            ("Concurrent Records", paths["concurrent"]),
+            ("Denial Records", paths["denial"]),
+            ("License Records", paths["license"]),
+        ]
+        for label, path in downloads:
+            st.subheader(label)
+            with open(path, "rb") as output_file:
+                st.download_button(
+                    label=f"Download {label}",
+                    data=output_file,
+                    file_name=os.path.basename(path),
+                    mime=EXPORT_MIME_TYPES[os.path.splitext(path)[1]]
+                )
+
+    # Send the unloads straight to an instance's import set API instead of downloading them
+    if generation_result is not None and generation_result.output_format == "xml":
+        with st.expander("Push to ServiceNow"):
+            instance_url = st.text_input("Instance URL", placeholder="https://dev12345.service-now.com")
+            instance_user = st.text_input("User")
+            instance_password = st.text_input("Password", type="password")
+            batch_size = st.number_input("Records per Request", min_value=1, value=1000, step=100)
+            max_in_flight = st.number_input("Concurrent Requests", min_value=1, max_value=32, value=4)
+            # insertMultiple loads into import set staging tables, not into the samp_eng_app_* tables
+            staging_tables = {
+                kind: st.text_input(f"{kind.title()} Staging Table", placeholder="u_..._import", key=f"staging_{kind}")
+                for kind in UNLOAD_TABLES
+            }
+            if st.button("Push Records"):
+                upload_status = st.empty()
+                upload_progress = st.progress(0.0)
+                total_records = sum(generation_result.counts.values())
+
+                def show_upload_progress(report):
+                    upload_progress.progress(min(report.records / total_records, 1.0) if total_records else 1.0)
+                    upload_status.text(f"{report.records} of {total_records} records sent")
+
+                try:
+                    with ServiceNowUploader(instance_url, instance_user or None, instance_password or None,
+                                            batch_size=batch_size, max_in_flight=max_in_flight,
+                                            staging_tables={kind: table for kind, table in staging_tables.items()
+                                                            if table.strip()}) as uploader:
+                        upload_report = upload_unloads(uploader, [path for _, path in downloads], show_upload_progress)
+                except (UploadError, ValueError, OSError) as e:
+                    st.error(f"Error pushing records: {str(e)}")
+                else:
+                    st.success(f"Pushed {upload_report.records} records in {upload_report.seconds:.1f}s "
+                               f"({upload_report.retries} retries).")
 
-    # Display License XML
-    if "license_xml" in st.session_state:
-        st.subheader("License XML")
-        st.download_button(
-            label="Download License XML",
-            data=st.session_state["license_xml"],
-            file_name="license_records.xml",
-            mime="application/xml"
-    )
+# Per-stage timings of the generation and of this rerun, plus the opt-in profile
+with st.sidebar:
+    timing_rows = (generation_result.timings.rows() if generation_result is not None else []) + render_timer.rows()
+    if timing_rows or "profile_report" in st.session_state:
+        with st.expander("Performance"):
+            if timing_rows:
+                st.dataframe(pd.DataFrame(timing_rows), hide_index=True)
+                st.download_button(
+                    label="Download Timings (JSON)",
+                    data=json.dumps(timing_rows, indent=2),
+                    file_name="cdgen_timings.json",
+                    mime="application/json"
+                )
+            if "profile_report" in st.session_state:
+                profile_stats, profile_summary = st.session_state["profile_report"]
+                st.text(profile_summary)
+                st.download_button(
+                    label="Download Profile (pstats)",
+                    data=profile_stats,
+                    file_name="cdgen_profile.prof",
+                    mime="application/octet-stream"
+                )
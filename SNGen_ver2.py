@@ -2,27 +2,26 @@ import streamlit as st
 import random
 import pandas as pd
 import hashlib
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
 from datetime import datetime, timedelta
 from lxml import etree as ET
+from reference_loader import load_csv_records, load_reference_data
 
 
 # Helper function to load data from CSV
 def load_data_from_csv(file_name):
     try:
-        data = pd.read_csv(file_name)
-        return data.to_dict(orient="records")
+        return load_csv_records(file_name)
     except (FileNotFoundError, pd.errors.EmptyDataError) as e:
         st.error(f"Error loading CSV file: {e}")
         return []
 
 # Load data from predefined CSV files
-DISCOVERY_MODELS = pd.read_csv("discovery.csv", dtype=str).to_dict(orient="records")
-USER_NAMES = pd.read_csv("user.csv", dtype=str).to_dict(orient="records")
-GROUP_NAMES = pd.read_csv("group.csv", dtype=str).to_dict(orient="records")
-LICENSE_SERVER_VALUES = pd.read_csv("license_server.csv", dtype=str).to_dict(orient="records")
-LICENSE_TYPE_VALUES = pd.read_csv("license_type.csv", dtype=str).to_dict(orient="records")
+REFERENCE_DATA = load_reference_data()
+DISCOVERY_MODELS = REFERENCE_DATA["DISCOVERY_MODELS"]
+USER_NAMES = REFERENCE_DATA["USER_NAMES"]
+GROUP_NAMES = REFERENCE_DATA["GROUP_NAMES"]
+LICENSE_SERVER_VALUES = REFERENCE_DATA["LICENSE_SERVER_VALUES"]
+LICENSE_TYPE_VALUES = REFERENCE_DATA["LICENSE_TYPE_VALUES"]
 
 # Global Variable for Script date/time creation
 CURRENT_TIME = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -198,6 +197,10 @@ if generate_button:
     phase = "increment"
     denial_generated = 0
 
+    # Chart columns, collected while the records are generated
+    denial_dates = []
+    denial_values = []
+
     for i, current_date in enumerate(date_strings):
 
         if phase == "increment":
@@ -223,6 +226,8 @@ if generate_button:
                     {"date": date_strings[i], "value": increment_value, "record_num": len(record_list) + 1},
                     discovery, user, group, license_server, license_type
                 ))
+                denial_dates.append(date_strings[i])
+                denial_values.append(increment_value)
 
                 record_list.append({"record_num": i + 1, "value": value, "date": current_date})
                 denial_generated += 1
@@ -244,6 +249,7 @@ if generate_button:
                 current_date = (datetime.strptime(current_date, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
 
     # Generate Concurrent XML Records
+    daily_usage = {}
     for record in record_list:
         total_usage = record["value"]
         base_usage = total_usage // 3
@@ -264,6 +270,7 @@ if generate_button:
                 product_record = record.copy()
                 product_record["value"] = distributed_usage[i]
                 concurrent_root.append(generate_concurrent_record(product_record, discovery))
+                daily_usage[record["date"]] = daily_usage.get(record["date"], 0) + distributed_usage[i]
             else:
                 st.error(f"Discovery model not found for product: {product}")
     
@@ -289,52 +296,22 @@ if generate_button:
     st.session_state["concurrent_xml"] = concurrent_xml_data
     st.session_state["denial_xml"] = denial_xml_data
     st.session_state["license_xml"] = license_xml_data
+    st.session_state["chart_data"] = (
+        pd.to_datetime(list(daily_usage.keys())), list(daily_usage.values()),
+        pd.to_datetime(denial_dates), denial_values
+    )
 
     st.success("Records Generated Successfully!")
 
 
-def parse_concurrent_xml(concurrent_xml_data):
-    tree = ET.ElementTree(ET.fromstring(concurrent_xml_data))
-    root = tree.getroot()
-    daily_usage = {}
-
-    for record in root.findall("samp_eng_app_concurrent_usage"):
-        date_str = record.find("usage_date").text
-        value = int(record.find("concurrent_usage").text)
-
-        # Aggregate usage for the same date
-        if date_str in daily_usage:
-            daily_usage[date_str] += value
-        else:
-            daily_usage[date_str] = value
-
-    # Sort dates and convert to lists
-    dates = [datetime.strptime(date, "%Y-%m-%d") for date in sorted(daily_usage.keys())]
-    values = [daily_usage[date.strftime("%Y-%m-%d")] for date in dates]
-    return dates, values
-
-# Helper function to parse Denial XML
-def parse_denial_xml(denial_xml_data):
-    tree = ET.ElementTree(ET.fromstring(denial_xml_data))
-    root = tree.getroot()
-    dates = []
-    values = []
-    for record in root.findall("samp_eng_app_denial"):
-        date_str = record.find("denial_date").text
-        value = int(record.find("total_denial_count").text)
-        dates.append(datetime.strptime(date_str, "%Y-%m-%d"))  # Convert to datetime object
-        values.append(value)
-    return dates, values
-
-# Generate the graph
-if "concurrent_xml" in st.session_state and "denial_xml" in st.session_state:
+# Generate the graph from the columns kept at generation time
+if "chart_data" in st.session_state:
     st.header("Graphical Representation of Records")
+    concurrent_dates, concurrent_values, denial_dates, denial_values = st.session_state["chart_data"]
 
-    # Parse the Concurrent XML
-    concurrent_dates, concurrent_values = parse_concurrent_xml(st.session_state["concurrent_xml"])
-
-    # Parse the Denial XML
-    denial_dates, denial_values = parse_denial_xml(st.session_state["denial_xml"])
+    # Matplotlib is only needed once there is something to plot
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
 
     # Create the plot
     fig, ax = plt.subplots(figsize=(12, 6))
@@ -0,0 +1,249 @@
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from lxml import etree as ET
+from cd_generator import (
+    DENIAL_TABLES,
+    DenialColumns,
+    RecordTemplates,
+    emit_denial_records,
+    generate_concurrent_record,
+    generate_denial_record,
+    generate_license_record,
+    serialize_xml,
+)
+from Random_curve import generate_randomized_wave
+from random_streams import RandomStreams
+from reference_loader import load_reference_data
+from unload_reader import parse_concurrent_xml, parse_denial_xml
+from unload_writer import UnloadWriter
+
+CURRENT_TIME = "2024-01-01 00:00:00"
+
+# Record counts each case runs at
+SCALES = {"1k": 1_000, "100k": 100_000, "1M": 1_000_000, "10M": 10_000_000}
+
+# Scales run when none are given, the ones recorded in bench_baseline.json
+DEFAULT_SCALES = "1k,100k"
+
+# Default slowdown, as a fraction of the baseline records/sec, reported as a regression
+DEFAULT_THRESHOLD = 0.2
+
+
+# Reference rows used by the record builders, cycled by record number
+def _sample_rows(reference, n):
+    tables = ("DISCOVERY_MODELS", "USER_NAMES", "GROUP_NAMES", "LICENSE_SERVER_VALUES", "LICENSE_TYPE_VALUES")
+    return [reference[table][n % reference.sizes[table]] for table in tables]
+
+def _record_data(n):
+    return {"record_num": n + 1, "value": n % 97, "date": f"2024-01-{1 + n % 28:02d}"}
+
+
+def bench_concurrent_record(reference, count):
+    start = time.perf_counter()
+    for n in range(count):
+        generate_concurrent_record(_record_data(n), _sample_rows(reference, n)[0], CURRENT_TIME)
+    return time.perf_counter() - start
+
+def bench_denial_record(reference, count):
+    start = time.perf_counter()
+    for n in range(count):
+        generate_denial_record(_record_data(n), *_sample_rows(reference, n), CURRENT_TIME)
+    return time.perf_counter() - start
+
+def bench_license_record(reference, count):
+    start = time.perf_counter()
+    for n in range(count):
+        discovery, _, _, license_server, license_type = _sample_rows(reference, n)
+        generate_license_record(discovery, 10 + n % 90, license_server, license_type, CURRENT_TIME)
+    return time.perf_counter() - start
+
+# Only the serialization is timed; the tree is built beforehand
+def bench_serialize_xml(reference, count):
+    root = ET.Element("unload", unload_date=CURRENT_TIME)
+    for n in range(count):
+        root.append(generate_concurrent_record(_record_data(n), _sample_rows(reference, n)[0], CURRENT_TIME))
+    start = time.perf_counter()
+    serialize_xml(root)
+    return time.perf_counter() - start
+
+# Unload file with `count` records of one kind, written through the templates
+def _write_unload(reference, kind, count, path):
+    templates = RecordTemplates(reference, CURRENT_TIME)
+    with UnloadWriter(open(path, "wb"), CURRENT_TIME, close_sink=True) as writer:
+        for n in range(count):
+            if kind == "concurrent":
+                writer.append_serialized(templates.concurrent(_record_data(n), _sample_rows(reference, n)[0]))
+            else:
+                indexes = [n % reference.sizes[table] for table in reference]
+                writer.append_serialized(templates.denial(_record_data(n), *indexes))
+
+def _bench_parse(reference, count, kind, parse):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, f"{kind}.xml")
+        _write_unload(reference, kind, count, path)
+        start = time.perf_counter()
+        parse(path)
+        return time.perf_counter() - start
+
+def bench_parse_concurrent_xml(reference, count):
+    return _bench_parse(reference, count, "concurrent", parse_concurrent_xml)
+
+def bench_parse_denial_xml(reference, count):
+    return _bench_parse(reference, count, "denial", parse_denial_xml)
+
+# A planned run of `count` denials emitted from its columns into an unload file
+def bench_emit_denial_records(reference, count):
+    rng = np.random.default_rng(0)
+    samples = np.arange(count)
+    denials = DenialColumns(
+        samples, np.array([f"2024-01-{1 + n % 28:02d}" for n in range(count)], dtype="S"), (samples % 97).astype(np.int32),
+        np.column_stack([rng.integers(reference.sizes[table], size=count) for table in DENIAL_TABLES]).astype(np.int32)
+    )
+    with tempfile.TemporaryDirectory() as temp_dir:
+        start = time.perf_counter()
+        with UnloadWriter(open(os.path.join(temp_dir, "denial.xml"), "wb"), CURRENT_TIME, close_sink=True) as writer:
+            emit_denial_records(writer, reference, denials, CURRENT_TIME, RandomStreams(0))
+        return time.perf_counter() - start
+
+# One cycle per 100 samples, like a daily series with a peak every few months
+def bench_randomized_wave(reference, count):
+    start = time.perf_counter()
+    generate_randomized_wave(length=count, cycles=max(1, count // 100), peak=300)
+    return time.perf_counter() - start
+
+# The same points as a batch of 100 independent waves, e.g. one per product
+def bench_randomized_wave_batch(reference, count):
+    length = max(1, count // 100)
+    start = time.perf_counter()
+    generate_randomized_wave(length=length, cycles=max(1, length // 100), peak=300, waves=100)
+    return time.perf_counter() - start
+
+
+CASES = {
+    "generate_concurrent_record": bench_concurrent_record,
+    "generate_denial_record": bench_denial_record,
+    "generate_license_record": bench_license_record,
+    "emit_denial_records": bench_emit_denial_records,
+    "serialize_xml": bench_serialize_xml,
+    "parse_concurrent_xml": bench_parse_concurrent_xml,
+    "parse_denial_xml": bench_parse_denial_xml,
+    "generate_randomized_wave": bench_randomized_wave,
+    "generate_randomized_wave_batch": bench_randomized_wave_batch,
+}
+
+
+# Peak resident set size of this process in bytes
+def peak_rss():
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == "darwin" else usage * 1024
+
+# Run one case in this process and print its measurement as JSON
+def run_case(case, scale, data_dir):
+    random.seed(0)
+    np.random.seed(0)
+    count = SCALES[scale]
+    seconds = CASES[case](load_reference_data(data_dir), count)
+    print(json.dumps({
+        "case": case, "scale": scale, "records": count, "seconds": seconds,
+        "records_per_sec": count / seconds, "peak_rss": peak_rss(),
+    }))
+
+
+def measure(case, scale, data_dir):
+    """
+    Runs one case at one scale in a fresh interpreter, so peak RSS covers that case alone.
+
+    Returns:
+    - dict: case, scale, records, seconds, records_per_sec and peak_rss (bytes).
+    """
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-case", case, scale, "--data-dir", data_dir],
+        capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"{case} at {scale} failed:\n{completed.stderr}")
+    return json.loads(completed.stdout)
+
+
+def find_regressions(results, baseline, threshold):
+    """
+    Compares results with a baseline from an earlier run.
+
+    Returns:
+    - list: (case, scale, baseline records/sec, current records/sec) for every measurement
+      more than `threshold` slower than its baseline. Failed cases are not compared.
+    """
+    expected = {(entry["case"], entry["scale"]): entry["records_per_sec"] for entry in baseline["results"]}
+    regressions = []
+    for entry in results:
+        if "error" in entry:
+            continue
+        baseline_rate = expected.get((entry["case"], entry["scale"]))
+        if baseline_rate and entry["records_per_sec"] < baseline_rate * (1 - threshold):
+            regressions.append((entry["case"], entry["scale"], baseline_rate, entry["records_per_sec"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the generation, serialization and parsing hot paths.")
+    parser.add_argument("--cases", default=",".join(CASES), help="Comma-separated cases (default: all).")
+    parser.add_argument("--scales", default=DEFAULT_SCALES,
+                        help=f"Comma-separated scales out of {', '.join(SCALES)} (default: {DEFAULT_SCALES}).")
+    parser.add_argument("--data-dir", default=".", help="Directory holding the reference CSV files (default: .).")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", help="Baseline JSON to compare with; regressions make the run fail.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Slowdown fraction reported as a regression (default: {DEFAULT_THRESHOLD}).")
+    parser.add_argument("--run-case", nargs=2, metavar=("CASE", "SCALE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        run_case(*args.run_case, args.data_dir)
+        return
+
+    cases, scales = args.cases.split(","), args.scales.split(",")
+    unknown = [name for name in cases if name not in CASES] + [name for name in scales if name not in SCALES]
+    if unknown:
+        raise SystemExit(f"error: unknown case or scale: {', '.join(unknown)}")
+
+    print(f"{'case':<32}{'scale':>6}{'seconds':>10}{'records/s':>14}{'peak RSS MB':>13}")
+    results = []
+    for case in cases:
+        for scale in scales:
+            try:
+                entry = measure(case, scale, args.data_dir)
+            except RuntimeError as e:
+                # Keep the other measurements; the failure is recorded and fails the run at the end
+                results.append({"case": case, "scale": scale, "error": str(e)})
+                print(f"{case:<32}{scale:>6}{'failed':>10}", flush=True)
+                print(e, file=sys.stderr)
+                continue
+            results.append(entry)
+            print(f"{case:<32}{scale:>6}{entry['seconds']:>10.3f}{entry['records_per_sec']:>14,.0f}"
+                  f"{entry['peak_rss'] / 2**20:>13.1f}", flush=True)
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump({"python": sys.version.split()[0], "results": results}, output_file, indent=2)
+
+    failed = any("error" in entry for entry in results)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = find_regressions(results, json.load(baseline_file), args.threshold)
+        for case, scale, baseline_rate, rate in regressions:
+            print(f"regression: {case} at {scale}: {rate:,.0f} records/s vs baseline {baseline_rate:,.0f}",
+                  file=sys.stderr)
+    sys.exit(1 if failed or regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
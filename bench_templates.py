@@ -0,0 +1,97 @@
+import argparse
+import random
+import time
+from datetime import date
+from cd_generator import (
+    RecordTemplates,
+    generate_concurrent_record,
+    generate_denial_record,
+    generate_license_record,
+    generate_unique_hash,
+)
+from reference_loader import load_reference_data
+from unload_writer import serialize_record
+
+CURRENT_TIME = "2024-01-01 00:00:00"
+
+
+# Build one sample record of each kind through both the element-tree path and the template path
+def sample_records(reference, templates, n):
+    discovery_models = reference["DISCOVERY_MODELS"]
+    record_data = {"record_num": n + 1, "value": n % 97, "date": date(2024, 1, 1 + n % 28).isoformat()}
+    indexes = (
+        n % len(discovery_models),
+        n % len(reference["USER_NAMES"]),
+        n % len(reference["GROUP_NAMES"]),
+        n % len(reference["LICENSE_SERVER_VALUES"]),
+        n % len(reference["LICENSE_TYPE_VALUES"]),
+    )
+    discovery = discovery_models[indexes[0]]
+    tables = ("USER_NAMES", "GROUP_NAMES", "LICENSE_SERVER_VALUES", "LICENSE_TYPE_VALUES")
+    user, group, license_server, license_type = (reference[t][i] for t, i in zip(tables, indexes[1:]))
+
+    return {
+        "concurrent": (
+            lambda: serialize_record(generate_concurrent_record(record_data, discovery, CURRENT_TIME)),
+            lambda: templates.concurrent(record_data, discovery),
+        ),
+        "denial": (
+            lambda: serialize_record(generate_denial_record(
+                record_data, discovery, user, group, license_server, license_type, CURRENT_TIME
+            )),
+            lambda: templates.denial(record_data, *indexes),
+        ),
+        "license": (
+            lambda: serialize_record(generate_license_record(discovery, 10 + n, license_server, license_type, CURRENT_TIME)),
+            lambda: templates.license(discovery, 10 + n, indexes[3], indexes[4]),
+        ),
+    }
+
+
+# Check that both paths emit identical bytes for the same RNG state
+def check_equivalence(reference, samples=200):
+    templates = RecordTemplates(reference, CURRENT_TIME, ids=lambda: generate_unique_hash().encode())
+    for n in range(samples):
+        for kind, (element_path, template_path) in sample_records(reference, templates, n).items():
+            random.seed(n)
+            expected = element_path()
+            random.seed(n)
+            actual = template_path()
+            if actual != expected:
+                raise AssertionError(f"{kind} record {n} differs:\n{expected.decode()}\n{actual.decode()}")
+
+
+# Records/sec of both paths for each record kind
+def benchmark(reference, count):
+    templates = RecordTemplates(reference, CURRENT_TIME)
+    samples = [sample_records(reference, templates, n) for n in range(64)]
+    results = {}
+    for kind in ("concurrent", "denial", "license"):
+        rates = []
+        for path in (0, 1):
+            emitters = [sample[kind][path] for sample in samples]
+            start = time.perf_counter()
+            for n in range(count):
+                emitters[n % 64]()
+            rates.append(count / (time.perf_counter() - start))
+        results[kind] = rates
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare element-tree and template record emission.")
+    parser.add_argument("--count", type=int, default=50000, help="Records per kind and path (default: 50000).")
+    parser.add_argument("--data-dir", default=".", help="Directory holding the reference CSV files (default: .).")
+    args = parser.parse_args()
+
+    reference = load_reference_data(args.data_dir)
+    check_equivalence(reference)
+    print("Equivalence check passed: template output is byte-identical to the element-tree output.")
+
+    print(f"{'record':<12}{'element-tree rec/s':>20}{'template rec/s':>18}{'speedup':>10}")
+    for kind, (element_rate, template_rate) in benchmark(reference, args.count).items():
+        print(f"{kind:<12}{element_rate:>20,.0f}{template_rate:>18,.0f}{template_rate / element_rate:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
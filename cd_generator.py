@@ -0,0 +1,744 @@
+import random
+from collections import namedtuple
+from datetime import datetime
+import numpy as np
+from lxml import etree as ET
+from generation_progress import GenerationProgress
+from generation_result import GenerationResult
+from id_pool import IdPool
+from instrumentation import StageTimer
+from random_streams import DENIAL_COUNTS, REFERENCE_PICKS, USAGE_NOISE, USAGE_SHAPE, RandomStreams
+from record_templates import RecordTemplate, escape_attribute, escape_text, slot
+from unload_writer import UnloadOutput
+from usage_engine import DAILY, sample_count, sample_time_bytes
+from usage_shapes import DEFAULT_SHAPE, ShapeContext, shape_series
+
+# Products the daily concurrent usage is split across
+CONCURRENT_PRODUCTS = ["AutoCAD Architecture", "ArcGIS 3D Analyst", "Advanced Meshing"]
+
+# File names of the three unload documents
+UNLOAD_FILE_NAMES = {
+    "concurrent": "concurrent_records.xml",
+    "denial": "denial_records.xml",
+    "license": "license_records.xml",
+}
+
+# Global Variable for Script date/time creation
+CURRENT_TIME = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+# Reference tables a denial picks a row from, in the order of its indexes
+DENIAL_TABLES = ("DISCOVERY_MODELS", "USER_NAMES", "GROUP_NAMES", "LICENSE_SERVER_VALUES", "LICENSE_TYPE_VALUES")
+
+
+# Helper to generate a 32-hex-char sys_id; bulk emission draws from an IdPool instead
+def generate_unique_hash():
+    return f"{random.getrandbits(128):032x}"
+
+# Function to generate three distinct numbers with constraints
+def generate_distinct_numbers_with_constraints(total_sum, max_gap=5):
+    if total_sum < 3:
+        raise ValueError("The total sum must be at least 3 to generate three distinct numbers.")
+
+    # Start with the smallest possible base values
+    base = total_sum // 3
+    remainder = total_sum % 3
+
+    # Distribute the remainder to make the numbers distinct
+    numbers = [base, base + 1, base + 2] if remainder == 2 else [base, base, base + 1]
+
+    # Adjust numbers to satisfy the max_gap constraint
+    while numbers[2] - numbers[0] > max_gap:
+        numbers[2] -= 1
+        numbers[0] += 1
+
+    return tuple(numbers)
+
+# last_denial_time of the denials created at current_time, to the minute
+def last_denial_time(current_time):
+    return current_time[:16]
+
+# License end date ten years after current_time; 29 February becomes the 28th in a non-leap year
+def license_end_date(current_time):
+    created = datetime.strptime(current_time, "%Y-%m-%d %H:%M:%S")
+    try:
+        end_date = created.replace(year=created.year + 10)
+    except ValueError:
+        end_date = created.replace(year=created.year + 10, day=28)
+    return end_date.strftime("%Y-%m-%d %H:%M:%S")
+
+# Version of a discovery model as shown on its license
+def format_version(version_raw):
+    try:
+        # Convert to float and then int if it's a whole number
+        return str(int(float(version_raw))) if float(version_raw).is_integer() else str(version_raw)
+    except ValueError:
+        # If conversion fails, use the raw value as a fallback
+        return str(version_raw)
+
+# Function to generate a license XML record
+def generate_license_record(discovery, quantity, license_server, license_type, current_time=CURRENT_TIME):
+    version = format_version(discovery.get("version", "Unknown"))
+
+    license = ET.Element("samp_eng_app_license", action="INSERT_OR_UPDATE")
+    ET.SubElement(license, "active").text = "true"
+    ET.SubElement(license, "end_date").text = license_end_date(current_time)
+    ET.SubElement(license, "eng_software_install", display_value=discovery["software_install"]).text = discovery["software_install_sys_id"]
+    ET.SubElement(license, "is_product_normalized").text = "true"
+    ET.SubElement(license, "license_id").text = generate_unique_hash()
+    ET.SubElement(license, "license_server", display_value=license_server["license_server"]).text = license_server["license_server_sys_id"]
+    ET.SubElement(license, "license_type", display_value=license_type["license_type"]).text = license_type["license_type_sys_id"]
+    ET.SubElement(license, "norm_product", display_value=discovery["norm_product"]).text = discovery["norm_product_sys_id"]
+    ET.SubElement(license, "norm_publisher", display_value=discovery["norm_publisher"]).text = discovery["norm_publisher_sys_id"]
+    ET.SubElement(license, "parent_id").text = ""
+    ET.SubElement(license, "product").text = discovery["product"]
+    ET.SubElement(license, "publisher").text = discovery["publisher"]
+    ET.SubElement(license, "quantity").text = str(int(quantity))
+    ET.SubElement(license, "source").text = "OpeniT"
+    ET.SubElement(license, "start_date").text = current_time
+    ET.SubElement(license, "sys_created_by").text = "admin"
+    ET.SubElement(license, "sys_created_on").text = current_time
+    ET.SubElement(license, "sys_domain").text = generate_unique_hash()
+    ET.SubElement(license, "sys_domain_path").text = "/"
+    ET.SubElement(license, "sys_id").text = generate_unique_hash()
+    ET.SubElement(license, "sys_mod_count").text = str(random.randint(1, 100))
+    ET.SubElement(license, "sys_updated_by").text = "admin"
+    ET.SubElement(license, "sys_updated_on").text = current_time
+    ET.SubElement(license, "version").text = version
+    return license
+
+# Function to generate a concurrent record with extended parameters
+def generate_concurrent_record(record_data, discovery, current_time=CURRENT_TIME):
+    concurrent_usage = ET.Element("samp_eng_app_concurrent_usage", action="INSERT_OR_UPDATE")
+    ET.SubElement(concurrent_usage, "conc_usage_id").text = f"Con Usage {record_data['record_num']}"
+    ET.SubElement(concurrent_usage, "concurrent_usage").text = str(record_data["value"])
+    ET.SubElement(concurrent_usage, "license", display_value=discovery["norm_product"]).text = discovery["license_sys_id2"]
+    ET.SubElement(concurrent_usage, "source").text = "OpeniT"
+    ET.SubElement(concurrent_usage, "sys_created_by").text = "admin"
+    ET.SubElement(concurrent_usage, "sys_created_on").text = current_time
+    ET.SubElement(concurrent_usage, "sys_domain").text = generate_unique_hash()
+    ET.SubElement(concurrent_usage, "sys_domain_path").text = "/"
+    ET.SubElement(concurrent_usage, "sys_id").text = generate_unique_hash()
+    ET.SubElement(concurrent_usage, "sys_mod_count").text = str(random.randint(1, 100))
+    ET.SubElement(concurrent_usage, "sys_updated_by").text = "admin"
+    ET.SubElement(concurrent_usage, "sys_updated_on").text = current_time
+    ET.SubElement(concurrent_usage, "usage_date").text = record_data["date"]
+    return concurrent_usage
+
+# Extended function to generate denial records
+def generate_denial_record(record_data, discovery, user, group, license_server, license_type, current_time=CURRENT_TIME):
+    denial = ET.Element("samp_eng_app_denial", action="INSERT_OR_UPDATE")
+    ET.SubElement(denial, "additional_key")
+    ET.SubElement(denial, "computer", display_value=user["computer_name"]).text = user["computer_sys_id"]
+    ET.SubElement(denial, "denial_date").text = record_data["date"]  # Use "date" as "denial_date"
+    ET.SubElement(denial, "denial_id").text = f"Denial {record_data['record_num']}"  # Unique denial ID
+    ET.SubElement(denial, "discovery_model", display_value=discovery["discovery_model"]).text = discovery["discovery_sys_id"]
+    ET.SubElement(denial, "group", display_value=group["group"]).text = group["group_sys_id"]
+    ET.SubElement(denial, "is_product_normalized").text = "true"
+    ET.SubElement(denial, "last_denial_time").text = last_denial_time(current_time)
+    ET.SubElement(denial, "license_server", display_value=license_server["license_server"]).text = license_server["license_server_sys_id"]
+    ET.SubElement(denial, "license_type", display_value=license_type["license_type"]).text = license_type["license_type_sys_id"]
+    ET.SubElement(denial, "norm_product", display_value=discovery["norm_product"]).text = discovery["norm_product_sys_id"]
+    ET.SubElement(denial, "norm_publisher", display_value=discovery["norm_publisher"]).text = discovery["norm_publisher_sys_id"]
+    ET.SubElement(denial, "product").text = discovery["product"]
+    ET.SubElement(denial, "publisher").text = discovery["publisher"]
+    ET.SubElement(denial, "source").text = "OpeniT"
+    ET.SubElement(denial, "sys_created_by").text = "admin"
+    ET.SubElement(denial, "sys_created_on").text = current_time
+    ET.SubElement(denial, "sys_domain").text = generate_unique_hash()
+    ET.SubElement(denial, "sys_domain_path").text = "/"
+    ET.SubElement(denial, "sys_id").text = generate_unique_hash()
+    ET.SubElement(denial, "sys_mod_count").text = str(random.randint(1, 100))
+    ET.SubElement(denial, "sys_updated_by").text = "admin"
+    ET.SubElement(denial, "sys_updated_on").text = current_time
+    ET.SubElement(denial, "total_denial_count").text = str(record_data["value"])  # Use "value" as "total_denial_count"
+    ET.SubElement(denial, "user", display_value=user["user"]).text = user["user_sys_id"]
+    ET.SubElement(denial, "version").text = "2020"
+    ET.SubElement(denial, "workstation", display_value=user["workstation"]).text = user["workstation_sys_id"]
+    return denial
+
+def serialize_xml(root):
+    return ET.tostring(root, pretty_print=True, encoding="utf-8").decode("utf-8")
+
+
+# Variable slots of each record template, in document order
+CONCURRENT_SLOTS = ("record_num", "value", "sys_domain", "sys_id", "sys_mod_count", "date")
+DENIAL_SLOTS = (
+    "computer_name", "computer_sys_id", "date", "record_num", "group", "group_sys_id", "last_denial_time",
+    "license_server", "license_server_sys_id", "license_type", "license_type_sys_id",
+    "sys_domain", "sys_id", "sys_mod_count", "value",
+    "user", "user_sys_id", "workstation", "workstation_sys_id",
+)
+LICENSE_SLOTS = (
+    "end_date", "license_id", "license_server", "license_server_sys_id",
+    "license_type", "license_type_sys_id", "quantity", "sys_domain", "sys_id", "sys_mod_count",
+)
+
+
+# Build a template element with the regular builder, leaving the global RNG untouched
+def _build_template_record(builder, *args):
+    state = random.getstate()
+    try:
+        record = builder(*args)
+    finally:
+        random.setstate(state)
+    for name in ("sys_domain", "sys_id", "sys_mod_count", "last_denial_time", "end_date", "license_id"):
+        field = record.find(name)
+        if field is not None:
+            field.text = slot(name)
+    return record
+
+# Placeholder dict standing in for a reference row
+def _slot_row(*keys):
+    return {key: slot(key) for key in keys}
+
+
+def compile_concurrent_template(discovery, current_time=CURRENT_TIME):
+    record = _build_template_record(
+        generate_concurrent_record, _slot_row("record_num", "value", "date"), discovery, current_time
+    )
+    return RecordTemplate(record, CONCURRENT_SLOTS)
+
+def compile_denial_template(discovery, current_time=CURRENT_TIME):
+    record = _build_template_record(
+        generate_denial_record,
+        _slot_row("record_num", "value", "date"),
+        discovery,
+        _slot_row("computer_name", "computer_sys_id", "user", "user_sys_id", "workstation", "workstation_sys_id"),
+        _slot_row("group", "group_sys_id"),
+        _slot_row("license_server", "license_server_sys_id"),
+        _slot_row("license_type", "license_type_sys_id"),
+        current_time,
+    )
+    return RecordTemplate(record, DENIAL_SLOTS)
+
+def compile_license_template(discovery, current_time=CURRENT_TIME):
+    record = _build_template_record(
+        generate_license_record,
+        discovery,
+        0,
+        _slot_row("license_server", "license_server_sys_id"),
+        _slot_row("license_type", "license_type_sys_id"),
+        current_time,
+    )
+    record.find("quantity").text = slot("quantity")
+    return RecordTemplate(record, LICENSE_SLOTS)
+
+
+# Per-run cache of compiled templates and pre-escaped reference rows
+class RecordTemplates:
+    """
+    Emits serialized records from templates compiled once per discovery model.
+
+    Reference rows (users, groups, license servers, license types) are escaped once on first
+    use. sys_ids come from ids, by default an IdPool seeded from the global RNG, and
+    sys_mod_counts from mod_counts, by default random.randint. Given an ids callable that
+    wraps generate_unique_hash, the random draws happen in the same order as in the
+    element-tree builders, so a seeded run produces the same bytes through either path.
+    Generation runs pass the batched pools of their RandomStreams instead.
+    """
+
+    def __init__(self, reference, current_time, ids=None, mod_counts=None):
+        self.reference = reference
+        self.current_time = current_time
+        self.ids = ids if ids is not None else IdPool(seed=random.getrandbits(64))
+        self.mod_counts = mod_counts if mod_counts is not None else lambda: random.randint(1, 100)
+        self._last_denial_time = last_denial_time(current_time).encode()
+        self._end_date = license_end_date(current_time).encode()
+        self._templates = {}
+        self._rows = {}
+
+    def _template(self, compile_template, discovery):
+        key = (compile_template, id(discovery))
+        template = self._templates.get(key)
+        if template is None:
+            template = self._templates[key] = compile_template(discovery, self.current_time)
+        return template
+
+    # Escaped (display_value, sys_id) pairs of a reference row, flattened
+    def _row(self, table, index, *fields):
+        key = (table, index)
+        row = self._rows.get(key)
+        if row is None:
+            values = self.reference[table][index]
+            row = self._rows[key] = tuple(
+                escape_attribute(values[field]) if i % 2 == 0 else escape_text(values[field])
+                for i, field in enumerate(fields)
+            )
+        return row
+
+    def concurrent(self, record_data, discovery):
+        return self._template(compile_concurrent_template, discovery).render(
+            str(record_data["record_num"]).encode(),
+            str(record_data["value"]).encode(),
+            self.ids(),
+            self.ids(),
+            str(self.mod_counts()).encode(),
+            record_data["date"].encode(),
+        )
+
+    def denial(self, record_data, discovery_idx, user_idx, group_idx, license_server_idx, license_type_idx):
+        user = self._row("USER_NAMES", user_idx, "computer_name", "computer_sys_id", "user", "user_sys_id",
+                         "workstation", "workstation_sys_id")
+        group = self._row("GROUP_NAMES", group_idx, "group", "group_sys_id")
+        license_server = self._row("LICENSE_SERVER_VALUES", license_server_idx, "license_server", "license_server_sys_id")
+        license_type = self._row("LICENSE_TYPE_VALUES", license_type_idx, "license_type", "license_type_sys_id")
+        template = self._template(compile_denial_template, self.reference["DISCOVERY_MODELS"][discovery_idx])
+        return template.render(
+            user[0], user[1],
+            record_data["date"].encode(),
+            str(record_data["record_num"]).encode(),
+            group[0], group[1],
+            self._last_denial_time,
+            license_server[0], license_server[1],
+            license_type[0], license_type[1],
+            self.ids(),
+            self.ids(),
+            str(self.mod_counts()).encode(),
+            str(record_data["value"]).encode(),
+            user[2], user[3], user[4], user[5],
+        )
+
+    def concurrents(self, concurrent, product_models):
+        """
+        Serialized records of a ConcurrentColumns, in order: for every sample, one record per
+        product that has a discovery model; the same bytes as concurrent() per record.
+
+        product_models holds the discovery model of every usage column, or None for a product
+        without one. Record numbers and values are encoded CONCURRENT_BLOCK_ROWS samples at a time.
+        """
+        present = [column for column, discovery in enumerate(product_models) if discovery]
+        if not present:
+            return
+        renders = [self._template(compile_concurrent_template, product_models[column]).render for column in present]
+        ids, mod_counts = self.ids, self.mod_counts
+
+        for start in range(0, len(concurrent.sample_times), CONCURRENT_BLOCK_ROWS):
+            stop = start + CONCURRENT_BLOCK_ROWS
+            sample_times = concurrent.sample_times[start:stop].tolist()
+            first = concurrent.start + start + 1
+            record_nums = [str(n).encode() for n in range(first, first + len(sample_times))]
+            usages = concurrent.usage[start:stop, present].tolist()
+            for record_num, sample_time, usage in zip(record_nums, sample_times, usages):
+                for render, value in zip(renders, usage):
+                    yield render(record_num, str(value).encode(), ids(), ids(), str(mod_counts()).encode(), sample_time)
+
+    def denials(self, denials):
+        """
+        Serialized records of a DenialColumns, in order; the same bytes as denial() per row.
+
+        Reference rows and templates are resolved once per distinct index rather than once per
+        record, and the varying fields are encoded column by column, DENIAL_BLOCK_ROWS denials
+        at a time.
+        """
+        for start in range(0, denial_count(denials), DENIAL_BLOCK_ROWS):
+            yield from self._denial_block(slice_denials(denials, start, start + DENIAL_BLOCK_ROWS))
+
+    def _denial_block(self, denials):
+        discovery_models = self.reference["DISCOVERY_MODELS"]
+        discovery, user, group, license_server, license_type = denials.indexes.T
+
+        # Escaped row of every denial, looked up from the distinct rows of each table
+        def rows(table, indexes, *fields):
+            distinct, inverse = np.unique(indexes, return_inverse=True)
+            resolved = [self._row(table, index, *fields) for index in distinct.tolist()]
+            return [resolved[i] for i in inverse.tolist()]
+
+        users = rows("USER_NAMES", user, "computer_name", "computer_sys_id", "user", "user_sys_id",
+                     "workstation", "workstation_sys_id")
+        groups = rows("GROUP_NAMES", group, "group", "group_sys_id")
+        license_servers = rows("LICENSE_SERVER_VALUES", license_server, "license_server", "license_server_sys_id")
+        license_types = rows("LICENSE_TYPE_VALUES", license_type, "license_type", "license_type_sys_id")
+        distinct, inverse = np.unique(discovery, return_inverse=True)
+        renders = [self._template(compile_denial_template, discovery_models[index]).render
+                   for index in distinct.tolist()]
+        renders = [renders[i] for i in inverse.tolist()]
+
+        dates = denials.dates.tolist()
+        record_nums = [str(sample + 1).encode() for sample in denials.samples.tolist()]
+        counts = [str(count).encode() for count in denials.counts.tolist()]
+        ids, mod_counts, last_denial = self.ids, self.mod_counts, self._last_denial_time
+        for render, user, date, record_num, group, license_server, license_type, count in zip(
+            renders, users, dates, record_nums, groups, license_servers, license_types, counts
+        ):
+            yield render(
+                user[0], user[1], date, record_num, group[0], group[1], last_denial,
+                license_server[0], license_server[1], license_type[0], license_type[1],
+                ids(), ids(), str(mod_counts()).encode(), count,
+                user[2], user[3], user[4], user[5],
+            )
+
+    def license(self, discovery, quantity, license_server_idx, license_type_idx):
+        license_server = self._row("LICENSE_SERVER_VALUES", license_server_idx, "license_server", "license_server_sys_id")
+        license_type = self._row("LICENSE_TYPE_VALUES", license_type_idx, "license_type", "license_type_sys_id")
+        return self._template(compile_license_template, discovery).render(
+            self._end_date,
+            self.ids(),
+            license_server[0], license_server[1],
+            license_type[0], license_type[1],
+            str(int(quantity)).encode(),
+            self.ids(),
+            self.ids(),
+            str(self.mod_counts()).encode(),
+        )
+
+
+# Denials resolved and encoded at a time by RecordTemplates.denials, bounding its per-row lists
+DENIAL_BLOCK_ROWS = 65536
+
+# Samples encoded at a time by RecordTemplates.concurrents
+CONCURRENT_BLOCK_ROWS = 65536
+
+# Planned records of one run, before any XML is built; sample_times holds the formatted time of
+# every sample as a bytes array
+RecordPlan = namedtuple("RecordPlan", ["series", "products", "product_usage", "sample_times", "denials"])
+
+# Planned concurrent samples as columns: start is the sample index of the first row (record_num - 1),
+# sample_times the bytes time of every row and usage its (samples x products) product usage
+ConcurrentColumns = namedtuple("ConcurrentColumns", ["start", "sample_times", "usage"])
+
+# Planned denials as columns, one row per denial
+# - samples: int64 sample index of every denial (record_num - 1); dates: its sample time as bytes
+# - counts: int32 total_denial_count; indexes: int32 (denials x 5) rows into DENIAL_TABLES
+DenialColumns = namedtuple("DenialColumns", ["samples", "dates", "counts", "indexes"])
+
+
+# Number of planned denials
+def denial_count(denials):
+    return len(denials.samples)
+
+# Denials start to stop of a DenialColumns, as a DenialColumns
+def slice_denials(denials, start, stop):
+    return DenialColumns(*(column[start:stop] for column in denials))
+
+# Samples start to stop of a plan as ConcurrentColumns; views of the plan's arrays, nothing is copied
+def concurrent_columns(plan, start=0, stop=None):
+    stop = len(plan.sample_times) if stop is None else stop
+    return ConcurrentColumns(start, plan.sample_times[start:stop], plan.product_usage[start:stop])
+
+
+# Rows of the usage split computed per block, bounding the float temporaries to about this many cells
+SPLIT_BLOCK_CELLS = 4_000_000
+
+# Ways split_usage can allocate usage to products
+SPLIT_METHODS = ("weighted", "multinomial")
+
+
+def split_usage(values, weights, rng, method="weighted"):
+    """
+    Splits every sample's usage across products in proportion to their weights.
+
+    - "weighted": each product gets the floor or the ceiling of its exact share. The units
+      left over after flooring go out by systematic sampling over the cumulative shares with
+      one uniform offset per sample, so a product's expected usage equals its exact share.
+    - "multinomial": every unit of usage is assigned independently, one multinomial draw
+      per sample.
+
+    Both are computed for the whole series at once, so hundreds of products over hundreds of
+    thousands of samples stay practical.
+
+    Args:
+    - values (numpy array): Total usage per sample.
+    - weights (sequence): Non-negative weight per product.
+    - rng (numpy.random.Generator): Source of the allocation randomness.
+    - method (str): "weighted" or "multinomial".
+
+    Returns:
+    - numpy array: samples x products int32 usage, each row summing to its value.
+
+    Raises:
+    - ValueError: If the weights are not finite, negative or all zero, or the method is unknown.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    if len(weights) == 0 or not np.isfinite(weights).all() or (weights < 0).any() or weights.sum() <= 0:
+        raise ValueError("Product weights must be finite and non-negative with a positive total.")
+    shares = weights / weights.sum()
+    values = np.asarray(values, dtype=np.int64)
+
+    if method == "multinomial":
+        return rng.multinomial(values, shares).astype(np.int32)
+    if method != "weighted":
+        raise ValueError(f"Unknown split method: {method}")
+
+    product_usage = np.empty((len(values), len(shares)), dtype=np.int32)
+    block_rows = max(1, SPLIT_BLOCK_CELLS // len(shares))
+    for start in range(0, len(values), block_rows):
+        block = values[start:start + block_rows, None]
+        offsets = rng.random((len(block), 1))
+
+        # Unit boundaries crossed by the shifted cumulative shares; the last one is the total
+        bounds = np.minimum(np.floor(np.cumsum(block * shares, axis=1) + offsets), block)
+        bounds[:, -1] = block[:, 0]
+        product_usage[start:start + len(block)] = np.diff(bounds, axis=1, prepend=0)
+    return product_usage
+
+
+# Run the increment/denial/decrement state machine over the date range
+def plan_records(reference, start_date, end_date, quantity, num_records, range_start, range_end,
+                 interval=DAILY, products=None, weights=None, split_method="weighted", streams=None,
+                 shape=DEFAULT_SHAPE, shape_options=None):
+    """
+    Works out every concurrent data point and denial for a date range without building any XML.
+
+    The range is sampled every `interval` (one day by default), from midnight of start_date
+    to the end of end_date. Daily samples are dated YYYY-MM-DD, finer ones carry a full
+    YYYY-MM-DD HH:MM:SS timestamp in usage_date and denial_date.
+
+    Each sample's usage is split across `products` (CONCURRENT_PRODUCTS by default) in
+    proportion to `weights` (equal by default) with split_usage.
+
+    The usage curve comes from the registered usage `shape` (see usage_shapes), configured by
+    `shape_options`; the default sawtooth is the increment/denial/decrement state machine.
+
+    The denial-run lengths, the shape's own noise, the usage split and the reference rows of
+    every denial are drawn in bulk from the DENIAL_COUNTS, USAGE_SHAPE, USAGE_NOISE and
+    REFERENCE_PICKS streams of `streams` (by default seeded from the global RNG).
+
+    Returns:
+    - RecordPlan: The usage series, the concurrent products and their per-sample usage
+      (samples x products int32), plus the columns the emitters consume:
+      - sample_times: Formatted time of every sample, as a fixed-width bytes array.
+      - denials: DenialColumns with the sample, time, count and reference rows of every
+        denial, the rows being drawn as one (denials x tables) index array.
+    """
+    sizes = reference.sizes
+    products = list(CONCURRENT_PRODUCTS if products is None else products)
+    if weights is None:
+        weights = [1] * len(products)
+    if len(weights) != len(products):
+        raise ValueError(f"Expected {len(products)} product weights, got {len(weights)}.")
+
+    streams = _default_streams(streams)
+
+    # Compute the whole curve at once
+    total_samples = sample_count(start_date, end_date, interval)
+    context = ShapeContext(
+        start_date, np.datetime64(start_date, "D") + np.arange(total_samples) * interval, interval, quantity,
+        num_records, range_start, range_end, streams.generator(USAGE_SHAPE), streams.generator(DENIAL_COUNTS)
+    )
+    series = shape_series(shape, context, shape_options)
+    product_usage = split_usage(series.values, weights, streams.generator(USAGE_NOISE), split_method)
+
+    # Format the sample times for the entire range in bulk
+    sample_times = sample_time_bytes(series.dates)
+
+    # One index column per reference table, drawn for all denials at once
+    denial_samples = np.flatnonzero(series.denial_mask)
+    picks = streams.generator(REFERENCE_PICKS)
+    indexes = np.empty((len(denial_samples), len(DENIAL_TABLES)), dtype=np.int32)
+    for column, table in enumerate(DENIAL_TABLES):
+        indexes[:, column] = picks.integers(sizes[table], size=len(denial_samples))
+    denials = DenialColumns(denial_samples, sample_times[denial_samples], series.denial_counts[denial_samples], indexes)
+
+    return RecordPlan(series, products, product_usage, sample_times, denials)
+
+# Streams for callers that seed the global RNG instead of passing RandomStreams
+def _default_streams(streams):
+    return streams if streams is not None else RandomStreams(random.getrandbits(63))
+
+# Record templates drawing sys_ids and sys_mod_counts from the batched pools of streams
+def _record_templates(reference, current_time, streams):
+    if streams is None:
+        return RecordTemplates(reference, current_time)
+    return RecordTemplates(reference, current_time, streams.ids(), streams.mod_counts())
+
+# Concurrent products that have no discovery model in the catalog
+def find_missing_products(reference, products):
+    return [product for product in products if reference.discovery_for_product(product) is None]
+
+# Announce a run's plan and expected record counts to its progress; raises if it was cancelled
+def begin_progress(progress, reference, plan, license_quantities):
+    missing = find_missing_products(reference, plan.products)
+    present = [i for i, product in enumerate(plan.products) if product not in missing]
+    totals = {
+        "denial": denial_count(plan.denials),
+        "concurrent": len(plan.sample_times) * len(present),
+        "license": min(len(license_quantities), reference.sizes["DISCOVERY_MODELS"]),
+    }
+    progress.begin(plan, totals, present)
+
+def prepare_run(reference, start_date, end_date, quantity, num_records, range_start, range_end, streams,
+                timer, progress, current_time=None, **plan_options):
+    """
+    Shared start of every generator: validates the license quantities, plans the usage and
+    announces the plan to progress, before anything is written.
+
+    Args:
+    - streams, timer, progress: The run's RandomStreams, StageTimer and GenerationProgress.
+    - current_time (str): Creation/update timestamp of the records. Defaults to now.
+    - plan_options: interval, products, weights, split_method, shape and shape_options, passed
+      on to plan_records.
+    - The other arguments are those of generate_unloads.
+
+    Returns:
+    - tuple: (current_time, license_quantities, plan).
+
+    Raises:
+    - GenerationCancelled: If progress was cancelled while planning.
+    """
+    if current_time is None:
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    with timer.stage("license quantities") as stage:
+        license_quantities = generate_distinct_numbers_with_constraints(quantity, max_gap=5)
+        stage["records"] = len(license_quantities)
+
+    with timer.stage("usage plan") as stage:
+        plan = plan_records(
+            reference, start_date, end_date, quantity, num_records, range_start, range_end, streams=streams,
+            **plan_options
+        )
+        stage["records"] = len(plan.sample_times)
+    begin_progress(progress, reference, plan, license_quantities)
+    return current_time, license_quantities, plan
+
+# Write the planned denials (DenialColumns) to a writer
+def emit_denial_records(writer, reference, denials, current_time, streams=None):
+    append = writer.append_serialized
+    for record in _record_templates(reference, current_time, streams).denials(denials):
+        append(record)
+
+# Write one concurrent record per product for each planned sample (ConcurrentColumns)
+def emit_concurrent_records(writer, reference, concurrent, current_time, products=CONCURRENT_PRODUCTS,
+                            streams=None):
+    # Find the correct discovery model for each product from the CSV
+    product_models = [reference.discovery_for_product(product) for product in products]
+    append = writer.append_serialized
+    for record in _record_templates(reference, current_time, streams).concurrents(concurrent, product_models):
+        append(record)
+
+# Write one license record per license quantity
+def emit_license_records(writer, reference, license_quantities, current_time, streams=None):
+    streams = _default_streams(streams)
+    templates = _record_templates(reference, current_time, streams)
+    discovery_models = reference["DISCOVERY_MODELS"][:len(license_quantities)]
+    picks = streams.generator(REFERENCE_PICKS)
+    license_servers = picks.integers(reference.sizes["LICENSE_SERVER_VALUES"], size=len(discovery_models)).tolist()
+    license_types = picks.integers(reference.sizes["LICENSE_TYPE_VALUES"], size=len(discovery_models)).tolist()
+    for discovery, qty, license_server_idx, license_type_idx in zip(
+        discovery_models, license_quantities, license_servers, license_types
+    ):
+        writer.append_serialized(templates.license(discovery, qty, license_server_idx, license_type_idx))
+
+
+# Run the increment/denial/decrement engine and stream all three unloads to the output
+def generate_unloads(output, reference, start_date, end_date, quantity, num_records,
+                     range_start, range_end, current_time=None, timer=None, interval=DAILY,
+                     products=None, weights=None, split_method="weighted", streams=None,
+                     shape=DEFAULT_SHAPE, shape_options=None, progress=None):
+    """
+    Generates the concurrent, denial and license records for a date range.
+
+    The unloads are written one after another, so each writer is open only while its
+    records are emitted.
+
+    Args:
+    - output (UnloadOutput): Destination for the unload documents.
+    - reference (ReferenceCatalog): Reference tables as returned by load_reference_data.
+    - start_date, end_date (date): Inclusive date range.
+    - quantity (int): Threshold/peak value.
+    - num_records (int): Number of records needed to reach the peak.
+    - range_start, range_end (int): Bounds for the number of denials per peak.
+    - current_time (str): Creation/update timestamp stamped on every record. Defaults to now.
+    - timer (StageTimer): Collects the per-stage timings. A new one is used when omitted.
+    - interval (numpy timedelta64): Time between concurrent points, one day by default.
+    - products, weights, split_method: Concurrent products and how usage is split across them
+      (see plan_records).
+    - shape, shape_options: Registered usage shape of the curve and its options (see usage_shapes).
+    - streams (RandomStreams): Source of all randomness; the plan draws from its root streams
+      and each unload from its child(kind) streams. Seeded from the global RNG when omitted.
+    - progress (GenerationProgress): Receives the plan and the records written so far; its
+      cancel() stops the run. A new one is used when omitted.
+
+    Returns:
+    - GenerationResult: Columnar view of the generated usage and denials, with the output
+      path, record count and stage timings of each unload.
+
+    Raises:
+    - GenerationCancelled: If progress was cancelled; the files written so far are incomplete.
+    """
+    timer = timer or StageTimer()
+    progress = progress or GenerationProgress()
+    streams = _default_streams(streams)
+    current_time, license_quantities, plan = prepare_run(
+        reference, start_date, end_date, quantity, num_records, range_start, range_end, streams, timer, progress,
+        current_time, interval=interval, products=products, weights=weights, split_method=split_method,
+        shape=shape, shape_options=shape_options
+    )
+
+    counts = {}
+    emitters = (
+        ("denial", lambda writer: emit_denial_records(
+            writer, reference, plan.denials, current_time, streams.child("denial")
+        )),
+        ("concurrent", lambda writer: emit_concurrent_records(
+            writer, reference, concurrent_columns(plan), current_time, plan.products, streams.child("concurrent")
+        )),
+        ("license", lambda writer: emit_license_records(
+            writer, reference, license_quantities, current_time, streams.child("license")
+        )),
+    )
+    for kind, emit in emitters:
+        with timer.stage(f"{kind} records") as stage:
+            with output.writer(kind, UNLOAD_FILE_NAMES[kind], current_time) as writer:
+                with progress.track(kind, writer) as tracked:
+                    emit(tracked)
+            counts[kind] = stage["records"] = writer.record_count
+            stage["bytes"] = writer.bytes_written
+
+    return GenerationResult(plan, find_missing_products(reference, plan.products), output.paths, counts,
+                            output.bundle_path, timer, seed=streams.seed)
+
+
+# Generate all three unloads into output_dir and return their paths
+def generate_to_directory(output_dir, reference, start_date, end_date, quantity, num_records,
+                          range_start, range_end, workers=1, seed=None, compression="none", level=None,
+                          timer=None, interval=DAILY, products=None, weights=None, split_method="weighted",
+                          part_records=None, part_bytes=None, output_format="xml", current_time=None,
+                          shape=DEFAULT_SHAPE, shape_options=None, progress=None):
+    """
+    Generates the three unload files into output_dir.
+
+    With workers > 1 the record emission is sharded across processes (see sharded_generator).
+    All randomness comes from RandomStreams(seed); an unseeded run draws a fresh seed and
+    reports it as result.seed. The same seed, worker count and current_time (the creation
+    timestamp, now by default) reproduce byte-identical files. compression and level select
+    plain, gzip or zstd files, or a single zip bundle; part_records and part_bytes split every
+    unload into numbered parts in a zip bundle with a manifest (see UnloadOutput). Stage timings are
+    collected into timer, or a new StageTimer, and published as result.timings.
+    interval sets the time between concurrent points; products, weights and split_method pick the
+    concurrent products and how usage is split across them (see plan_records); shape and
+    shape_options pick the usage curve (see usage_shapes).
+    output_format "csv", "jsonl" or "parquet" writes the records as tables instead of unload XML
+    (see columnar_export); those are generated in this process whatever the worker count.
+    progress (a GenerationProgress) follows the records written and can cancel the run, which
+    then raises GenerationCancelled (see generation_progress).
+
+    Returns:
+    - GenerationResult: Columnar usage and denial data, plus the file path and record count
+      of each unload and the concurrent products with no matching discovery model.
+    """
+    # Settings every generator takes the same way
+    run_options = dict(
+        current_time=current_time, timer=timer, interval=interval, products=products, weights=weights,
+        split_method=split_method, shape=shape, shape_options=shape_options, progress=progress
+    )
+    run_range = (reference, start_date, end_date, quantity, num_records, range_start, range_end)
+
+    if output_format != "xml":
+        from columnar_export import generate_columnar
+        if part_records is not None or part_bytes is not None:
+            raise ValueError("Only XML unloads can be split into parts.")
+        return generate_columnar(
+            output_dir, *run_range, output_format, compression=compression, level=level,
+            streams=RandomStreams(seed), **run_options
+        )
+
+    if workers > 1:
+        from sharded_generator import generate_sharded
+        return generate_sharded(
+            output_dir, *run_range, workers, seed=seed, compression=compression, level=level,
+            part_records=part_records, part_bytes=part_bytes, **run_options
+        )
+
+    with UnloadOutput(output_dir, compression, level, part_records, part_bytes) as output:
+        return generate_unloads(output, *run_range, streams=RandomStreams(seed), **run_options)
@@ -0,0 +1,220 @@
+import argparse
+import sys
+from datetime import date, datetime
+from cd_generator import SPLIT_METHODS, UNLOAD_FILE_NAMES, generate_to_directory
+from columnar_export import EXPORT_SUFFIXES
+from reference_loader import load_reference_data
+from servicenow_upload import DEFAULT_PATH_TEMPLATE, UNLOAD_TABLES, ServiceNowUploader, UploadError, upload_unloads
+from unload_writer import COMPRESSION_SUFFIXES
+from usage_engine import DAILY, parse_interval
+from usage_shapes import DEFAULT_SHAPE, USAGE_SHAPES
+
+
+# Parse a YYYY-MM-DD command line argument
+def parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid date '{value}', expected YYYY-MM-DD.")
+
+# Parse a YYYY-MM-DD HH:MM:SS creation timestamp, kept as the text stamped on the records
+def timestamp(value):
+    try:
+        datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid timestamp '{value}', expected YYYY-MM-DD HH:MM:SS.")
+    return value
+
+# Parse a non-negative run seed
+def seed(value):
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"Expected a non-negative seed, got {value}.")
+    return number
+
+# Parse a sampling interval argument such as 15m, 1h or 1d
+def interval(value):
+    try:
+        return parse_interval(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+# Parse a comma-separated list of product weights
+def weight_list(value):
+    try:
+        return [float(weight) for weight in value.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid weights '{value}', expected comma-separated numbers.")
+
+# Parse a usage shape option such as cycles=4, kept as a (name, float value) pair
+def shape_option(value):
+    name, separator, number = value.partition("=")
+    try:
+        if not separator:
+            raise ValueError
+        return name.strip(), float(number)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid shape option '{value}', expected NAME=NUMBER.")
+
+# Parse a staging table mapping such as denial=u_denial_import, kept as a (name, staging table) pair
+def staging_table(value):
+    name, separator, staging = value.partition("=")
+    if not separator or not name.strip() or not staging.strip():
+        raise argparse.ArgumentTypeError(f"Invalid staging table '{value}', expected KIND_OR_TABLE=STAGING_TABLE.")
+    return name.strip(), staging.strip()
+
+# Parse a byte size such as 500000, 512K, 50M or 1G
+def byte_size(value):
+    multipliers = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    text = value.strip().upper().removesuffix("B")
+    try:
+        size = int(text[:-1]) * multipliers[text[-1]] if text[-1:] in multipliers else int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid size '{value}', expected e.g. 500000, 512K or 50M.")
+    if size < 1:
+        raise argparse.ArgumentTypeError(f"Expected a positive size, got {value}.")
+    return size
+
+# Parse a strictly positive integer command line argument
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"Expected a positive integer, got {value}.")
+    return number
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cdgen", description="Headless CD Generator for ServiceNow SAM unload files.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate = subparsers.add_parser("generate", help="Generate concurrent, denial and license unload XML files.")
+    generate.add_argument("--start", type=parse_date, required=True, help="First day of the date range (YYYY-MM-DD).")
+    generate.add_argument("--end", type=parse_date, required=True, help="Last day of the date range (YYYY-MM-DD).")
+    generate.add_argument("--quantity", type=positive_int, required=True, help="Threshold/peak value.")
+    generate.add_argument("--num-records", type=positive_int, required=True, help="Number of records to reach the peak.")
+    generate.add_argument("--interval", type=interval, default=DAILY,
+                          help="Time between concurrent points, e.g. 15m, 1h, 6h or 1d (default: 1d).")
+    generate.add_argument("--denial-start", type=positive_int, default=1, help="Denial range start (default: 1).")
+    generate.add_argument("--denial-end", type=positive_int, default=1, help="Denial range end (default: 1).")
+    generate.add_argument("--products", default=None,
+                          help="Comma-separated concurrent products, or 'all' for every discovery model "
+                               "(default: the three built-in products).")
+    generate.add_argument("--weights", type=weight_list, default=None,
+                          help="Comma-separated weight per product (default: equal weights).")
+    generate.add_argument("--split", choices=SPLIT_METHODS, default="weighted",
+                          help="How usage is split across products (default: weighted).")
+    generate.add_argument("--shape", choices=list(USAGE_SHAPES), default=DEFAULT_SHAPE,
+                          help=f"Shape of the usage curve (default: {DEFAULT_SHAPE}).")
+    generate.add_argument("--shape-option", dest="shape_options", type=shape_option, action="append", default=[],
+                          metavar="NAME=NUMBER",
+                          help="Override an option of the usage shape, e.g. cycles=4; may be repeated.")
+    generate.add_argument("--workers", type=positive_int, default=1,
+                          help="Worker processes; above 1 the records are generated in parallel shards (default: 1).")
+    generate.add_argument("--seed", type=seed, default=None,
+                          help="Seed for a reproducible run; unseeded runs print the seed they drew.")
+    generate.add_argument("--timestamp", type=timestamp, default=None,
+                          help="Creation time stamped on the records, YYYY-MM-DD HH:MM:SS (default: now). "
+                               "With a seed it makes the output byte-identical across runs.")
+    generate.add_argument("--format", dest="output_format", choices=["xml", *EXPORT_SUFFIXES], default="xml",
+                          help="Write unload XML, or the same records as CSV, JSON Lines or Parquet tables "
+                               "with samp_eng_app_* column names (default: xml).")
+    generate.add_argument("--compression", choices=list(COMPRESSION_SUFFIXES), default="none",
+                          help="Write .gz or .zst files, or one zip bundle of all unloads; Parquet uses it as "
+                               "its page codec (default: none).")
+    generate.add_argument("--level", type=int, default=None, help="Compression level (default: library default).")
+    generate.add_argument("--part-records", type=positive_int, default=None,
+                          help="Split every unload into parts of at most this many records.")
+    generate.add_argument("--part-bytes", type=byte_size, default=None,
+                          help="Split every unload into parts of at most this size, e.g. 50M. "
+                               "Split unloads are delivered as one zip archive with a manifest.")
+    generate.add_argument("--data-dir", default=".", help="Directory holding the reference CSV files (default: .).")
+    generate.add_argument("--reference-snapshot", default=None,
+                          help="Pickle snapshot of the parsed reference tables, reused while the CSVs are unchanged.")
+    generate.add_argument("--out", required=True, help="Output directory for the unload XML files.")
+    generate.add_argument("--timings", default=None,
+                          help="Write the time, records and bytes of every generation stage to this JSON file.")
+
+    push = subparsers.add_parser("push", help="Upload generated unload files to a ServiceNow import set API.")
+    push.add_argument("paths", nargs="+", help="Unload files (.xml, .xml.gz, .xml.zst) or zip bundles to upload.")
+    push.add_argument("--url", required=True, help="Instance URL, e.g. https://dev12345.service-now.com.")
+    push.add_argument("--user", default=None, help="Basic auth user name.")
+    push.add_argument("--password", default=None, help="Basic auth password.")
+    push.add_argument("--token", default=None, help="Bearer token, used instead of basic auth.")
+    push.add_argument("--path-template", default=DEFAULT_PATH_TEMPLATE,
+                      help=f"Endpoint path; {{table}} is replaced by the record's staging table. Table API paths "
+                           f"such as /api/now/table/{{table}} get one record per request (default: {DEFAULT_PATH_TEMPLATE}).")
+    push.add_argument("--staging-table", dest="staging_tables", type=staging_table, action="append", default=[],
+                      metavar="KIND_OR_TABLE=STAGING_TABLE",
+                      help=f"Import set staging table for the records of an unload kind ({', '.join(UNLOAD_TABLES)}) "
+                           "or target table, e.g. denial=u_denial_import; may be repeated (default: the target "
+                           "table name).")
+    push.add_argument("--batch-size", type=positive_int, default=1000, help="Records per request (default: 1000).")
+    push.add_argument("--max-in-flight", type=positive_int, default=4, help="Concurrent requests (default: 4).")
+    push.add_argument("--max-retries", type=int, default=5,
+                      help="Retries per batch on throttling or server errors (default: 5).")
+    return parser
+
+
+def run_generate(args):
+    if args.end < args.start:
+        raise SystemExit("error: --end must not be before --start")
+    if args.denial_end < args.denial_start:
+        raise SystemExit("error: --denial-end must not be smaller than --denial-start")
+
+    reference = load_reference_data(args.data_dir, snapshot_path=args.reference_snapshot)
+    products = args.products
+    if products == "all":
+        products = reference.norm_products()
+    elif products is not None:
+        products = [product.strip() for product in products.split(",")]
+    try:
+        result = generate_to_directory(
+            args.out, reference, args.start, args.end, args.quantity, args.num_records,
+            args.denial_start, args.denial_end, workers=args.workers, seed=args.seed,
+            compression=args.compression, level=args.level, interval=args.interval,
+            products=products, weights=args.weights, split_method=args.split,
+            part_records=args.part_records, part_bytes=args.part_bytes, output_format=args.output_format,
+            current_time=args.timestamp, shape=args.shape, shape_options=dict(args.shape_options)
+        )
+    except (ValueError, ImportError) as e:
+        raise SystemExit(f"error: {e}")
+
+    for product in result.missing_products:
+        print(f"warning: discovery model not found for product: {product}", file=sys.stderr)
+    for kind in UNLOAD_FILE_NAMES:
+        print(f"{kind}: {result.counts[kind]} records -> {result.paths[kind]}")
+    print(f"seed: {result.seed}")
+    if args.timings:
+        with open(args.timings, "w") as timings_file:
+            timings_file.write(result.timings.to_json())
+
+
+def run_push(args):
+    def progress(report):
+        print(f"\r{report.records} records in {report.batches} batches", end="", file=sys.stderr, flush=True)
+
+    try:
+        with ServiceNowUploader(args.url, args.user, args.password, args.token, args.path_template,
+                                args.batch_size, args.max_in_flight, args.max_retries,
+                                staging_tables=dict(args.staging_tables)) as uploader:
+            report = upload_unloads(uploader, args.paths, progress)
+    except (UploadError, ValueError, ImportError, OSError) as e:
+        raise SystemExit(f"\nerror: {e}")
+
+    print(file=sys.stderr)
+    for table, count in report.tables.items():
+        print(f"{table}: {count} records")
+    print(f"{report.records} records in {report.batches} batches, {report.retries} retries, "
+          f"{report.seconds:.1f}s ({report.records_per_sec:,.0f} records/s)")
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "generate":
+        run_generate(args)
+    elif args.command == "push":
+        run_push(args)
+
+
+if __name__ == "__main__":
+    main()
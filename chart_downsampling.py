@@ -0,0 +1,99 @@
+import numpy as np
+
+# Ways to reduce a series to a point budget
+DOWNSAMPLING_METHODS = ("minmax", "lttb")
+
+
+# Datetime or numeric x values as float64, so distances and areas can be computed
+def _as_numeric(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").astype(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+# Slice of sorted x covering [lo, hi], plus one point beyond each edge so lines reach the border
+def visible_slice(x, x_range):
+    if x_range is None:
+        return slice(0, len(x))
+    lo = max(np.searchsorted(x, x_range[0], side="left") - 1, 0)
+    hi = min(np.searchsorted(x, x_range[1], side="right") + 1, len(x))
+    return slice(lo, hi)
+
+
+def minmax_indexes(y, buckets):
+    """
+    Indexes of the minimum and maximum of y in each of up to `buckets` equal-size buckets.
+
+    Keeps every peak and trough, so a value touching the threshold is never smoothed away.
+    The series is padded with its last value to a whole number of buckets and reshaped, so
+    the extremes of all buckets come from one argmin/argmax pass.
+    """
+    n = len(y)
+    size = -(-n // buckets)
+    rows = np.pad(np.asarray(y), (0, size * -(-n // size) - n), mode="edge").reshape(-1, size)
+    offsets = np.arange(len(rows)) * size
+    # A padded copy of the last value can only win where the real last value ties with it
+    extremes = np.concatenate((rows.argmin(axis=1) + offsets, rows.argmax(axis=1) + offsets))
+    return np.unique(np.minimum(extremes, n - 1))
+
+
+def lttb_indexes(x, y, threshold):
+    """
+    Indexes picked by Largest-Triangle-Three-Buckets downsampling.
+
+    Keeps the first and last point and, from each of threshold - 2 buckets in between, the
+    point forming the largest triangle with the previously kept point and the average of the
+    next bucket. Bucket averages are computed for all buckets at once; only the pick of each
+    bucket depends on the previous one.
+    """
+    n = len(y)
+    x = _as_numeric(x)
+    y = np.asarray(y, dtype=np.float64)
+    edges = (np.arange(threshold - 1) * (n - 2) // (threshold - 2)) + 1
+    edges[-1] = n - 1
+
+    counts = np.diff(edges)
+    average_x = np.append(np.add.reduceat(x[:-1], edges[:-1]) / counts, x[-1])
+    average_y = np.append(np.add.reduceat(y[:-1], edges[:-1]) / counts, y[-1])
+
+    picked = np.empty(threshold, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        areas = np.abs(
+            (x[previous] - average_x[bucket + 1]) * (y[lo:hi] - y[previous])
+            - (x[previous] - x[lo:hi]) * (average_y[bucket + 1] - y[previous])
+        )
+        previous = picked[bucket + 1] = lo + int(np.argmax(areas))
+    return picked
+
+
+def downsample(x, y, max_points, method="minmax", x_range=None):
+    """
+    Reduces a sorted series to at most max_points for plotting.
+
+    Args:
+    - x (numpy array): Sorted datetime64 or numeric x values.
+    - y (numpy array): Values, one per x.
+    - max_points (int): Point budget, roughly the plot width in pixels.
+    - method (str): "minmax" keeps each bucket's extremes, "lttb" keeps the visual shape.
+    - x_range (tuple): Optional visible (lo, hi) window; only that part is downsampled.
+
+    Returns:
+    - tuple: The kept x and y values.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    window = visible_slice(x, x_range)
+    x, y = x[window], y[window]
+    if len(x) <= max_points:
+        return x, y
+
+    if method == "minmax":
+        indexes = minmax_indexes(y, max_points // 2)
+    elif method == "lttb":
+        indexes = lttb_indexes(x, y, max_points)
+    else:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    return x[indexes], y[indexes]
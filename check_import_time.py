@@ -0,0 +1,73 @@
+import argparse
+import os
+import subprocess
+import sys
+
+# Modules that make up the UI-free generator core
+CORE_MODULES = ("cd_generator", "sharded_generator", "cdgen", "Random_curve")
+
+# Packages that belong to the UI or plotting stack and must load lazily
+HEAVY_PACKAGES = ("streamlit", "plotly", "matplotlib", "pandas")
+
+
+# Per-module import times of `import module` in a fresh interpreter, from -X importtime
+def import_times(module):
+    """
+    Imports a module in a fresh interpreter with -X importtime.
+
+    Returns:
+    - list: (imported module, self microseconds, cumulative microseconds) in import order.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr}")
+
+    times = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if self_us.strip().isdigit():
+            times.append((name.strip(), int(self_us), int(cumulative_us)))
+    return times
+
+
+# Problems found for one module: heavy packages it pulls in, or a blown time budget
+def check_module(module, budget_ms):
+    times = import_times(module)
+    problems = []
+
+    heavy = sorted({name.split(".")[0] for name, _, _ in times} & set(HEAVY_PACKAGES))
+    if heavy:
+        problems.append(f"{module} imports {', '.join(heavy)} at import time")
+
+    total_ms = next(cumulative for name, _, cumulative in times if name == module) / 1000
+    if total_ms > budget_ms:
+        slowest = sorted(times, key=lambda t: t[1], reverse=True)[:5]
+        detail = ", ".join(f"{name} {self_us / 1000:.0f} ms" for name, self_us, _ in slowest)
+        problems.append(f"{module} takes {total_ms:.0f} ms to import (budget {budget_ms} ms); slowest: {detail}")
+    return total_ms, problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that the generator core imports without the UI or plotting stack.")
+    parser.add_argument("modules", nargs="*", default=list(CORE_MODULES), help="Modules to check (default: the core).")
+    parser.add_argument("--budget-ms", type=float, default=1000, help="Maximum cumulative import time per module (default: 1000).")
+    args = parser.parse_args()
+
+    failures = []
+    for module in args.modules:
+        total_ms, problems = check_module(module, args.budget_ms)
+        print(f"{module:<20}{total_ms:>8.0f} ms  {'FAIL' if problems else 'ok'}")
+        failures.extend(problems)
+
+    for problem in failures:
+        print(f"error: {problem}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import os
+import shutil
+import tempfile
+from cd_generator import generate_to_directory
+from reference_loader import load_reference_data
+from result_cache import ResultCache, result_size
+
+CURRENT_TIME = "2024-01-01 00:00:00"
+
+
+# Generate a small run into its own directory under base_dir; returns (result, output_dir)
+def _run(base_dir, name, reference, seed):
+    output_dir = os.path.join(base_dir, name)
+    result = generate_to_directory(
+        output_dir, reference, "2024-01-01", "2024-01-31", 100, 10, 2, 5, seed=seed, current_time=CURRENT_TIME
+    )
+    return result, output_dir
+
+
+def check_eviction(reference, base_dir):
+    """
+    Fills a cache with room for two results and checks that it evicts the least recently used
+    one, deletes the evicted output, keeps the first of two results put under one key, and
+    deletes every output on clear().
+
+    Raises:
+    - AssertionError: On the first entry or directory that is not where it should be.
+    """
+    runs = {name: _run(base_dir, name, reference, seed) for seed, name in enumerate(("a", "b", "c", "d"))}
+    cache = ResultCache(max_bytes=2 * max(result_size(result) for result, _ in runs.values()))
+
+    for name in ("a", "b"):
+        cache.put(name, *runs[name])
+    # Using "a" makes "b" the least recently used entry
+    if cache.get("a") is not runs["a"][0]:
+        raise AssertionError("The cache did not return the result put under 'a'")
+    cache.put("c", *runs["c"])
+    if "b" in cache or os.path.exists(runs["b"][1]):
+        raise AssertionError("The least recently used entry 'b' was not evicted with its output")
+    if "a" not in cache or "c" not in cache or not os.path.exists(runs["a"][1]):
+        raise AssertionError("Entries within the budget were evicted")
+    if cache.total_bytes != sum(result_size(runs[name][0]) for name in ("a", "c")):
+        raise AssertionError(f"The cache counts {cache.total_bytes} bytes for entries 'a' and 'c'")
+
+    # A second result for a cached key is dropped in favour of the cached one
+    if cache.put("a", *runs["d"]) is not runs["a"][0] or os.path.exists(runs["d"][1]):
+        raise AssertionError("Putting a cached key did not keep the cached result and drop the new output")
+
+    # The most recent entry stays even when it alone is over the budget
+    cache.max_bytes = 1
+    result, output_dir = _run(base_dir, "e", reference, 4)
+    cache.put("e", result, output_dir)
+    if len(cache) != 1 or cache.get("e") is not result or not os.path.exists(output_dir):
+        raise AssertionError("An entry over the budget did not replace all others")
+
+    cache.clear()
+    if len(cache) or cache.total_bytes or os.path.exists(output_dir):
+        raise AssertionError("clear() left entries or output behind")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the eviction and clean-up of the result cache.")
+    parser.add_argument("--data-dir", default=".", help="Directory holding the reference CSV files (default: .).")
+    args = parser.parse_args()
+
+    base_dir = tempfile.mkdtemp(prefix="cdgen_check_")
+    try:
+        check_eviction(load_reference_data(args.data_dir), base_dir)
+    finally:
+        shutil.rmtree(base_dir, ignore_errors=True)
+    print("Result cache check passed: least recently used results are evicted and their output deleted.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import argparse
+import http.client
+import json
+import random
+from servicenow_stub import ServiceNowStub
+from servicenow_upload import ServiceNowUploader, UploadError
+
+TABLES = ("samp_eng_app_concurrent_usage", "samp_eng_app_denial")
+
+
+# (table, record) pairs alternating between TABLES
+def _records(count):
+    return [(TABLES[n % len(TABLES)], {"record_num": str(n)}) for n in range(count)]
+
+# Run fn with a stub server listening in the background
+def _with_stub(fail_rate, fn):
+    server = ServiceNowStub(fail_rate=fail_rate)
+    server.start()
+    try:
+        return fn(server)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def check_round_trip(records=5000, fail_rate=0.2, seed=0):
+    """
+    Uploads records to the stub while it fails fail_rate of the requests with 503, through the
+    Import Set batch path and the one-record-per-request Table API path.
+
+    Raises:
+    - AssertionError: If the stub did not receive every record exactly once per table, or the
+      injected failures were not retried.
+    """
+    random.seed(seed)
+    expected = {}
+    for table, _ in _records(records):
+        expected[table] = expected.get(table, 0) + 1
+
+    for path_template in ("/api/now/import/{table}/insertMultiple", "/api/now/table/{table}"):
+        def upload(server):
+            with ServiceNowUploader(server.url, path_template=path_template, batch_size=100, max_retries=20,
+                                    backoff=0.0) as uploader:
+                return uploader.upload(_records(records)), server.stats()
+
+        report, stats = _with_stub(fail_rate, upload)
+        if stats["rows"] != expected or report.tables != expected or report.records != records:
+            raise AssertionError(f"{path_template}: sent {expected}, stub received {stats['rows']}, "
+                                 f"report counted {report.tables}")
+        if fail_rate and (not stats["failures"] or report.retries != stats["failures"]):
+            raise AssertionError(f"{path_template}: {stats['failures']} injected failures but "
+                                 f"{report.retries} retries")
+
+
+def check_failures():
+    """
+    Checks that the stub's Table API rejects batch bodies like an instance, and that an upload
+    fails with UploadError when a request is rejected or keeps failing after all retries.
+
+    Raises:
+    - AssertionError: If a batch body is accepted or either upload succeeds.
+    """
+    def post_batch(server):
+        connection = http.client.HTTPConnection(*server.server_address[:2])
+        connection.request("POST", f"/api/now/table/{TABLES[0]}", json.dumps({"records": [{"record_num": "0"}]}),
+                           {"Content-Type": "application/json"})
+        return connection.getresponse().status
+
+    status = _with_stub(0.0, post_batch)
+    if status != 400:
+        raise AssertionError(f"The Table API answered a batch body with {status} instead of 400")
+
+    cases = (
+        # Rejected (404) requests are not retried
+        (0.0, dict(path_template="/api/now/unknown/{table}")),
+        (1.0, dict(max_retries=2)),
+    )
+    for fail_rate, options in cases:
+        def upload(server):
+            with ServiceNowUploader(server.url, backoff=0.0, **options) as uploader:
+                uploader.upload(_records(10))
+
+        try:
+            _with_stub(fail_rate, upload)
+        except UploadError:
+            continue
+        raise AssertionError(f"Upload with fail_rate={fail_rate} and {options} did not fail")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the ServiceNow uploader against the local stub.")
+    parser.add_argument("--records", type=int, default=5000, help="Records to upload per endpoint (default: 5000).")
+    parser.add_argument("--fail-rate", type=float, default=0.2,
+                        help="Fraction of requests the stub fails with 503 (default: 0.2).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the injected failures (default: 0).")
+    args = parser.parse_args()
+
+    check_round_trip(args.records, args.fail_rate, args.seed)
+    check_failures()
+    print(f"Upload check passed: {args.records} records arrived once per endpoint despite injected failures.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+import numpy as np
+from cd_generator import UNLOAD_FILE_NAMES, generate_to_directory
+from random_streams import IDS, USAGE_NOISE, RandomStreams
+from reference_loader import load_reference_data
+from servicenow_upload import iter_unload_files
+from unload_reader import iter_unload_records
+from unload_writer import MANIFEST_FILE_NAME
+
+CURRENT_TIME = "2024-01-01 00:00:00"
+
+# Fields drawn from the per-shard id and mod count streams, the only ones that depend on the worker count
+SHARD_FIELDS = ("sys_id", "sys_domain", "sys_mod_count")
+
+
+# Generate a small run into a fresh subdirectory of base_dir
+def _generate(base_dir, name, reference, seed, **options):
+    return generate_to_directory(
+        os.path.join(base_dir, name), reference, "2024-01-01", "2024-01-31", 100, 10, 2, 5, seed=seed,
+        current_time=CURRENT_TIME, interval=np.timedelta64(6, "h"), **options
+    )
+
+# Records of one unload of a result, as field dicts
+def _records(result, kind):
+    return [record for _, record in iter_unload_files([result.paths[kind]])]
+
+# Bytes of every output file of a result, by file name
+def _file_bytes(result):
+    contents = {}
+    for path in set(result.paths.values()):
+        with open(path, "rb") as output_file:
+            contents[os.path.basename(path)] = output_file.read()
+    return contents
+
+
+def check_reproducibility(reference, base_dir, seed=0):
+    """
+    Checks that a seed reproduces byte-identical files for every output format, that another
+    seed does not, and that RandomStreams keeps its named streams independent.
+
+    Raises:
+    - AssertionError: On the first guarantee that does not hold.
+    """
+    for output_format in ("xml", "csv", "jsonl"):
+        first = _generate(base_dir, f"{output_format}_a", reference, seed, output_format=output_format)
+        again = _generate(base_dir, f"{output_format}_b", reference, seed, output_format=output_format)
+        other = _generate(base_dir, f"{output_format}_c", reference, seed + 1, output_format=output_format)
+        if _file_bytes(first) != _file_bytes(again):
+            raise AssertionError(f"Seed {seed} did not reproduce the {output_format} files")
+        if _file_bytes(first) == _file_bytes(other):
+            raise AssertionError(f"Seeds {seed} and {seed + 1} wrote the same {output_format} files")
+
+    # Drawing from one stream, or from a child, must not shift another stream
+    streams = RandomStreams(seed)
+    expected = streams.generator(USAGE_NOISE).random(8)
+    streams.generator(IDS).random(1000)
+    streams.child("denial").generator(USAGE_NOISE).random(1000)
+    if not np.array_equal(streams.generator(USAGE_NOISE).random(8), expected):
+        raise AssertionError("Drawing from other streams changed the usage noise stream")
+    if np.array_equal(streams.child("denial").generator(USAGE_NOISE).random(8), expected):
+        raise AssertionError("A child stream repeats its parent's draws")
+
+
+def check_split_manifest(reference, base_dir, seed=0, part_records=37, part_bytes=20_000):
+    """
+    Splits a run into parts by record count and by size, and checks the bundle against its
+    manifest and against the unsplit run.
+
+    Raises:
+    - AssertionError: If a part breaks its limit, an entry does not match its manifest line,
+      or the parts do not hold the unsplit records in order.
+    """
+    whole = _generate(base_dir, "whole", reference, seed)
+    for limits in (dict(part_records=part_records), dict(part_bytes=part_bytes)):
+        split = _generate(base_dir, f"split_{'_'.join(limits)}", reference, seed, **limits)
+        with zipfile.ZipFile(split.bundle_path) as bundle:
+            manifest = json.loads(bundle.read(MANIFEST_FILE_NAME))["parts"]
+            for kind, parts in manifest.items():
+                records = []
+                for part in parts:
+                    data = bundle.read(part["file"])
+                    records.extend(record for _, record in iter_unload_records(io.BytesIO(data)))
+                    if (len(data), hashlib.sha256(data).hexdigest()) != (part["bytes"], part["sha256"]):
+                        raise AssertionError(f"{part['file']} does not match its manifest entry")
+                    if part["records"] > limits.get("part_records", part["records"]) or (
+                        part["records"] > 1 and len(data) > limits.get("part_bytes", len(data))
+                    ):
+                        raise AssertionError(f"{part['file']} breaks the part limits {limits}")
+                if sum(part["records"] for part in parts) != split.counts[kind]:
+                    raise AssertionError(f"The {kind} parts of {limits} do not add up to {split.counts[kind]} records")
+                if records != _records(whole, kind):
+                    raise AssertionError(f"The {kind} parts of {limits} differ from the unsplit unload")
+            if set(manifest) != set(UNLOAD_FILE_NAMES):
+                raise AssertionError(f"The manifest of {limits} lists {list(manifest)}")
+
+
+def check_sharded_merge(reference, base_dir, seed=0, workers=2):
+    """
+    Checks that merging the shard fragments of a multi-process run gives well-formed unloads
+    holding the single-process records in order, with only the shard-drawn fields differing.
+
+    Raises:
+    - AssertionError: If a merged unload differs in any other field or in its record count.
+    """
+    single = _generate(base_dir, "single", reference, seed)
+    sharded = _generate(base_dir, "sharded", reference, seed, workers=workers)
+    for kind in UNLOAD_FILE_NAMES:
+        # Parsing the merged file also checks that it is one well-formed document
+        expected, merged = _records(single, kind), _records(sharded, kind)
+        if len(merged) != len(expected) or sharded.counts[kind] != single.counts[kind]:
+            raise AssertionError(f"The merged {kind} unload has {len(merged)} records instead of {len(expected)}")
+        for n, (record, merged_record) in enumerate(zip(expected, merged)):
+            differing = [field for field in record if record[field] != merged_record[field]]
+            if [field for field in differing if field not in SHARD_FIELDS]:
+                raise AssertionError(f"Merged {kind} record {n} differs in {differing}")
+
+
+def check_columnar(reference, base_dir, seed=0):
+    """
+    Checks that the CSV and JSONL tables hold the same records as the XML unloads; the dv_
+    display value columns are left out of the comparison.
+
+    Raises:
+    - AssertionError: On the first row whose fields differ from its XML record.
+    """
+    unloads = _generate(base_dir, "unloads", reference, seed)
+    tables = {output_format: _generate(base_dir, output_format, reference, seed, output_format=output_format)
+              for output_format in ("csv", "jsonl")}
+    for kind in UNLOAD_FILE_NAMES:
+        records = _records(unloads, kind)
+        with open(tables["csv"].paths[kind], newline="", encoding="utf-8") as csv_file:
+            csv_rows = list(csv.DictReader(csv_file))
+        with open(tables["jsonl"].paths[kind], encoding="utf-8") as jsonl_file:
+            jsonl_rows = [
+                {field: "" if value is None else str(value) for field, value in json.loads(line).items()}
+                for line in jsonl_file
+            ]
+        for output_format, rows in (("csv", csv_rows), ("jsonl", jsonl_rows)):
+            if len(rows) != len(records):
+                raise AssertionError(f"The {kind} {output_format} table has {len(rows)} rows instead of {len(records)}")
+            for n, (record, row) in enumerate(zip(records, rows)):
+                fields = {field: value for field, value in row.items() if not field.startswith("dv_")}
+                if fields != record:
+                    raise AssertionError(f"{output_format} {kind} row {n} differs from its XML record")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check reproducibility, split and sharded unloads, and the columnar tables."
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated runs (default: 0).")
+    parser.add_argument("--data-dir", default=".", help="Directory holding the reference CSV files (default: .).")
+    args = parser.parse_args()
+
+    reference = load_reference_data(args.data_dir)
+    base_dir = tempfile.mkdtemp(prefix="cdgen_check_")
+    try:
+        check_reproducibility(reference, base_dir, args.seed)
+        check_split_manifest(reference, base_dir, args.seed)
+        check_sharded_merge(reference, base_dir, args.seed)
+        check_columnar(reference, base_dir, args.seed)
+    finally:
+        shutil.rmtree(base_dir, ignore_errors=True)
+    print("Unload output check passed: seeded runs reproduce, and split, sharded and columnar output "
+          "hold the same records.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import argparse
+import numpy as np
+from usage_engine import PHASE_DECREMENT, PHASE_DENIAL, PHASE_INCREMENT, sample_count, usage_series
+
+PHASE_CODES = {"increment": PHASE_INCREMENT, "denial": PHASE_DENIAL, "decrement": PHASE_DECREMENT}
+
+
+# Generator proxy remembering the denial-run lengths usage_series draws
+class _RecordingRng:
+    def __init__(self, rng):
+        self._rng = rng
+        self.drawn = []
+
+    def integers(self, *args, **kwargs):
+        values = self._rng.integers(*args, **kwargs)
+        self.drawn.extend(np.atleast_1d(values).tolist())
+        return values
+
+
+def legacy_usage_loop(total_samples, quantity, num_records, denial_runs):
+    """
+    The day-by-day increment/denial/decrement state machine usage_series replaced.
+
+    The denial count of each peak is taken from denial_runs in order instead of random.randint.
+
+    Returns:
+    - tuple: Value and phase code of every sample, as lists.
+    """
+    denial_runs = iter(denial_runs)
+    increment_value = quantity // num_records
+    value = increment_value
+    values, phases = [], []
+    phase = "increment"
+    denial_generated = 0
+    denial_count = 0
+
+    for _ in range(total_samples):
+        values.append(value)
+        phases.append(PHASE_CODES[phase])
+        if phase == "increment":
+            value += increment_value
+            if value >= quantity:
+                value = quantity
+                phase = "denial"
+                denial_generated = 0
+
+        elif phase == "denial":
+            if denial_generated == 0:
+                denial_count = next(denial_runs)
+            denial_generated += 1
+            if denial_generated >= denial_count:
+                phase = "decrement"
+                value -= increment_value
+
+        elif phase == "decrement":
+            if value <= quantity / 2:
+                phase = "increment"
+                value += increment_value
+            else:
+                value -= increment_value
+    return values, phases
+
+
+def check_equivalence(sets=3000, seed=0):
+    """
+    Compares usage_series with the legacy loop on random parameter sets, with the same denial runs.
+
+    Series whose increment is zero never leave the first ramp in either implementation and are
+    skipped, like usage_series short-circuits them.
+
+    Raises:
+    - AssertionError: On the first parameter set whose values or phases differ.
+    """
+    params = np.random.default_rng(seed)
+    for n in range(sets):
+        quantity = int(params.integers(1, 500))
+        num_records = int(params.integers(1, quantity + 1))
+        range_start = int(params.integers(1, 20))
+        range_end = int(params.integers(range_start, 40))
+        total_samples = int(params.integers(0, 2000))
+
+        rng = _RecordingRng(np.random.default_rng(n))
+        series = usage_series("2024-01-01", total_samples, quantity, num_records, range_start, range_end, rng)
+        values, phases = legacy_usage_loop(total_samples, quantity, num_records, rng.drawn)
+        if series.values.tolist() != values or series.phases.tolist() != phases:
+            raise AssertionError(
+                f"Parameter set {n} differs: total_samples={total_samples}, quantity={quantity}, "
+                f"num_records={num_records}, range=({range_start}, {range_end})"
+            )
+
+
+def check_sample_count(sets=3000, seed=0):
+    """
+    Compares sample_count with stepping through the range sample by sample, on random date
+    ranges and intervals of 1 minute to 3 days, most of which do not divide the range.
+
+    Raises:
+    - AssertionError: On the first range whose count differs.
+    """
+    params = np.random.default_rng(seed)
+    for n in range(sets):
+        start = np.datetime64("2024-01-01") + int(params.integers(0, 400))
+        end = start + int(params.integers(-1, 10))
+        interval = np.timedelta64(int(params.integers(1, 3 * 24 * 60)), "m")
+
+        expected, time, range_end = 0, start.astype("datetime64[m]"), end + 1
+        while time < range_end:
+            expected += 1
+            time += interval
+        if sample_count(start, end, interval) != expected:
+            raise AssertionError(
+                f"Range {n} differs: {start} to {end} every {interval}: "
+                f"{sample_count(start, end, interval)} samples instead of {expected}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the vectorized usage engine against the legacy loop.")
+    parser.add_argument("--sets", type=int, default=3000, help="Random parameter sets to compare (default: 3000).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the parameter sets (default: 0).")
+    args = parser.parse_args()
+
+    check_equivalence(args.sets, args.seed)
+    check_sample_count(args.sets, args.seed)
+    print(f"Usage engine check passed: {args.sets} parameter sets match the legacy loop and "
+          f"{args.sets} date ranges get every sample.")
+
+
+if __name__ == "__main__":
+    main()
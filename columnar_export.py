@@ -0,0 +1,421 @@
+import json
+import os
+from collections import namedtuple
+import numpy as np
+from cd_generator import (
+    UNLOAD_FILE_NAMES,
+    denial_count,
+    find_missing_products,
+    format_version,
+    last_denial_time,
+    license_end_date,
+    prepare_run,
+    slice_denials,
+)
+from generation_progress import GenerationProgress
+from generation_result import GenerationResult
+from instrumentation import StageTimer
+from random_streams import IDS, MOD_COUNTS, REFERENCE_PICKS, RandomStreams
+from unload_writer import COMPRESSION_SUFFIXES, _open_compressed
+from usage_engine import DAILY
+from usage_shapes import DEFAULT_SHAPE
+
+# Columnar output formats and the file suffix of each
+EXPORT_SUFFIXES = {"csv": ".csv", "jsonl": ".jsonl", "parquet": ".parquet"}
+
+# Rows built, formatted and written at a time, bounding the memory of one export
+CHUNK_ROWS = 1_000_000
+
+# Compressions a columnar file can be written with; Parquet compresses its pages itself
+EXPORT_COMPRESSIONS = ("none", "gzip", "zstd")
+
+
+# One column of an export chunk
+# - "raw": list of str that never need escaping (sys_ids, dates, generated labels)
+# - "int": integer NumPy array
+# - "const": a single value shared by every row
+# - "text": arbitrary str values, given as categories and a NumPy array of codes into them
+Column = namedtuple("Column", ["kind", "values", "codes"], defaults=[None])
+
+
+def _const(value):
+    return Column("const", value)
+
+def _raw(values):
+    return Column("raw", values)
+
+def _int(values):
+    return Column("int", np.asarray(values, dtype=np.int64))
+
+def _text(categories, codes):
+    return Column("text", list(categories), np.asarray(codes, dtype=np.int32))
+
+# A reference field as a display value column (dv_<field>) next to its sys_id column, like the
+# display_value attribute and text of the unload element
+def _reference(name, rows, value_field, display_field, codes):
+    return {
+        name: _text([row[value_field] for row in rows], codes),
+        f"dv_{name}": _text([row[display_field] for row in rows], codes),
+    }
+
+# Columns of random 32-hex-char sys_ids, `per_row` per row, drawn row by row like RecordTemplates does
+def _sys_ids(rng, n, per_row=2):
+    data = rng.bytes(16 * n * per_row).hex()
+    ids = [data[i:i + 32] for i in range(0, len(data), 32)]
+    return [ids[column::per_row] for column in range(per_row)]
+
+def _mod_counts(rng, n):
+    return _int(rng.integers(1, 101, n))
+
+
+def concurrent_chunks(reference, plan, current_time, streams, chunk_rows=CHUNK_ROWS):
+    """
+    Yields the samp_eng_app_concurrent_usage rows of a plan as column chunks.
+
+    Rows come in the order of the concurrent unload: for every sample, one row per product
+    that has a discovery model. Column names are the unload's field names; reference fields get a
+    dv_<field> display value column. sys_ids and sys_mod_counts come from the IDS and
+    MOD_COUNTS streams of streams.
+    """
+    ids, mod_counts = streams.generator(IDS), streams.generator(MOD_COUNTS)
+    products = [
+        (i, reference.discovery_for_product(product)) for i, product in enumerate(plan.products)
+    ]
+    products = [(i, discovery) for i, discovery in products if discovery]
+    columns = [i for i, _ in products]
+    models = [discovery for _, discovery in products]
+    samples_per_chunk = max(1, chunk_rows // max(1, len(products)))
+
+    # Without any product there are no rows, but the table still gets its columns
+    sample_count = len(plan.sample_times) if products else 0
+    for start in range(0, max(sample_count, 1), samples_per_chunk):
+        stop = min(start + samples_per_chunk, sample_count)
+        samples = stop - start
+        n = samples * len(products)
+        sys_domains, sys_ids = _sys_ids(ids, n)
+        record_nums = np.repeat(np.arange(start + 1, stop + 1), len(products))
+        product_codes = np.tile(np.arange(len(products)), samples)
+        yield {
+            "conc_usage_id": _raw([f"Con Usage {num}" for num in record_nums.tolist()]),
+            "concurrent_usage": _int(plan.product_usage[start:stop, columns].ravel()),
+            **_reference("license", models, "license_sys_id2", "norm_product", product_codes),
+            "source": _const("OpeniT"),
+            "sys_created_by": _const("admin"),
+            "sys_created_on": _const(current_time),
+            "sys_domain": _raw(sys_domains),
+            "sys_domain_path": _const("/"),
+            "sys_id": _raw(sys_ids),
+            "sys_mod_count": _mod_counts(mod_counts, n),
+            "sys_updated_by": _const("admin"),
+            "sys_updated_on": _const(current_time),
+            "usage_date": _raw(np.repeat(plan.sample_times[start:stop], len(products)).astype("U").tolist()),
+        }
+
+
+def denial_chunks(reference, plan, current_time, streams, chunk_rows=CHUNK_ROWS):
+    """
+    Yields the samp_eng_app_denial rows of a plan as column chunks, in unload order.
+
+    The columns are sliced from the plan's DenialColumns; last_denial_time is stamped once for
+    the whole run.
+    """
+    ids, mod_counts = streams.generator(IDS), streams.generator(MOD_COUNTS)
+    denial_time = last_denial_time(current_time)
+    discovery_models = reference["DISCOVERY_MODELS"]
+    users = reference["USER_NAMES"]
+
+    for start in range(0, max(denial_count(plan.denials), 1), chunk_rows):
+        denials = slice_denials(plan.denials, start, start + chunk_rows)
+        discovery, user, group, license_server, license_type = denials.indexes.T
+        n = denial_count(denials)
+        sys_domains, sys_ids = _sys_ids(ids, n)
+        yield {
+            "additional_key": _const(""),
+            **_reference("computer", users, "computer_sys_id", "computer_name", user),
+            "denial_date": _raw(denials.dates.astype("U").tolist()),
+            "denial_id": _raw([f"Denial {sample + 1}" for sample in denials.samples.tolist()]),
+            **_reference("discovery_model", discovery_models, "discovery_sys_id", "discovery_model", discovery),
+            **_reference("group", reference["GROUP_NAMES"], "group_sys_id", "group", group),
+            "is_product_normalized": _const("true"),
+            "last_denial_time": _const(denial_time),
+            **_reference("license_server", reference["LICENSE_SERVER_VALUES"], "license_server_sys_id",
+                         "license_server", license_server),
+            **_reference("license_type", reference["LICENSE_TYPE_VALUES"], "license_type_sys_id",
+                         "license_type", license_type),
+            **_reference("norm_product", discovery_models, "norm_product_sys_id", "norm_product", discovery),
+            **_reference("norm_publisher", discovery_models, "norm_publisher_sys_id", "norm_publisher", discovery),
+            "product": _text([row["product"] for row in discovery_models], discovery),
+            "publisher": _text([row["publisher"] for row in discovery_models], discovery),
+            "source": _const("OpeniT"),
+            "sys_created_by": _const("admin"),
+            "sys_created_on": _const(current_time),
+            "sys_domain": _raw(sys_domains),
+            "sys_domain_path": _const("/"),
+            "sys_id": _raw(sys_ids),
+            "sys_mod_count": _mod_counts(mod_counts, n),
+            "sys_updated_by": _const("admin"),
+            "sys_updated_on": _const(current_time),
+            "total_denial_count": _int(denials.counts),
+            **_reference("user", users, "user_sys_id", "user", user),
+            "version": _const("2020"),
+            **_reference("workstation", users, "workstation_sys_id", "workstation", user),
+        }
+
+
+# License rows: one per license quantity, for the first discovery models
+def license_chunks(reference, license_quantities, current_time, streams):
+    ids, mod_counts = streams.generator(IDS), streams.generator(MOD_COUNTS)
+    models = reference["DISCOVERY_MODELS"][:len(license_quantities)]
+    n = len(models)
+    picks = streams.generator(REFERENCE_PICKS)
+    license_servers = picks.integers(reference.sizes["LICENSE_SERVER_VALUES"], size=n)
+    license_types = picks.integers(reference.sizes["LICENSE_TYPE_VALUES"], size=n)
+    codes = np.arange(n)
+    license_ids, sys_domains, sys_ids = _sys_ids(ids, n, 3)
+    yield {
+        "active": _const("true"),
+        "end_date": _const(license_end_date(current_time)),
+        **_reference("eng_software_install", models, "software_install_sys_id", "software_install", codes),
+        "is_product_normalized": _const("true"),
+        "license_id": _raw(license_ids),
+        **_reference("license_server", reference["LICENSE_SERVER_VALUES"], "license_server_sys_id",
+                     "license_server", license_servers),
+        **_reference("license_type", reference["LICENSE_TYPE_VALUES"], "license_type_sys_id",
+                     "license_type", license_types),
+        **_reference("norm_product", models, "norm_product_sys_id", "norm_product", codes),
+        **_reference("norm_publisher", models, "norm_publisher_sys_id", "norm_publisher", codes),
+        "parent_id": _const(""),
+        "product": _text([row["product"] for row in models], codes),
+        "publisher": _text([row["publisher"] for row in models], codes),
+        "quantity": _int([int(quantity) for quantity in license_quantities[:n]]),
+        "source": _const("OpeniT"),
+        "start_date": _const(current_time),
+        "sys_created_by": _const("admin"),
+        "sys_created_on": _const(current_time),
+        "sys_domain": _raw(sys_domains),
+        "sys_domain_path": _const("/"),
+        "sys_id": _raw(sys_ids),
+        "sys_mod_count": _mod_counts(mod_counts, n),
+        "sys_updated_by": _const("admin"),
+        "sys_updated_on": _const(current_time),
+        "version": _text([format_version(row.get("version", "Unknown")) for row in models], codes),
+    }
+
+
+# Quote a CSV value only when it needs it, as the csv module's minimal quoting does
+def _csv_escape(value):
+    if any(char in value for char in ',"\r\n'):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+def _json_escape(value):
+    return json.dumps(value, ensure_ascii=False)
+
+
+# Writes column chunks as text lines through a per-table row template
+class _TextTableWriter:
+    """
+    Formats every row through one %-template built from the first chunk.
+
+    Constant columns are escaped into the template itself and text columns are escaped once
+    per category, so per row only sys_ids, dates, labels and numbers are filled in.
+    """
+
+    def __init__(self, sink, escape, header, field, raw_slot, prefix="", suffix=""):
+        self._file = sink
+        self._escape = escape
+        self._header = header
+        self._field = field
+        self._raw_slot = raw_slot
+        self._prefix = prefix
+        self._suffix = suffix
+        self._template = None
+        self.record_count = 0
+        self.bytes_written = 0
+
+    def _write(self, text):
+        data = text.encode("utf-8")
+        self._file.write(data)
+        self.bytes_written += len(data)
+
+    def _compile(self, chunk):
+        parts = []
+        for name, column in chunk.items():
+            if column.kind == "const":
+                value = self._escape(column.values).replace("%", "%%")
+            elif column.kind == "raw":
+                value = self._raw_slot
+            else:
+                value = "%s"
+            parts.append(self._field.format(name=name, value=value))
+        self._template = self._prefix + ",".join(parts) + self._suffix
+        if self._header:
+            self._write(self._header(list(chunk)))
+
+    def write_chunk(self, chunk):
+        if self._template is None:
+            self._compile(chunk)
+        cells = []
+        for column in chunk.values():
+            if column.kind == "raw":
+                cells.append(column.values)
+            elif column.kind == "int":
+                cells.append(column.values.tolist())
+            elif column.kind == "text":
+                categories = np.array([self._escape(value) for value in column.values], dtype=object)
+                cells.append(categories[column.codes].tolist())
+        template = self._template
+        lines = [template % row for row in zip(*cells)]
+        if lines:
+            self._write("\n".join(lines) + "\n")
+            self.record_count += len(lines)
+
+    def close(self):
+        self._file.close()
+
+
+def _csv_writer(sink):
+    return _TextTableWriter(sink, _csv_escape, lambda names: ",".join(names) + "\n", "{value}", "%s")
+
+def _jsonl_writer(sink):
+    return _TextTableWriter(sink, _json_escape, None, '"{name}":{value}', '"%s"', "{", "}")
+
+
+# Writes column chunks into one Parquet file, text columns dictionary-encoded
+class _ParquetTableWriter:
+    def __init__(self, path, compression, level):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Parquet export requires the 'pyarrow' package.")
+        self._pa = pyarrow
+        self._parquet = pyarrow.parquet
+        self._path = path
+        self._compression = compression
+        self._level = level
+        self._writer = None
+        self.record_count = 0
+        self.bytes_written = 0
+
+    def _array(self, column, n):
+        pa = self._pa
+        if column.kind == "raw":
+            return pa.array(column.values, pa.string())
+        if column.kind == "int":
+            return pa.array(column.values, pa.int64())
+        if column.kind == "const":
+            return pa.DictionaryArray.from_arrays(
+                pa.array(np.zeros(n, dtype=np.int32)), pa.array([column.values], pa.string())
+            )
+        return pa.DictionaryArray.from_arrays(pa.array(column.codes), pa.array(column.values, pa.string()))
+
+    def write_chunk(self, chunk):
+        n = next(len(column.values) for column in chunk.values() if column.kind == "raw")
+        table = self._pa.table({name: self._array(column, n) for name, column in chunk.items()})
+        if self._writer is None:
+            self._writer = self._parquet.ParquetWriter(
+                self._path, table.schema, compression=self._compression, compression_level=self._level
+            )
+        self._writer.write_table(table)
+        self.record_count += n
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self.bytes_written = os.path.getsize(self._path)
+
+
+def _check_export(export_format, compression):
+    if export_format not in EXPORT_SUFFIXES:
+        raise ValueError(f"Unknown export format '{export_format}', expected one of {list(EXPORT_SUFFIXES)}.")
+    if compression not in EXPORT_COMPRESSIONS:
+        raise ValueError(f"Columnar exports support compression {list(EXPORT_COMPRESSIONS)}, not '{compression}'.")
+
+def open_table_writer(path, export_format, compression="none", level=None):
+    """
+    Opens a writer for column chunks in one of EXPORT_SUFFIXES' formats.
+
+    CSV and JSONL files are compressed as they are written, like the unload files; Parquet
+    uses compression as its page codec.
+
+    Raises:
+    - ValueError: For an unknown format or compression.
+    - ImportError: If Parquet is requested without pyarrow, or zstd without zstandard.
+    """
+    _check_export(export_format, compression)
+    if export_format == "parquet":
+        return _ParquetTableWriter(path, compression, level)
+    sink = _open_compressed(path, compression, level)
+    return _csv_writer(sink) if export_format == "csv" else _jsonl_writer(sink)
+
+
+# File name of an exported table, e.g. concurrent_records.csv.gz
+def export_file_name(kind, export_format, compression="none"):
+    stem = os.path.splitext(UNLOAD_FILE_NAMES[kind])[0]
+    suffix = EXPORT_SUFFIXES[export_format]
+    if export_format != "parquet":
+        suffix += COMPRESSION_SUFFIXES[compression]
+    return stem + suffix
+
+
+def generate_columnar(output_dir, reference, start_date, end_date, quantity, num_records,
+                      range_start, range_end, export_format, compression="none", level=None,
+                      current_time=None, timer=None, interval=DAILY, products=None, weights=None,
+                      split_method="weighted", streams=None, shape=DEFAULT_SHAPE, shape_options=None,
+                      progress=None):
+    """
+    Generates the concurrent, denial and license records straight into CSV, JSONL or Parquet files.
+
+    The records are the ones generate_unloads would write, built as columns from the plan
+    without any XML. Columns are named after the samp_eng_app_* fields; a reference field has
+    its sys_id under the field name and its display value under dv_<field>.
+
+    Args:
+    - output_dir (str): Directory for the three table files.
+    - export_format (str): "csv", "jsonl" or "parquet".
+    - compression (str): "none", "gzip" or "zstd".
+    - level (int): Compression level, or None for the library default.
+    - streams (RandomStreams): Source of all randomness, drawn like in generate_unloads; a
+      freshly seeded one when omitted.
+    - progress (GenerationProgress): Advanced chunk by chunk; cancelling it stops the run
+      between chunks with GenerationCancelled.
+    - The other arguments are those of generate_unloads.
+
+    Returns:
+    - GenerationResult: Columnar usage and denial data, with the path, record count and stage
+      timings of each table.
+    """
+    _check_export(export_format, compression)
+    timer = timer or StageTimer()
+    progress = progress or GenerationProgress()
+    streams = streams or RandomStreams()
+    os.makedirs(output_dir, exist_ok=True)
+    current_time, license_quantities, plan = prepare_run(
+        reference, start_date, end_date, quantity, num_records, range_start, range_end, streams, timer, progress,
+        current_time, interval=interval, products=products, weights=weights, split_method=split_method,
+        shape=shape, shape_options=shape_options
+    )
+
+    paths, counts = {}, {}
+    tables = (
+        ("denial", lambda: denial_chunks(reference, plan, current_time, streams.child("denial"))),
+        ("concurrent", lambda: concurrent_chunks(reference, plan, current_time, streams.child("concurrent"))),
+        ("license", lambda: license_chunks(reference, license_quantities, current_time, streams.child("license"))),
+    )
+    for kind, chunks in tables:
+        with timer.stage(f"{kind} records") as stage:
+            path = paths[kind] = os.path.join(output_dir, export_file_name(kind, export_format, compression))
+            writer = open_table_writer(path, export_format, compression, level)
+            try:
+                for chunk in chunks():
+                    written = writer.record_count
+                    writer.write_chunk(chunk)
+                    progress.advance(kind, writer.record_count - written)
+            finally:
+                writer.close()
+            counts[kind] = stage["records"] = writer.record_count
+            stage["bytes"] = writer.bytes_written
+
+    return GenerationResult(plan, find_missing_products(reference, plan.products), paths, counts, None, timer,
+                            export_format, streams.seed)
@@ -0,0 +1,200 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Records written between two progress updates and cancellation checks of a tracked writer
+PROGRESS_RECORDS = 4096
+
+
+class GenerationCancelled(Exception):
+    pass
+
+
+# Live record counts of a run, shared between the generating thread and the UI
+class GenerationProgress:
+    """
+    Counts the records written per unload kind while a run is generating, and carries its
+    cancellation request.
+
+    The generator announces the plan and the expected record counts with begin() once the
+    usage plan is ready, then reports written records with advance(), which raises
+    GenerationCancelled as soon as cancel() has been called from another thread. Readers get
+    the totals, rate and ETA from the properties, and the emitted part of the usage with
+    chart_columns().
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.plan = None
+        self.present = []
+        self.stage = "usage plan"
+        self.totals = {}
+        self.done = {}
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    def begin(self, plan, totals, present):
+        """
+        Publishes the plan of the run.
+
+        Args:
+        - plan (RecordPlan): The planned usage and denials.
+        - totals (dict): Unload kind -> number of records that will be written.
+        - present (list): Columns of plan.product_usage whose products get records.
+        """
+        with self._lock:
+            self.plan = plan
+            self.present = list(present)
+            self.stage = "records"
+            self.totals = dict(totals)
+            self.done = dict.fromkeys(totals, 0)
+        self.check()
+
+    def advance(self, kind, records):
+        with self._lock:
+            self.stage = kind
+            self.done[kind] = self.done.get(kind, 0) + records
+        self.check()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    # Raise GenerationCancelled if the run was cancelled
+    def check(self):
+        if self._cancelled.is_set():
+            raise GenerationCancelled("Generation was cancelled.")
+
+    @property
+    def records_done(self):
+        return sum(self.done.values())
+
+    @property
+    def total_records(self):
+        return sum(self.totals.values())
+
+    @property
+    def fraction(self):
+        total = self.total_records
+        return min(self.records_done / total, 1.0) if total else 0.0
+
+    @property
+    def records_per_sec(self):
+        seconds = time.perf_counter() - self.started
+        return self.records_done / seconds if seconds else 0.0
+
+    # Seconds left at the rate so far, or None before any record is written
+    @property
+    def eta_seconds(self):
+        rate = self.records_per_sec
+        return (self.total_records - self.records_done) / rate if rate else None
+
+    # Wrap a writer so that the records appended through it advance kind
+    @contextmanager
+    def track(self, kind, writer):
+        tracked = _TrackedWriter(self, kind, writer)
+        with self._lock:
+            self.stage = kind
+        yield tracked
+        tracked.flush()
+
+    def chart_columns(self):
+        """
+        The usage and denials written so far, as chart columns.
+
+        Denials and concurrent records are written in sample order, so the written records
+        cover a prefix of the plan.
+
+        Returns:
+        - tuple: (dates, concurrent totals, denial dates, denial counts), or None before the
+          plan is ready.
+        """
+        with self._lock:
+            plan, present, done = self.plan, self.present, dict(self.done)
+        if plan is None:
+            return None
+        series, denials = plan.series, plan.denials
+        samples = done.get("concurrent", 0) // max(len(present), 1)
+        denial_records = done.get("denial", 0)
+        return (
+            series.dates[:samples], plan.product_usage[:samples, present].sum(axis=1),
+            series.dates[denials.samples[:denial_records]], denials.counts[:denial_records],
+        )
+
+
+# Writer proxy counting appended records into a GenerationProgress in batches
+class _TrackedWriter:
+    def __init__(self, progress, kind, writer):
+        self._progress = progress
+        self._kind = kind
+        self._append = writer.append_serialized
+        self._countdown = PROGRESS_RECORDS
+
+    def append_serialized(self, data):
+        self._append(data)
+        self._countdown -= 1
+        if not self._countdown:
+            self.flush()
+
+    def flush(self):
+        pending, self._countdown = PROGRESS_RECORDS - self._countdown, PROGRESS_RECORDS
+        self._progress.advance(self._kind, pending)
+
+
+class GenerationJob:
+    """
+    Runs a generation function in a background thread with a GenerationProgress.
+
+    The function is called as func(*args, progress=progress, **kwargs). Its return value, or
+    the exception it raised, is kept for result().
+
+    Args:
+    - func (callable): Generator taking a progress keyword, e.g. generate_to_directory.
+    - args, kwargs: Its other arguments.
+    """
+
+    def __init__(self, func, *args, **kwargs):
+        self.progress = GenerationProgress()
+        self._func = func
+        self._args = args
+        self._kwargs = kwargs
+        self._result = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        try:
+            self._result = self._func(*self._args, progress=self.progress, **self._kwargs)
+        except BaseException as e:
+            self._error = e
+
+    def start(self):
+        self.progress.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    @property
+    def done(self):
+        return self._thread.ident is not None and not self._thread.is_alive()
+
+    def cancel(self):
+        self.progress.cancel()
+
+    def result(self, timeout=None):
+        """
+        Waits for the run and returns its result.
+
+        Raises:
+        - GenerationCancelled: If the run was cancelled.
+        - TimeoutError: If the run is still going after timeout seconds.
+        - Exception: Whatever else the generation function raised.
+        """
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            raise TimeoutError("Generation is still running.")
+        if self._error is not None:
+            raise self._error
+        return self._result
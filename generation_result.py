@@ -0,0 +1,48 @@
+import numpy as np
+
+
+# Columnar result of one generation run
+class GenerationResult:
+    """
+    Generated usage and denials as NumPy columns, published alongside the unload files.
+
+    Charts read these columns directly instead of parsing the XML that was just written.
+
+    Attributes:
+    - dates (numpy array): datetime64 time of every concurrent data point (datetime64[D] when daily).
+    - products (list): Concurrent products, one per product_usage column.
+    - product_usage (numpy array): samples x products int32 usage split.
+    - denial_dates (numpy array): datetime64 time of every denial record.
+    - denial_counts (numpy array): int32 total_denial_count of every denial record.
+    - missing_products (list): Products with no discovery model; they get no records.
+    - paths (dict): Unload kind -> file path, once written to disk.
+    - counts (dict): Unload kind -> number of records written.
+    - bundle_path (str): Zip archive holding all unloads, when written as a bundle.
+    - timings (StageTimer): Time, records and bytes of each generation stage.
+    - output_format (str): "xml" for unload files, or the columnar format of the tables.
+    - seed (int): Seed of the run's RandomStreams; generating again with it reproduces the run.
+    """
+
+    def __init__(self, plan, missing_products, paths=None, counts=None, bundle_path=None, timings=None,
+                 output_format="xml", seed=None):
+        series = plan.series
+        denial_days = np.flatnonzero(series.denial_mask)
+
+        self.dates = series.dates
+        self.products = list(plan.products)
+        self.product_usage = plan.product_usage
+        self.denial_dates = series.dates[denial_days]
+        self.denial_counts = series.denial_counts[denial_days]
+        self.missing_products = list(missing_products)
+        self.paths = paths or {}
+        self.counts = counts or {}
+        self.bundle_path = bundle_path
+        self.timings = timings
+        self.output_format = output_format
+        self.seed = seed
+
+    # Total usage per sample over the products that actually got records
+    @property
+    def concurrent_totals(self):
+        present = [i for i, product in enumerate(self.products) if product not in self.missing_products]
+        return self.product_usage[:, present].sum(axis=1)
@@ -0,0 +1,51 @@
+import random
+
+# Bytes of randomness behind one 32-hex-char sys_id
+ID_BYTES = 16
+
+
+# Batched source of ServiceNow-style sys_ids
+class IdPool:
+    """
+    Hands out 32-hex-char sys_ids drawn in large batches.
+
+    Each refill draws batch_size * 16 random bytes in one call and hex-encodes the whole
+    buffer at once, so taking an id is a single iterator step. By default the bytes come
+    from a private random.Random seeded with seed, so seeded runs are reproducible and the
+    id stream does not disturb the global RNG. Pass source=os.urandom for ids that do not
+    depend on any seed.
+
+    Args:
+    - batch_size (int): Number of ids drawn per refill.
+    - unique (bool): Skip any id already handed out by this pool.
+    - seed: Seed for the default source. Ignored when source is given.
+    - source (callable): Function returning n random bytes.
+    """
+
+    def __init__(self, batch_size=8192, unique=False, seed=None, source=None):
+        self.batch_size = batch_size
+        self._source = source if source is not None else random.Random(seed).randbytes
+        self._seen = set() if unique else None
+        self._ids = iter(())
+
+    def _refill(self):
+        data = self._source(ID_BYTES * self.batch_size).hex().encode()
+        ids = [data[i:i + 2 * ID_BYTES] for i in range(0, len(data), 2 * ID_BYTES)]
+        if self._seen is not None:
+            fresh = []
+            for sys_id in ids:
+                if sys_id not in self._seen:
+                    self._seen.add(sys_id)
+                    fresh.append(sys_id)
+            ids = fresh
+        self._ids = iter(ids)
+
+    # Next id as ASCII bytes, ready to drop into a record template
+    def take(self):
+        try:
+            return next(self._ids)
+        except StopIteration:
+            self._refill()
+            return next(self._ids)
+
+    __call__ = take
@@ -0,0 +1,92 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+# Wall time, record count and bytes per named stage of a run
+class StageTimer:
+    """
+    Accumulates per-stage timings in the order the stages first run.
+
+    Each stage entry holds seconds, calls, records and bytes; the code running a stage fills
+    in records and bytes through the entry yielded by stage().
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        entry = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0, "records": 0, "bytes": 0})
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry["seconds"] += time.perf_counter() - start
+            entry["calls"] += 1
+
+    @property
+    def total_seconds(self):
+        return sum(entry["seconds"] for entry in self.stages.values())
+
+    # One row per stage, e.g. for a table or a JSON export
+    def rows(self):
+        return [{"stage": name, **entry} for name, entry in self.stages.items()]
+
+    def to_json(self):
+        return json.dumps({"total_seconds": self.total_seconds, "stages": self.rows()}, indent=2)
+
+
+# cProfile statistics and tracemalloc snapshot of one profiled call
+class ProfileReport:
+    def __init__(self, profile, snapshot, peak_memory):
+        self.profile = profile
+        self.snapshot = snapshot
+        self.peak_memory = peak_memory
+
+    # The profile in pstats' binary format, loadable with pstats/snakeviz
+    def pstats_bytes(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "profile.prof")
+            self.profile.dump_stats(path)
+            with open(path, "rb") as stats_file:
+                return stats_file.read()
+
+    # Top functions by cumulative time and top allocation sites as plain text
+    def summary(self, limit=30):
+        text = io.StringIO()
+        pstats.Stats(self.profile, stream=text).sort_stats("cumulative").print_stats(limit)
+        text.write(f"\nPeak traced memory: {self.peak_memory / 2**20:.1f} MB\nTop allocation sites:\n")
+        for statistic in self.snapshot.statistics("lineno")[:limit]:
+            text.write(f"  {statistic}\n")
+        return text.getvalue()
+
+
+def profile_call(func, *args, **kwargs):
+    """
+    Runs func(*args, **kwargs) under cProfile and tracemalloc.
+
+    Both slow the run down considerably, so this is meant for single opt-in runs.
+
+    Returns:
+    - tuple: func's return value and a ProfileReport.
+    """
+    profile = cProfile.Profile()
+    tracemalloc.start()
+    try:
+        profile.enable()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            profile.disable()
+        snapshot = tracemalloc.take_snapshot()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, ProfileReport(profile, snapshot, peak_memory)
@@ -0,0 +1,85 @@
+import random
+import zlib
+import numpy as np
+from id_pool import IdPool
+
+# Named sub-streams of a run; each draws from its own independent generator
+IDS = "ids"
+DENIAL_COUNTS = "denial counts"
+REFERENCE_PICKS = "reference picks"
+USAGE_NOISE = "usage noise"
+MOD_COUNTS = "mod counts"
+USAGE_SHAPE = "usage shape"
+
+
+# Fresh seed for an unseeded run, small enough to show and type back in
+def new_seed():
+    return random.SystemRandom().getrandbits(63)
+
+
+# Batched source of random integers in [low, high]
+class IntegerPool:
+    def __init__(self, rng, low, high, batch_size=8192):
+        self._rng = rng
+        self._low = low
+        self._high = high
+        self.batch_size = batch_size
+        self._values = iter(())
+
+    def take(self):
+        try:
+            return next(self._values)
+        except StopIteration:
+            self._values = iter(self._rng.integers(self._low, self._high, self.batch_size, endpoint=True).tolist())
+            return next(self._values)
+
+    __call__ = take
+
+
+class RandomStreams:
+    """
+    Independent, named NumPy generators derived from one run seed.
+
+    A stream is identified by its path and name, e.g. ("denial",) and IDS, and is seeded with
+    SeedSequence(seed, spawn_key=path + name). The same seed therefore reproduces every
+    stream, whatever order the streams are used in, and adding draws to one stream never
+    shifts another. Child streams give each unload kind and each shard its own ids.
+
+    Args:
+    - seed (int): Non-negative run seed; a fresh one is drawn when None.
+    - path (tuple): Prefix of every stream name, set by child().
+
+    Raises:
+    - ValueError: If the seed is negative.
+    """
+
+    def __init__(self, seed=None, path=()):
+        self.seed = new_seed() if seed is None else int(seed)
+        if self.seed < 0:
+            raise ValueError(f"Seed must be a non-negative integer, got {seed}.")
+        self.path = tuple(path)
+
+    def __repr__(self):
+        return f"RandomStreams(seed={self.seed}, path={self.path})"
+
+    # Spawn key of a stream path; names are hashed, indexes kept as they are
+    @staticmethod
+    def _spawn_key(parts):
+        return tuple(part if isinstance(part, int) else zlib.crc32(str(part).encode()) for part in parts)
+
+    # The generator of one named stream, freshly seeded on every call
+    def generator(self, name):
+        sequence = np.random.SeedSequence(self.seed, spawn_key=self._spawn_key(self.path + (name,)))
+        return np.random.default_rng(sequence)
+
+    # Streams under a sub-path, e.g. child("concurrent", 3) for shard 3 of the concurrent records
+    def child(self, *path):
+        return RandomStreams(self.seed, self.path + path)
+
+    # sys_ids drawn in batches from the IDS stream
+    def ids(self, batch_size=8192):
+        return IdPool(batch_size=batch_size, source=self.generator(IDS).bytes)
+
+    # sys_mod_count values drawn in batches from the MOD_COUNTS stream
+    def mod_counts(self, batch_size=8192):
+        return IntegerPool(self.generator(MOD_COUNTS), 1, 100, batch_size)
@@ -0,0 +1,50 @@
+import re
+from lxml import etree as ET
+from unload_writer import serialize_record
+
+# Placeholder text marking a variable slot in a template record
+SLOT_PATTERN = re.compile(rb"@@(\w+)@@")
+
+
+def slot(name):
+    return f"@@{name}@@"
+
+# Escape a value exactly as lxml serializes it as element text
+def escape_text(value):
+    element = ET.Element("x")
+    element.text = value
+    return ET.tostring(element, encoding="utf-8")[3:-4]
+
+# Escape a value exactly as lxml serializes it inside a double-quoted attribute
+def escape_attribute(value):
+    return ET.tostring(ET.Element("x", a=value), encoding="utf-8")[6:-3]
+
+
+# Pre-serialized record with positional byte slots
+class RecordTemplate:
+    """
+    Serializes a record element once and keeps only its variable slots open.
+
+    The element is built by the regular record builder, with slot(name) placeholders as the
+    text or display_value of every field that changes between records. Everything else,
+    including per-discovery-model values and the run timestamp, is escaped and serialized
+    by lxml once, so render() output is byte-identical to serialize_record on a fully
+    built element.
+
+    Args:
+    - record (Element): Record element containing slot placeholders.
+    - slot_names (tuple): Expected placeholders in document order; render takes the values in this order.
+    """
+
+    def __init__(self, record, slot_names):
+        parts = SLOT_PATTERN.split(serialize_record(record))
+        found = tuple(name.decode() for name in parts[1::2])
+        if found != tuple(slot_names):
+            raise ValueError(f"Template slots {found} do not match the expected {tuple(slot_names)}.")
+
+        self.slot_names = found
+        self._format = b"%b".join(part.replace(b"%", b"%%") for part in parts[0::2])
+
+    # values are already escaped bytes, one per slot
+    def render(self, *values):
+        return self._format % values
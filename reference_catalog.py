@@ -0,0 +1,63 @@
+from collections.abc import Mapping
+
+# Reference tables and the CSV file each one is loaded from
+REFERENCE_FILES = {
+    "DISCOVERY_MODELS": "discovery.csv",
+    "USER_NAMES": "user.csv",
+    "GROUP_NAMES": "group.csv",
+    "LICENSE_SERVER_VALUES": "license_server.csv",
+    "LICENSE_TYPE_VALUES": "license_type.csv",
+}
+
+# Reference tables that make up a catalog
+TABLE_NAMES = tuple(REFERENCE_FILES)
+
+
+# Build a key -> first row index map, matching the first-match semantics of a linear scan
+def _first_index(rows, field):
+    index = {}
+    for i, row in enumerate(rows):
+        index.setdefault(row.get(field), i)
+    return index
+
+
+# Read-only reference tables with hash indexes over the discovery models
+class ReferenceCatalog(Mapping):
+    """
+    Reference tables loaded once, with O(1) lookups for the generator hot loops.
+
+    Behaves like the plain {table name: list of row dicts} mapping it is built from, so
+    catalog["DISCOVERY_MODELS"] still returns the rows. On top of that it indexes the
+    discovery models by norm_product, and keeps the row count of every table for index-based
+    sampling.
+
+    Args:
+    - tables (dict): Table name -> list of row dicts, for every name in TABLE_NAMES.
+    - version (str): Identifies the reference data content, e.g. a hash of the CSV files.
+    """
+
+    def __init__(self, tables, version=None):
+        self.version = version
+        self._tables = {name: list(tables[name]) for name in TABLE_NAMES}
+        models = self._tables["DISCOVERY_MODELS"]
+
+        self.sizes = {name: len(rows) for name, rows in self._tables.items()}
+        self._by_norm_product = _first_index(models, "norm_product")
+
+    def __getitem__(self, name):
+        return self._tables[name]
+
+    def __iter__(self):
+        return iter(self._tables)
+
+    def __len__(self):
+        return len(self._tables)
+
+    # First discovery model for a normalized product, or None
+    def discovery_for_product(self, norm_product):
+        i = self._by_norm_product.get(norm_product)
+        return None if i is None else self._tables["DISCOVERY_MODELS"][i]
+
+    # Distinct normalized products of the discovery models, in table order
+    def norm_products(self):
+        return [product for product in self._by_norm_product if isinstance(product, str)]
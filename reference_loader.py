@@ -0,0 +1,103 @@
+import hashlib
+import os
+import pickle
+import threading
+from reference_catalog import REFERENCE_FILES, ReferenceCatalog
+
+# Process-wide caches, shared by every Streamlit session and rerun in this process
+_lock = threading.RLock()
+_digests = {}   # absolute path -> ((mtime_ns, size), sha1 hex digest)
+_tables = {}    # (absolute path, dtype) -> (sha1 hex digest, records)
+_catalogs = {}  # absolute data_dir -> ReferenceCatalog
+
+
+# Content hash of a file, recomputed only when its mtime or size changes
+def file_digest(path):
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    stat_key = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        cached = _digests.get(path)
+        if cached is not None and cached[0] == stat_key:
+            return cached[1]
+
+        sha1 = hashlib.sha1()
+        with open(path, "rb") as csv_file:
+            for chunk in iter(lambda: csv_file.read(1024 * 1024), b""):
+                sha1.update(chunk)
+        _digests[path] = (stat_key, sha1.hexdigest())
+        return _digests[path][1]
+
+# Rows of a CSV file as dicts, parsed once per process until the file content changes
+def load_csv_records(path, dtype=None):
+    """
+    Reads a CSV file into a list of row dicts, caching the result per process.
+
+    The file is parsed again only when its content hash changes; touching a file without
+    changing it costs one hash, not a parse. The returned list is shared between callers
+    and must not be modified.
+    """
+    digest = file_digest(path)
+    key = (os.path.abspath(path), dtype)
+    with _lock:
+        cached = _tables.get(key)
+        if cached is not None and cached[0] == digest:
+            return cached[1]
+
+        # pandas is imported on first parse, so a snapshot load never pays for it
+        import pandas as pd
+
+        records = pd.read_csv(path, dtype=dtype).to_dict(orient="records")
+        _tables[key] = (digest, records)
+        return records
+
+
+# Load the reference tables from data_dir into a cached ReferenceCatalog
+def load_reference_data(data_dir=".", snapshot_path=None):
+    """
+    Loads the five reference CSV files as one ReferenceCatalog, once per process.
+
+    The catalog's version is a hash over the contents of all five files. The cached catalog
+    is reused for as long as that version is unchanged.
+
+    Args:
+    - data_dir (str): Directory holding the reference CSV files.
+    - snapshot_path (str): Optional pickle snapshot of the parsed tables. A snapshot with
+      the current version is loaded instead of parsing the CSVs; otherwise the CSVs are
+      parsed and the snapshot is rewritten.
+
+    Returns:
+    - ReferenceCatalog: Read-only reference tables with lookup indexes.
+    """
+    paths = {name: os.path.join(data_dir, file_name) for name, file_name in REFERENCE_FILES.items()}
+    version = hashlib.sha1("".join(file_digest(path) for path in paths.values()).encode()).hexdigest()
+
+    with _lock:
+        catalog = _catalogs.get(os.path.abspath(data_dir))
+        if catalog is not None and catalog.version == version:
+            return catalog
+
+        tables = _read_snapshot(snapshot_path, version) if snapshot_path else None
+        if tables is None:
+            tables = {name: load_csv_records(path, dtype=str) for name, path in paths.items()}
+            if snapshot_path:
+                _write_snapshot(snapshot_path, version, tables)
+
+        catalog = _catalogs[os.path.abspath(data_dir)] = ReferenceCatalog(tables, version)
+        return catalog
+
+
+def _read_snapshot(snapshot_path, version):
+    try:
+        with open(snapshot_path, "rb") as snapshot_file:
+            snapshot = pickle.load(snapshot_file)
+    except (FileNotFoundError, pickle.UnpicklingError, EOFError):
+        return None
+    return snapshot["tables"] if snapshot.get("version") == version else None
+
+# Write the snapshot atomically so a concurrent reader never sees a partial file
+def _write_snapshot(snapshot_path, version, tables):
+    temp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as snapshot_file:
+        pickle.dump({"version": version, "tables": tables}, snapshot_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, snapshot_path)
@@ -0,0 +1,115 @@
+import os
+import shutil
+import threading
+from collections import OrderedDict
+import numpy as np
+from usage_engine import DAILY
+from usage_shapes import DEFAULT_SHAPE
+
+# Default budget for the unload files and columns kept by the process-wide cache
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+# Key of one generation scenario; every input that changes the output is part of it
+def generation_key(reference, start_date, end_date, quantity, num_records, range_start, range_end,
+                   seed=None, workers=1, compression="none", level=None, interval=DAILY,
+                   products=None, weights=None, split_method="weighted", part_records=None, part_bytes=None,
+                   output_format="xml", shape=DEFAULT_SHAPE, shape_options=None):
+    return (
+        str(start_date), str(end_date), int(quantity), int(num_records), int(range_start), int(range_end),
+        seed, int(workers), compression, level, int(interval / np.timedelta64(1, "m")),
+        None if products is None else tuple(products), None if weights is None else tuple(map(float, weights)),
+        split_method, part_records, part_bytes, output_format, shape,
+        None if shape_options is None else tuple(sorted((name, float(value)) for name, value in shape_options.items())),
+        reference.version,
+    )
+
+# Bytes a result holds: its unload files on disk plus its NumPy columns
+def result_size(result):
+    paths = set(result.paths.values())
+    if result.bundle_path:
+        paths.add(result.bundle_path)
+    file_bytes = sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+    column_bytes = sum(column.nbytes for column in (
+        result.dates, result.product_usage, result.denial_dates, result.denial_counts
+    ))
+    return file_bytes + column_bytes
+
+
+# LRU cache of generation results, bounded by the total bytes they hold
+class ResultCache:
+    """
+    Process-wide memo of GenerationResults keyed by generation_key.
+
+    Entries are evicted least recently used first until the cached bytes fit max_bytes; the
+    most recent entry is always kept, even when it alone exceeds the budget. Evicting an entry
+    deletes its output directory, so sessions keep the key and look the result up on every
+    rerun instead of holding on to the result itself.
+
+    Args:
+    - max_bytes (int): Budget for the unload files and columns of all cached results.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()  # key -> (result, output_dir, size)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    # Cached result for key, marked as most recently used, or None
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, result, output_dir=None):
+        """
+        Caches a result and evicts older entries over the budget.
+
+        If another session cached the same key in the meantime, that result is kept and
+        returned, and the new result's output directory is deleted.
+
+        Returns:
+        - GenerationResult: The result now cached under key.
+        """
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None:
+                self._entries.move_to_end(key)
+                _remove_output(output_dir)
+                return existing[0]
+
+            size = result_size(result)
+            self._entries[key] = (result, output_dir, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted_dir, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+                _remove_output(evicted_dir)
+            return result
+
+    # Drop every entry and delete its output
+    def clear(self):
+        with self._lock:
+            for _, output_dir, _ in self._entries.values():
+                _remove_output(output_dir)
+            self._entries.clear()
+            self.total_bytes = 0
+
+
+def _remove_output(output_dir):
+    if output_dir:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+# Shared by every Streamlit session in this process
+default_cache = ResultCache()
@@ -0,0 +1,140 @@
+import argparse
+import json
+import random
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Import Set insertMultiple and Table API paths accepted by the stand-in
+IMPORT_PATH = re.compile(r"^/api/now/import/(?P<table>[\w.]+)/insertMultiple$")
+TABLE_PATH = re.compile(r"^/api/now/table/(?P<table>[\w.]+)$")
+
+
+# Local stand-in for the ServiceNow endpoints used by servicenow_upload, for testing without an instance
+class ServiceNowStub(ThreadingHTTPServer):
+    """
+    Counts the rows posted per table and can fail a fraction of requests on purpose.
+
+    Connections are kept alive like on a real instance. Import Set insertMultiple takes
+    {"records": [...]} batches; the Table API, like on an instance, takes one record object
+    per POST and rejects batches with 400. GET /stub/stats returns the row and request counts
+    as JSON.
+
+    Args:
+    - address (tuple): (host, port) to listen on; port 0 picks a free port.
+    - fail_rate (float): Fraction of POSTs answered with 503 and Retry-After: 0.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), fail_rate=0.0):
+        super().__init__(address, _StubHandler)
+        self.fail_rate = fail_rate
+        self.rows = {}
+        self.requests = 0
+        self.failures = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stats(self):
+        with self._lock:
+            return {"rows": dict(self.rows), "requests": self.requests, "failures": self.failures,
+                    "connections": self.connections}
+
+    # Serve in a background thread; returns the thread
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY each reply waits on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server._lock:
+            self.server.connections += 1
+
+    def _reply(self, status, payload, headers=()):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/stub/stats":
+            self._reply(200, self.server.stats())
+        else:
+            self._reply(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        match = IMPORT_PATH.match(self.path) or TABLE_PATH.match(self.path)
+        if match is None:
+            self._reply(404, {"error": {"message": "Not found"}})
+            return
+
+        server = self.server
+        if random.random() < server.fail_rate:
+            with server._lock:
+                server.failures += 1
+            self._reply(503, {"error": {"message": "Injected failure"}}, [("Retry-After", "0")])
+            return
+
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            self._reply(400, {"error": {"message": "Invalid JSON"}})
+            return
+
+        table = match.group("table")
+        if match.re is TABLE_PATH:
+            # The Table API inserts exactly one record per POST, given as a JSON object of fields
+            if not isinstance(payload, dict) or "records" in payload:
+                self._reply(400, {"error": {"message": "The Table API inserts a single record per request"}})
+                return
+            rows = [payload]
+        else:
+            rows = payload.get("records", []) if isinstance(payload, dict) else []
+
+        with server._lock:
+            server.requests += 1
+            server.rows[table] = server.rows.get(table, 0) + len(rows)
+        self._reply(201, {"result": {"table": table, "inserted": len(rows)}})
+
+    # Keep the console quiet; the stats endpoint is the record of what was received
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the ServiceNow Import Set API.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (default: 127.0.0.1).")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on (default: 8080).")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of POSTs answered with 503 (default: 0).")
+    args = parser.parse_args()
+
+    server = ServiceNowStub((args.host, args.port), args.fail_rate)
+    print(f"ServiceNow stand-in listening on {server.url} (stats at {server.url}/stub/stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
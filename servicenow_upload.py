@@ -0,0 +1,249 @@
+import base64
+import http.client
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from unload_reader import iter_unload_records, open_unload_documents
+
+# Import Set API endpoint that inserts a batch of rows into the import set staging table {table}
+DEFAULT_PATH_TEMPLATE = "/api/now/import/{table}/insertMultiple"
+
+# Table API paths insert one record object per request instead of a batch
+TABLE_API_PREFIX = "/api/now/table/"
+
+# Target table of the records of each unload kind
+UNLOAD_TABLES = {
+    "concurrent": "samp_eng_app_concurrent_usage",
+    "denial": "samp_eng_app_denial",
+    "license": "samp_eng_app_license",
+}
+
+# Responses worth retrying: throttling and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class UploadError(Exception):
+    pass
+
+
+# Outcome of one upload run
+class UploadReport:
+    def __init__(self):
+        self.records = 0
+        self.batches = 0
+        self.retries = 0
+        self.seconds = 0.0
+        self.tables = {}
+
+    @property
+    def records_per_sec(self):
+        return self.records / self.seconds if self.seconds else 0.0
+
+
+class ServiceNowUploader:
+    """
+    Posts records in batches to a ServiceNow Import Set (or compatible) REST endpoint.
+
+    Every worker thread keeps one persistent HTTP/1.1 connection and reuses it for all its
+    batches. At most max_in_flight batches are sent at once and at most twice that many are
+    queued, so memory stays bounded however many records are streamed in. Throttled (429)
+    and transient (5xx, connection) failures are retried with exponential backoff and jitter,
+    honouring Retry-After.
+
+    Args:
+    - base_url (str): Instance URL, e.g. https://dev12345.service-now.com.
+    - user, password (str): Basic auth credentials, or None.
+    - token (str): Bearer token, used instead of basic auth when given.
+    - path_template (str): Endpoint path; {table} is replaced by the staging table of the
+      record's table. Batches are posted as {"records": [...]}, except to Table API paths
+      (/api/now/table/{table}), which take one record object per request.
+    - staging_tables (dict): Unload kind or target table -> import set staging table, e.g.
+      {"denial": "u_denial_import"}. The Import Set API only loads into staging tables, whose
+      transform maps then write the samp_eng_app_* tables; unmapped tables are posted under
+      their own name.
+    - batch_size (int): Records per request.
+    - max_in_flight (int): Concurrent requests.
+    - max_retries (int): Retries per batch before the upload fails.
+    - backoff (float): Initial retry delay in seconds, doubled on every retry.
+    - timeout (float): Socket timeout in seconds.
+    """
+
+    def __init__(self, base_url, user=None, password=None, token=None, path_template=DEFAULT_PATH_TEMPLATE,
+                 batch_size=1000, max_in_flight=4, max_retries=5, backoff=0.5, timeout=60, staging_tables=None):
+        url = urlsplit(base_url)
+        if url.scheme not in ("http", "https") or not url.hostname:
+            raise ValueError(f"Invalid ServiceNow URL: {base_url}")
+        self._connection_class = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+        self._host, self._port = url.hostname, url.port
+        self._base_path = url.path.rstrip("/")
+        self.path_template = path_template
+        self.single_records = (self._base_path + path_template).startswith(TABLE_API_PREFIX)
+        self.staging_tables = {
+            UNLOAD_TABLES.get(name, name): staging for name, staging in (staging_tables or {}).items()
+        }
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self._headers = {"Content-Type": "application/json", "Accept": "application/json"}
+        if token:
+            self._headers["Authorization"] = f"Bearer {token}"
+        elif user:
+            credentials = base64.b64encode(f"{user}:{password or ''}".encode()).decode()
+            self._headers["Authorization"] = f"Basic {credentials}"
+
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    # This thread's persistent connection, opened on first use
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._connection_class(self._host, self._port, timeout=self.timeout)
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def _reset_connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    # Post one batch, as one request or one per record; returns the number of retries it took
+    def _post(self, table, records):
+        path = self._base_path + self.path_template.format(table=self.staging_tables.get(table, table))
+        if self.single_records:
+            return sum(self._send(path, json.dumps(record).encode("utf-8")) for record in records)
+        return self._send(path, json.dumps({"records": records}).encode("utf-8"))
+
+    # Post one request body, retrying transient failures; returns the number of retries it took
+    def _send(self, path, body):
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                connection = self._connection()
+                connection.request("POST", path, body=body, headers=self._headers)
+                response = connection.getresponse()
+                # Read the whole body so the connection can carry the next request
+                payload = response.read()
+                if 200 <= response.status < 300:
+                    return attempt
+                if response.status not in RETRY_STATUSES:
+                    raise UploadError(f"POST {path} failed with {response.status}: {payload[:500].decode(errors='replace')}")
+                error = f"HTTP {response.status}"
+                retry_after = response.getheader("Retry-After")
+            except (http.client.HTTPException, OSError) as e:
+                self._reset_connection()
+                error = str(e) or type(e).__name__
+
+            if attempt == self.max_retries:
+                raise UploadError(f"POST {path} failed after {self.max_retries} retries: {error}")
+            delay = self.backoff * 2 ** attempt * (0.5 + random.random())
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            time.sleep(delay)
+
+    # Group a (table, record) stream into per-table batches, keeping the stream order
+    def _batches(self, records):
+        batches = {}
+        for table, record in records:
+            batch = batches.setdefault(table, [])
+            batch.append(record)
+            if len(batch) == self.batch_size:
+                yield table, batches.pop(table)
+        yield from batches.items()
+
+    def upload(self, records, progress=None):
+        """
+        Uploads a stream of (table, record dict) pairs.
+
+        Args:
+        - records (iterable): (table name, {field: value}) pairs, e.g. from iter_unload_records.
+        - progress (callable): Called from the calling thread with the UploadReport as batches
+          are queued, and once more at the end.
+
+        Returns:
+        - UploadReport: Records, batches and retries per run, and the time it took.
+
+        Raises:
+        - UploadError: If a batch is rejected or keeps failing after all retries.
+        """
+        report = UploadReport()
+        in_flight = threading.BoundedSemaphore(self.max_in_flight * 2)
+        failures = []
+        start = time.perf_counter()
+
+        def done(future, table, count):
+            in_flight.release()
+            if future.exception() is not None:
+                failures.append(future.exception())
+                return
+            with self._lock:
+                report.records += count
+                report.batches += 1
+                report.retries += future.result()
+                report.tables[table] = report.tables.get(table, 0) + count
+                report.seconds = time.perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            for table, batch in self._batches(records):
+                in_flight.acquire()
+                if failures:
+                    in_flight.release()
+                    break
+                future = pool.submit(self._post, table, batch)
+                future.add_done_callback(lambda future, table=table, count=len(batch): done(future, table, count))
+                # Reported from the calling thread, so UI callbacks can update widgets
+                if progress is not None:
+                    progress(report)
+
+        # The pool's threads are gone, so their connections can be closed
+        self.close()
+        report.seconds = time.perf_counter() - start
+        if failures:
+            raise failures[0]
+        if progress is not None:
+            progress(report)
+        return report
+
+    def close(self):
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# Every record of the unload files at paths, as (table, record) pairs
+def iter_unload_files(paths):
+    for path in paths:
+        for _, document in open_unload_documents(path):
+            yield from iter_unload_records(document)
+
+
+def upload_unloads(uploader, paths, progress=None):
+    """
+    Streams the records of generated unload files straight to ServiceNow.
+
+    Args:
+    - uploader (ServiceNowUploader): Configured uploader.
+    - paths (iterable): Unload files (.xml, .xml.gz, .xml.zst) or zip bundles; each path is
+      read once even if listed more than once, as with the bundle of a GenerationResult.
+
+    Returns:
+    - UploadReport: Totals of the upload.
+    """
+    return uploader.upload(iter_unload_files(dict.fromkeys(paths)), progress)
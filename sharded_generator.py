@@ -0,0 +1,139 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from cd_generator import (
+    UNLOAD_FILE_NAMES,
+    concurrent_columns,
+    denial_count,
+    emit_concurrent_records,
+    emit_denial_records,
+    emit_license_records,
+    find_missing_products,
+    prepare_run,
+    slice_denials,
+)
+from generation_progress import GenerationCancelled, GenerationProgress
+from generation_result import GenerationResult
+from instrumentation import StageTimer
+from random_streams import RandomStreams
+from unload_writer import RecordFragmentWriter, UnloadOutput
+from usage_engine import DAILY
+from usage_shapes import DEFAULT_SHAPE
+
+# Shards per worker, so a slow shard does not leave the other cores idle
+SHARDS_PER_WORKER = 4
+
+# Read-only copy of the reference tables, set once per worker process
+_worker_reference = None
+
+
+def _init_worker(reference):
+    global _worker_reference
+    _worker_reference = reference
+
+# (start, stop) bounds of at most shard_count contiguous, order-preserving chunks of count items
+def _shard_bounds(count, shard_count):
+    if not count:
+        return []
+    size = -(-count // shard_count)
+    return [(i, min(i + size, count)) for i in range(0, count, size)]
+
+# Worker task: emit one shard of records into a fragment file
+def _write_shard(kind, items, streams, fragment_path, current_time, products):
+    with RecordFragmentWriter(fragment_path) as writer:
+        if kind == "concurrent":
+            emit_concurrent_records(writer, _worker_reference, items, current_time, products, streams)
+        else:
+            emit_denial_records(writer, _worker_reference, items, current_time, streams)
+    return writer.record_count
+
+
+def generate_sharded(output_dir, reference, start_date, end_date, quantity, num_records,
+                     range_start, range_end, workers, seed=None, compression="none", level=None, timer=None,
+                     interval=DAILY, products=None, weights=None, split_method="weighted",
+                     part_records=None, part_bytes=None, current_time=None, shape=DEFAULT_SHAPE,
+                     shape_options=None, progress=None):
+    """
+    Generates the three unload files with record emission spread over a process pool.
+
+    The increment/denial/decrement plan is cheap and sequential, so it runs in the parent. The
+    planned concurrent points and denials are then split into contiguous shards. Each worker
+    serializes its shard into a fragment file drawing sys_ids from its own child(kind, index)
+    streams of RandomStreams(seed), and the fragments are concatenated in order into
+    well-formed <unload> documents. The plan and the license records use the same streams as
+    a single-process run, so only the concurrent and denial sys_ids depend on the worker count.
+
+    progress advances as each shard is merged; cancelling it drops the shards not yet started.
+
+    Returns the same GenerationResult as generate_to_directory.
+    """
+    streams = RandomStreams(seed)
+    timer = timer or StageTimer()
+    progress = progress or GenerationProgress()
+    current_time, license_quantities, plan = prepare_run(
+        reference, start_date, end_date, quantity, num_records, range_start, range_end, streams, timer, progress,
+        current_time, interval=interval, products=products, weights=weights, split_method=split_method,
+        shape=shape, shape_options=shape_options
+    )
+    os.makedirs(output_dir, exist_ok=True)
+    shard_count = workers * SHARDS_PER_WORKER
+    shards = {
+        "concurrent": [
+            concurrent_columns(plan, start, stop)
+            for start, stop in _shard_bounds(len(plan.sample_times), shard_count)
+        ],
+        "denial": [
+            slice_denials(plan.denials, start, stop)
+            for start, stop in _shard_bounds(denial_count(plan.denials), shard_count)
+        ],
+    }
+
+    counts = {}
+    fragment_dir = tempfile.mkdtemp(prefix="cdgen_shards_", dir=output_dir)
+    output = UnloadOutput(output_dir, compression, level, part_records, part_bytes)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(reference,)) as pool:
+            futures = {
+                kind: [
+                    pool.submit(
+                        _write_shard, kind, items, streams.child(kind, index),
+                        os.path.join(fragment_dir, f"{kind}_{index:05d}.part"), current_time, plan.products
+                    )
+                    for index, items in enumerate(kind_shards)
+                ]
+                for kind, kind_shards in shards.items()
+            }
+
+            # Merge the fragments in shard order as they complete; a stage includes waiting for its shards
+            try:
+                for kind, kind_futures in futures.items():
+                    with timer.stage(f"{kind} records") as stage:
+                        with output.writer(kind, UNLOAD_FILE_NAMES[kind], current_time) as writer:
+                            for index, future in enumerate(kind_futures):
+                                fragment_path = os.path.join(fragment_dir, f"{kind}_{index:05d}.part")
+                                record_count = future.result()
+                                writer.append_fragment(fragment_path, record_count)
+                                os.remove(fragment_path)
+                                progress.advance(kind, record_count)
+                        counts[kind] = stage["records"] = writer.record_count
+                        stage["bytes"] = writer.bytes_written
+            except GenerationCancelled:
+                # Only the shards already running are waited for
+                pool.shutdown(cancel_futures=True)
+                raise
+
+        with timer.stage("license records") as stage:
+            with output.writer("license", UNLOAD_FILE_NAMES["license"], current_time) as license_writer:
+                with progress.track("license", license_writer) as tracked:
+                    emit_license_records(
+                        tracked, reference, license_quantities, current_time, streams.child("license")
+                    )
+            counts["license"] = stage["records"] = license_writer.record_count
+            stage["bytes"] = license_writer.bytes_written
+    finally:
+        output.close()
+        shutil.rmtree(fragment_dir, ignore_errors=True)
+
+    return GenerationResult(plan, find_missing_products(reference, plan.products), output.paths, counts,
+                            output.bundle_path, timer, seed=streams.seed)
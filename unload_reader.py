@@ -0,0 +1,91 @@
+import gzip
+import zipfile
+from datetime import datetime
+from lxml import etree as ET
+from unload_writer import MANIFEST_FILE_NAME
+
+
+# Helper function to parse Concurrent XML
+def parse_concurrent_xml(concurrent_xml_source):
+    tree = ET.parse(concurrent_xml_source)
+    root = tree.getroot()
+    daily_usage = {}
+
+    for record in root.findall("samp_eng_app_concurrent_usage"):
+        date_str = record.find("usage_date").text
+        value = int(record.find("concurrent_usage").text)
+
+        # Aggregate usage for the same date
+        if date_str in daily_usage:
+            daily_usage[date_str] += value
+        else:
+            daily_usage[date_str] = value
+
+    # Sort dates and convert to lists; usage_date is a date or, for sub-daily data, a full timestamp
+    sample_times = sorted(daily_usage.keys())
+    dates = [datetime.fromisoformat(sample_time) for sample_time in sample_times]
+    values = [daily_usage[sample_time] for sample_time in sample_times]
+    return dates, values
+
+# Helper function to parse Denial XML
+def parse_denial_xml(denial_xml_source):
+    tree = ET.parse(denial_xml_source)
+    root = tree.getroot()
+    dates = []
+    values = []
+    for record in root.findall("samp_eng_app_denial"):
+        date_str = record.find("denial_date").text
+        value = int(record.find("total_denial_count").text)
+        dates.append(datetime.fromisoformat(date_str))  # Convert to datetime object
+        values.append(value)
+    return dates, values
+
+
+# Open every unload document in a plain, .gz or .zst file, or in a zip bundle, as binary streams
+def open_unload_documents(path):
+    """
+    Yields (name, binary stream) for each unload document stored at path.
+
+    Zip bundles yield each XML entry in archive order, including split parts; the manifest is
+    skipped. Streams are closed once the caller moves on to the next document.
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as bundle:
+            for name in bundle.namelist():
+                if name != MANIFEST_FILE_NAME:
+                    with bundle.open(name) as document:
+                        yield name, document
+    elif path.endswith(".gz"):
+        with gzip.open(path, "rb") as document:
+            yield path, document
+    elif path.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstd compression requires the 'zstandard' package.")
+        with open(path, "rb") as compressed, zstandard.ZstdDecompressor().stream_reader(compressed) as document:
+            yield path, document
+    else:
+        with open(path, "rb") as document:
+            yield path, document
+
+
+def iter_unload_records(source):
+    """
+    Streams the records of an <unload> document without building the whole tree.
+
+    Every record is yielded as (table name, {field: value}); reference fields yield their
+    sys_id, empty fields an empty string. Each record is released once it has been yielded,
+    so memory stays flat for files of any size.
+    """
+    depth = 0
+    for event, element in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 1:
+            yield element.tag, {field.tag: field.text or "" for field in element}
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
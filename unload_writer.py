@@ -0,0 +1,357 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import zipfile
+from lxml import etree as ET
+
+# Supported output compressions and the file suffix each one adds
+COMPRESSION_SUFFIXES = {"none": "", "gzip": ".gz", "zstd": ".zst", "zip": ""}
+
+# Name of the archive holding all unloads in zip mode
+BUNDLE_FILE_NAME = "unload_records.zip"
+
+# Archive entry listing the parts of split unloads
+MANIFEST_FILE_NAME = "manifest.json"
+
+# Closing tag every part ends with, counted against the part byte limit
+CLOSE_TAG = b"</unload>\n"
+
+
+# Serialize a record exactly as pretty_print renders it as a direct child of <unload>
+def serialize_record(record):
+    ET.indent(record, space="  ", level=1)
+    return b"  " + ET.tostring(record, encoding="utf-8") + b"\n"
+
+
+# Streaming writer for <unload> documents
+class UnloadWriter:
+    """
+    Writes samp_eng_app_* records into an <unload> document one at a time.
+
+    Each record is serialized and flushed to the sink as soon as it is appended,
+    so memory use stays flat no matter how many records are generated. The bytes
+    written are identical to ET.tostring(root, pretty_print=True, encoding="utf-8")
+    on the equivalent in-memory tree.
+
+    Args:
+    - sink (str | os.PathLike | binary file object): Where to write the document.
+    - unload_date (str): Value of the unload_date attribute on the root element.
+    - close_sink (bool): Close a file object sink on close(). Paths are always closed.
+    """
+
+    def __init__(self, sink, unload_date, close_sink=False):
+        if isinstance(sink, (str, os.PathLike)):
+            self._file = open(sink, "wb")
+            self._owns_file = True
+        else:
+            self._file = sink
+            self._owns_file = close_sink
+
+        # Serialize the empty root once and reuse its opening tag
+        empty_root = ET.tostring(ET.Element("unload", unload_date=unload_date), encoding="utf-8")
+        self._empty_root = empty_root + b"\n"
+        self._open_tag = empty_root[:-2] + b">\n"
+        self._started = False
+        self._closed = False
+        self.record_count = 0
+        self.bytes_written = 0
+
+    def _write(self, data):
+        self._file.write(data)
+        self.bytes_written += len(data)
+
+    def _start(self):
+        if self._closed:
+            raise ValueError("Cannot append to a closed UnloadWriter.")
+        if not self._started:
+            self._write(self._open_tag)
+            self._started = True
+
+    def append(self, record):
+        self.append_serialized(serialize_record(record))
+
+    # Append a record already serialized by serialize_record or a RecordTemplate
+    def append_serialized(self, data):
+        self._start()
+        self._write(data)
+        self.record_count += 1
+
+    # Copy records already serialized by a RecordFragmentWriter into the document
+    def append_fragment(self, fragment, record_count):
+        if record_count == 0:
+            return
+        self._start()
+        if isinstance(fragment, (str, os.PathLike)):
+            with open(fragment, "rb") as fragment_file:
+                self.bytes_written += _copy_stream(fragment_file, self._file)
+        else:
+            self.bytes_written += _copy_stream(fragment, self._file)
+        self.record_count += record_count
+
+    def close(self):
+        if self._closed:
+            return
+        self._write(CLOSE_TAG if self._started else self._empty_root)
+        self._closed = True
+        if self._owns_file:
+            self._file.close()
+        else:
+            self._file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# Writes serialized records with no <unload> wrapper, to be merged later with append_fragment
+class RecordFragmentWriter:
+    def __init__(self, sink):
+        self._file = open(sink, "wb")
+        self.record_count = 0
+        self.bytes_written = 0
+
+    def append(self, record):
+        self.append_serialized(serialize_record(record))
+
+    def append_serialized(self, data):
+        self._file.write(data)
+        self.bytes_written += len(data)
+        self.record_count += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# Binary sink that hashes everything written through it
+class _HashingSink:
+    def __init__(self, sink):
+        self._sink = sink
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.sha256.update(data)
+        return self._sink.write(data)
+
+    def flush(self):
+        self._sink.flush()
+
+    def close(self):
+        self._sink.close()
+
+
+# Splits a fragment file into its serialized records; every record opens with a tag indented by two spaces
+def _fragment_records(fragment):
+    record = []
+    for line in fragment:
+        if line.startswith(b"  <") and not line.startswith(b"  </") and record:
+            yield b"".join(record)
+            record = []
+        record.append(line)
+    if record:
+        yield b"".join(record)
+
+
+# Streaming writer for one unload kind split into numbered <unload> parts
+class SplitUnloadWriter:
+    """
+    Writes records like UnloadWriter, but starts a new numbered part whenever the current one
+    would exceed max_records records or max_bytes bytes.
+
+    Every part is a complete <unload> document. Byte limits count the uncompressed XML,
+    including the closing tag; a single record larger than max_bytes gets a part of its own.
+    The SHA-256 of each part is computed while it is written.
+
+    Args:
+    - open_part (callable): Opens a binary sink for a part file name.
+    - file_name (str): Unload file name; parts are named <stem>_partNNN<ext>.
+    - unload_date (str): Value of the unload_date attribute on every part.
+    - max_records (int): Maximum records per part, or None.
+    - max_bytes (int): Maximum bytes per part, or None.
+    """
+
+    def __init__(self, open_part, file_name, unload_date, max_records=None, max_bytes=None):
+        self._open_part = open_part
+        self._stem, self._ext = os.path.splitext(file_name)
+        self._unload_date = unload_date
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.parts = []
+        self.record_count = 0
+        self.bytes_written = 0
+        self._writer = None
+        self._sink = None
+
+    def _next_part(self):
+        self._close_part()
+        name = f"{self._stem}_part{len(self.parts) + 1:03d}{self._ext}"
+        self._sink = _HashingSink(self._open_part(name))
+        self._writer = UnloadWriter(self._sink, self._unload_date, close_sink=True)
+        self.parts.append({"file": name, "records": 0, "bytes": 0, "sha256": None})
+
+    def _close_part(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        part = self.parts[-1]
+        part["records"], part["bytes"] = self._writer.record_count, self._writer.bytes_written
+        part["sha256"] = self._sink.sha256.hexdigest()
+        self.bytes_written += self._writer.bytes_written
+        self._writer = None
+
+    # True if data does not fit in the current part
+    def _full(self, data):
+        writer = self._writer
+        if writer is None:
+            return True
+        if writer.record_count == 0:
+            return False
+        if self.max_records is not None and writer.record_count >= self.max_records:
+            return True
+        if self.max_bytes is not None:
+            return writer.bytes_written + len(data) + len(CLOSE_TAG) > self.max_bytes
+        return False
+
+    def append(self, record):
+        self.append_serialized(serialize_record(record))
+
+    def append_serialized(self, data):
+        if self._full(data):
+            self._next_part()
+        self._writer.append_serialized(data)
+        self.record_count += 1
+
+    # Records of a fragment are re-split one by one, so part limits still hold
+    def append_fragment(self, fragment, record_count):
+        if record_count == 0:
+            return
+        if isinstance(fragment, (str, os.PathLike)):
+            with open(fragment, "rb") as fragment_file:
+                self.append_fragment(fragment_file, record_count)
+            return
+        for data in _fragment_records(fragment):
+            self.append_serialized(data)
+
+    # Finish the last part; a kind without records still gets one empty part
+    def close(self):
+        if self._writer is None and not self.parts:
+            self._next_part()
+        self._close_part()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# Copy src to dst in chunks and return the number of bytes copied
+def _copy_stream(src, dst):
+    start = src.tell()
+    shutil.copyfileobj(src, dst, 1024 * 1024)
+    return src.tell() - start
+
+
+# Open a compressing binary stream for path
+def _open_compressed(path, compression, level):
+    if compression == "gzip":
+        return gzip.open(path, "wb", compresslevel=9 if level is None else level)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstd compression requires the 'zstandard' package.")
+        compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+        return compressor.stream_writer(open(path, "wb"), closefd=True)
+    return open(path, "wb")
+
+
+# Destination for a set of unload documents
+class UnloadOutput:
+    """
+    Opens UnloadWriters for the unload documents of one run.
+
+    Compression happens inside the writer's sink, so records are compressed as they are
+    written rather than in a second pass over the finished file. With "zip" all documents
+    go into one archive; its entries are written one at a time, so only one writer may be
+    open at once.
+
+    With a part limit every unload is split into numbered parts (see SplitUnloadWriter),
+    delivered in one zip archive together with a manifest.json listing the record count,
+    size and SHA-256 of every part. The archive is deflated with "zip" and stored with "none".
+
+    Args:
+    - output_dir (str): Directory for the output files.
+    - compression (str): One of COMPRESSION_SUFFIXES: "none", "gzip", "zstd" or "zip".
+    - level (int): Compression level, or None for the library default.
+    - part_records (int): Maximum records per part, or None.
+    - part_bytes (int): Maximum uncompressed bytes per part, or None.
+    """
+
+    def __init__(self, output_dir, compression="none", level=None, part_records=None, part_bytes=None):
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unknown compression '{compression}', expected one of {list(COMPRESSION_SUFFIXES)}.")
+        self.split = part_records is not None or part_bytes is not None
+        if self.split and compression not in ("none", "zip"):
+            raise ValueError("Split unloads are delivered as one zip archive; use compression 'none' or 'zip'.")
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.compression = compression
+        self.level = level
+        self.part_records = part_records
+        self.part_bytes = part_bytes
+        self.paths = {}
+        self.bundle_path = None
+        self._bundle = None
+        self._split_writers = {}
+        if compression == "zip" or self.split:
+            self.bundle_path = os.path.join(output_dir, BUNDLE_FILE_NAME)
+            self._bundle = zipfile.ZipFile(
+                self.bundle_path, "w", compression=zipfile.ZIP_DEFLATED if compression == "zip" else zipfile.ZIP_STORED,
+                compresslevel=level
+            )
+
+    # Open the writer for one unload document
+    def writer(self, kind, file_name, unload_date):
+        if self.split:
+            self.paths[kind] = self.bundle_path
+            writer = self._split_writers[kind] = SplitUnloadWriter(
+                lambda name: self._bundle.open(name, "w", force_zip64=True), file_name, unload_date,
+                self.part_records, self.part_bytes
+            )
+            return writer
+
+        if self._bundle is not None:
+            self.paths[kind] = self.bundle_path
+            return UnloadWriter(self._bundle.open(file_name, "w", force_zip64=True), unload_date, close_sink=True)
+
+        path = os.path.join(self.output_dir, file_name + COMPRESSION_SUFFIXES[self.compression])
+        self.paths[kind] = path
+        return UnloadWriter(_open_compressed(path, self.compression, self.level), unload_date, close_sink=True)
+
+    # Record count, size and checksum of every part, per unload kind
+    @property
+    def manifest(self):
+        return {kind: writer.parts for kind, writer in self._split_writers.items()}
+
+    def close(self):
+        if self._bundle is not None:
+            if self.split:
+                self._bundle.writestr(MANIFEST_FILE_NAME, json.dumps({"parts": self.manifest}, indent=2))
+            self._bundle.close()
+            self._bundle = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
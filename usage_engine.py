@@ -0,0 +1,134 @@
+import re
+from collections import namedtuple
+import numpy as np
+
+# Phase codes of the increment/denial/decrement state machine
+PHASE_INCREMENT = 0
+PHASE_DENIAL = 1
+PHASE_DECREMENT = 2
+
+# Whole usage series as columns, one row per sample; denial_counts is the total_denial_count of
+# every sample, zero outside denial samples
+UsageSeries = namedtuple(
+    "UsageSeries", ["dates", "values", "phases", "denial_mask", "increment_value", "denial_counts"]
+)
+
+# Samples formatted at a time by sample_time_bytes
+SAMPLE_TIME_BLOCK = 65536
+
+# Default sampling interval: one concurrent point per calendar day
+DAILY = np.timedelta64(1, "D")
+
+# Interval text such as "15m", "15 min", "1h", "6 h" or "1d"
+INTERVAL_PATTERN = re.compile(r"^\s*(\d+)\s*(m|min|h|d)\s*$", re.IGNORECASE)
+INTERVAL_UNITS = {"m": "m", "min": "m", "h": "h", "d": "D"}
+
+
+# Integer ceil(a / b) for positive b
+def _ceil_div(a, b):
+    return -(-a // b)
+
+# Samples an increment run starting at `start` lasts before it reaches the peak
+def _ramp_length(start, quantity, increment_value):
+    return max(1, _ceil_div(quantity - start, increment_value))
+
+
+def parse_interval(text):
+    """
+    Parses a sampling interval such as "15m", "1h", "6 h" or "1d" into a numpy timedelta64.
+
+    Raises:
+    - ValueError: If the text is not a positive count of minutes, hours or days.
+    """
+    match = INTERVAL_PATTERN.match(text)
+    if match is None or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid sampling interval: {text!r} (expected e.g. 15m, 1h, 6h or 1d)")
+    return np.timedelta64(int(match.group(1)), INTERVAL_UNITS[match.group(2).lower()])
+
+# Number of samples from the start of start_date to the end of end_date; an interval that does
+# not divide the range still gets its last sample before the end
+def sample_count(start_date, end_date, interval=DAILY):
+    span = np.datetime64(end_date, "D") + 1 - np.datetime64(start_date, "D")
+    return max(int(_ceil_div(span, interval)), 0)
+
+def sample_time_bytes(dates):
+    """
+    Formats a datetime64 time index in bulk.
+
+    Daily series keep plain YYYY-MM-DD dates; finer series get full YYYY-MM-DD HH:MM:SS
+    timestamps.
+
+    Returns:
+    - numpy array: One fixed-width ASCII bytes string per sample, ready for the record templates.
+    """
+    daily = dates.dtype == np.dtype("datetime64[D]")
+    times = np.empty(len(dates), dtype="S10" if daily else "S19")
+    # Formatted in blocks, as the intermediate unicode strings take four times the bytes
+    for start in range(0, len(dates), SAMPLE_TIME_BLOCK):
+        block = dates[start:start + SAMPLE_TIME_BLOCK]
+        if daily:
+            times[start:start + len(block)] = np.datetime_as_string(block)
+        else:
+            times[start:start + len(block)] = np.char.replace(np.datetime_as_string(block, unit="s"), "T", " ")
+    return times
+
+
+def usage_series(start_date, total_samples, quantity, num_records, range_start, range_end, rng, interval=DAILY):
+    """
+    Computes the increment/denial/decrement usage curve as NumPy arrays.
+
+    Matches the sample-by-sample state machine: the value ramps up by quantity // num_records
+    per sample until it would reach quantity, holds at quantity for a random number of denial
+    samples drawn from [range_start, range_end], ramps down until it is at most quantity / 2,
+    and ramps up again. Every run length except the denial runs follows from the inputs, so
+    the series is laid out segment by segment with np.repeat instead of stepping sample by sample.
+
+    Args:
+    - start_date (date | datetime64): First day of the series; sampling starts at midnight.
+    - total_samples (int): Number of samples.
+    - quantity (int): Threshold/peak value.
+    - num_records (int): Number of records needed to reach the peak.
+    - range_start, range_end (int): Bounds for the number of denial samples per peak.
+    - rng (numpy.random.Generator): Source of the denial-run lengths.
+    - interval (numpy timedelta64): Time between samples, one day by default.
+
+    Returns:
+    - UsageSeries: datetime64 sample times (datetime64[D] for daily sampling), int32 values,
+      int8 phase codes, bool denial-sample mask, the per-sample increment value and the int32
+      denial counts, which are the increment value on every denial sample.
+    """
+    dates = np.datetime64(start_date, "D") + np.arange(total_samples) * interval
+    increment_value = quantity // num_records
+
+    # With a zero increment the ramp never reaches the peak
+    if increment_value == 0 or total_samples == 0:
+        phases = np.full(total_samples, PHASE_INCREMENT, dtype=np.int8)
+        return UsageSeries(dates, np.zeros(total_samples, dtype=np.int32), phases,
+                           np.zeros(total_samples, dtype=bool), increment_value,
+                           np.zeros(total_samples, dtype=np.int32))
+
+    first_ramp = _ramp_length(increment_value, quantity, increment_value)
+    decline = max(1, _ceil_div(quantity, 2 * increment_value))
+    ramp_start = quantity - decline * increment_value + increment_value
+    ramp = _ramp_length(ramp_start, quantity, increment_value)
+
+    # Enough denial/decline/ramp cycles to cover the range, each with its own denial run length
+    cycles = _ceil_div(max(total_samples - first_ramp, 0), range_start + decline + ramp) + 1
+    denial_runs = rng.integers(range_start, range_end, size=cycles, endpoint=True)
+
+    lengths = np.concatenate(([first_ramp], np.column_stack((
+        denial_runs, np.full(cycles, decline), np.full(cycles, ramp)
+    )).ravel()))
+    starts = np.concatenate(([increment_value], np.tile([quantity, quantity - increment_value, ramp_start], cycles)))
+    steps = np.concatenate(([increment_value], np.tile([0, -increment_value, increment_value], cycles)))
+    segment_phases = np.concatenate(([PHASE_INCREMENT], np.tile([PHASE_DENIAL, PHASE_DECREMENT, PHASE_INCREMENT], cycles)))
+
+    # Expand the segments to samples and cut at the end of the range
+    segment_offsets = np.cumsum(lengths) - lengths
+    sample_offsets = np.arange(total_samples) - np.repeat(segment_offsets, lengths)[:total_samples]
+    values = (np.repeat(starts, lengths)[:total_samples] + sample_offsets * np.repeat(steps, lengths)[:total_samples]).astype(np.int32)
+    phases = np.repeat(segment_phases, lengths)[:total_samples].astype(np.int8)
+
+    denial_mask = phases == PHASE_DENIAL
+    return UsageSeries(dates, values, phases, denial_mask, increment_value,
+                       np.where(denial_mask, increment_value, 0).astype(np.int32))
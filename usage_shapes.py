@@ -0,0 +1,170 @@
+from collections import namedtuple
+import numpy as np
+from Random_curve import generate_randomized_wave
+from usage_engine import (
+    DAILY,
+    PHASE_DECREMENT,
+    PHASE_DENIAL,
+    PHASE_INCREMENT,
+    UsageSeries,
+    usage_series,
+)
+
+# Inputs every usage shape gets
+# - start_date: first day of the range; dates: datetime64 time of every sample; interval: time
+#   between samples
+# - quantity, num_records, range_start, range_end: the generator inputs (peak, records to reach it,
+#   denial range)
+# - rng: source of the shape's own randomness; denial_rng: source of the sawtooth's denial runs
+ShapeContext = namedtuple(
+    "ShapeContext",
+    ["start_date", "dates", "interval", "quantity", "num_records", "range_start", "range_end", "rng", "denial_rng"],
+)
+
+# Usage shape name -> (function, default options); see register_usage_shape
+USAGE_SHAPES = {}
+
+# Shape used when none is chosen: the increment/denial/decrement state machine
+DEFAULT_SHAPE = "sawtooth"
+
+
+def register_usage_shape(name, **defaults):
+    """
+    Decorator registering a usage shape under name, with its options and their defaults.
+
+    A shape is called as shape(context, **options) with a ShapeContext and returns the whole
+    UsageSeries at once, usually through series_from_demand.
+    """
+    def register(shape):
+        USAGE_SHAPES[name] = (shape, defaults)
+        return shape
+    return register
+
+
+def series_from_demand(context, demand):
+    """
+    Turns a demand curve into a UsageSeries.
+
+    Concurrent usage is the demand rounded and capped at quantity. Every sample whose demand
+    reaches quantity is a denial sample; its denial count is the demand above quantity,
+    kept within [range_start, range_end].
+
+    Raises:
+    - ValueError: If the demand is not finite everywhere.
+    """
+    if not np.isfinite(demand).all():
+        raise ValueError("The usage shape produced a demand curve that is not finite; check its options.")
+    quantity = context.quantity
+    demand = np.rint(demand)
+    values = np.clip(demand, 0, quantity).astype(np.int32)
+    denial_mask = demand >= quantity
+    denial_counts = np.where(
+        denial_mask, np.clip(demand - quantity, context.range_start, context.range_end), 0
+    ).astype(np.int32)
+
+    # Phases follow the direction of the curve, for charts and consumers that look at them
+    rising = np.diff(values, prepend=0) >= 0
+    phases = np.where(denial_mask, PHASE_DENIAL, np.where(rising, PHASE_INCREMENT, PHASE_DECREMENT)).astype(np.int8)
+    return UsageSeries(context.dates, values, phases, denial_mask, quantity // context.num_records, denial_counts)
+
+
+# Day of the week of every sample, Monday = 0
+def _weekdays(dates):
+    return (dates.astype("datetime64[D]").astype(np.int64) + 3) % 7
+
+# Reject an option value outside its valid range
+def _require(condition, message):
+    if not condition:
+        raise ValueError(message)
+
+# Fraction of quantity plus Gaussian noise of `noise` times quantity
+def _noisy(context, level, noise):
+    return context.quantity * (level + noise * context.rng.standard_normal(len(context.dates)))
+
+
+@register_usage_shape("sawtooth")
+def sawtooth(context):
+    """Ramps up by quantity // num_records per sample, holds at the peak for a denial run, ramps down to half."""
+    return usage_series(
+        context.start_date, len(context.dates), context.quantity, context.num_records,
+        context.range_start, context.range_end, context.denial_rng, context.interval
+    )
+
+
+@register_usage_shape("randomized_wave", cycles=0, randomness_level=5, min_fraction=0.25)
+def randomized_wave(context, cycles, randomness_level, min_fraction):
+    """
+    Random rises and falls between min_fraction of quantity and quantity, touching the peak once
+    per cycle (see Random_curve.generate_randomized_wave). With cycles 0 each half cycle lasts
+    num_records samples.
+    """
+    _require(cycles >= 0, "cycles must not be negative.")
+    _require(1 <= randomness_level <= 10, "randomness_level must be between 1 and 10.")
+    _require(0 <= min_fraction <= 1, "min_fraction must be between 0 and 1.")
+    total_samples = len(context.dates)
+    if not cycles:
+        cycles = round(total_samples / (2 * context.num_records))
+    _, demand = generate_randomized_wave(
+        total_samples, max(1, int(cycles)), context.quantity, randomness_level, min_fraction, rng=context.rng
+    )
+    return series_from_demand(context, demand)
+
+
+@register_usage_shape("weekly", weekday_level=0.95, weekend_level=0.3, noise=0.05)
+def weekly(context, weekday_level, weekend_level, noise):
+    """Weekday/weekend seasonality: a high level Monday to Friday and a low one at weekends."""
+    _require(noise >= 0, "noise must not be negative.")
+    level = np.where(_weekdays(context.dates) < 5, weekday_level, weekend_level)
+    return series_from_demand(context, _noisy(context, level, noise))
+
+
+@register_usage_shape("business_hours", open_hour=8, close_hour=18, peak_level=1.0, off_level=0.1, noise=0.05)
+def business_hours(context, open_hour, close_hour, peak_level, off_level, noise):
+    """
+    Working-day profile: a half-sine bump from open_hour to close_hour peaking at peak_level, and
+    off_level at night and at weekends. Samples a day or more apart stand for the whole day and
+    get the weekday peak.
+    """
+    _require(0 <= open_hour < close_hour <= 24, "Expected 0 <= open_hour < close_hour <= 24.")
+    _require(noise >= 0, "noise must not be negative.")
+    if context.interval >= DAILY:
+        bump = np.ones(len(context.dates))
+    else:
+        hours = (context.dates - context.dates.astype("datetime64[D]")) / np.timedelta64(1, "h")
+        bump = np.sin(np.pi * np.clip((hours - open_hour) / (close_hour - open_hour), 0, 1))
+    bump[_weekdays(context.dates) >= 5] = 0
+    return series_from_demand(context, _noisy(context, off_level + (peak_level - off_level) * bump, noise))
+
+
+@register_usage_shape("trend", start_level=0.5, end_level=1.1, noise=0.05)
+def trend(context, start_level, end_level, noise):
+    """Linear growth (or decline) from start_level to end_level of quantity, plus noise."""
+    _require(noise >= 0, "noise must not be negative.")
+    level = np.linspace(start_level, end_level, len(context.dates))
+    return series_from_demand(context, _noisy(context, level, noise))
+
+
+def shape_series(shape, context, options=None):
+    """
+    Computes the usage series of a registered shape.
+
+    Args:
+    - shape (str): Name in USAGE_SHAPES.
+    - context (ShapeContext): Sample times and generator inputs.
+    - options (dict): Overrides of the shape's default options.
+
+    Raises:
+    - ValueError: For an unknown shape or option, or an option value that is not finite or out
+      of range.
+    """
+    if shape not in USAGE_SHAPES:
+        raise ValueError(f"Unknown usage shape '{shape}', expected one of {list(USAGE_SHAPES)}.")
+    function, defaults = USAGE_SHAPES[shape]
+    options = options or {}
+    unknown = [name for name in options if name not in defaults]
+    if unknown:
+        raise ValueError(f"Unknown option(s) for usage shape '{shape}': {', '.join(unknown)}.")
+    not_finite = [name for name, value in options.items() if not np.isfinite(value)]
+    if not_finite:
+        raise ValueError(f"Option(s) of usage shape '{shape}' must be finite numbers: {', '.join(not_finite)}.")
+    return function(context, **{**defaults, **options})